@@ -165,6 +165,23 @@ CREATE TABLE IF NOT EXISTS material_profiles (
 );
 """)
 
+# ✅ Create Stock Sizes Table (Standard bar/plate/tube sizes per profile, optionally per material)
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS stock_sizes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    material_id INTEGER,                           -- NULL = available for every material
+    profile_id INTEGER NOT NULL,
+    dimensions_json TEXT NOT NULL,                 -- Cross-section dimensions, e.g. {"diameter": 20}
+    stock_length REAL,                             -- Length of the supplied bar/tube/sheet
+    stock_width REAL,                              -- Width of the supplied sheet (plates only)
+    unit TEXT NOT NULL DEFAULT 'mm',
+    FOREIGN KEY (material_id) REFERENCES materials(id) ON DELETE CASCADE,
+    FOREIGN KEY (profile_id) REFERENCES material_profiles(id) ON DELETE CASCADE
+);
+""")
+
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_stock_sizes_profile ON stock_sizes (profile_id, material_id);")
+
 # ✅ Create Material Costing Table (Stores Pricing Details)
 cursor.execute("""
 CREATE TABLE IF NOT EXISTS material_costing (
@@ -178,6 +195,46 @@ CREATE TABLE IF NOT EXISTS material_costing (
 );
 """)
 
+# ✅ Create Material Price History Table (Append-only, one row per price change)
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS material_price_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    material_id INTEGER NOT NULL,
+    block_price REAL NOT NULL DEFAULT 0.0,
+    block_price_unit TEXT NOT NULL,
+    sheet_price REAL NOT NULL DEFAULT 0.0,
+    sheet_price_unit TEXT NOT NULL,
+    effective_from TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,  -- ✅ UTC "YYYY-MM-DD HH:MM:SS"
+    source TEXT,
+    FOREIGN KEY (material_id) REFERENCES materials(id) ON DELETE CASCADE
+);
+""")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_price_history_material ON material_price_history (material_id, effective_from);")
+
+# ✅ Create Cost Distributions Table (Uncertainty of prices, rates and allowances for Monte Carlo bands)
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS cost_distributions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    scope TEXT NOT NULL,                 -- "global", "material" or "operation"
+    ref_id INTEGER NOT NULL DEFAULT 0,   -- Material/operation ID (0 for global rows)
+    parameter TEXT NOT NULL,             -- "price", "allowance", "scrap" or "rate"
+    distribution TEXT NOT NULL DEFAULT 'triangular',
+    low REAL NOT NULL,
+    mode REAL NOT NULL,
+    high REAL NOT NULL,
+    UNIQUE (scope, ref_id, parameter)
+);
+""")
+
+# ✅ Create Currency Rates Table (Value of one unit of each currency in a common reference unit)
+cursor.execute("""
+CREATE TABLE IF NOT EXISTS currency_rates (
+    currency TEXT PRIMARY KEY,           -- ISO code, e.g. "INR"
+    rate REAL NOT NULL,                  -- Reference units per one unit of this currency
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+""")
+
 # ✅ Function to Load JSON Data
 def load_json_data(filename):
     try:
@@ -314,6 +371,12 @@ def insert_defaults():
                 VALUES (?, ?, ?, ?) ON CONFLICT(material_id, property_name) DO NOTHING;
             """, (material_id, prop["property_name"], prop["property_value"], prop["property_unit"]))
 
+    # ✅ Seed the price history with the default prices
+    cursor.execute("""
+        INSERT INTO material_price_history (material_id, block_price, block_price_unit, sheet_price, sheet_price_unit, source)
+        SELECT material_id, block_price, block_price_unit, sheet_price, sheet_price_unit, 'defaults' FROM material_costing
+    """)
+
     # ✅ Commit changes to save the inserted data
     conn.commit()
     print("✅ Materials, properties, and pricing inserted successfully!")
@@ -339,6 +402,86 @@ def insert_defaults():
     conn.commit()
     print("✅ Material profiles inserted successfully!")
 
+    # ✅ Load Stock Sizes (each series is expanded into every combination of its dimensions)
+    stock_series = load_json_data("stock_sizes.json")
+
+    for series in stock_series:
+        if not all(k in series for k in ["profile", "series"]):
+            print(f"❌ Skipping invalid stock series: {series}")
+            continue
+
+        cursor.execute("SELECT id FROM material_profiles WHERE name = ?", (series["profile"],))
+        profile_id = cursor.fetchone()
+        if not profile_id:
+            print(f"❌ Skipping stock series - Profile '{series['profile']}' not found")
+            continue
+        profile_id = profile_id[0]
+
+        material_id = None
+        if series.get("material"):
+            cursor.execute("SELECT id FROM materials WHERE name = ?", (series["material"],))
+            material_id = cursor.fetchone()
+            if not material_id:
+                print(f"❌ Skipping stock series - Material '{series['material']}' not found")
+                continue
+            material_id = material_id[0]
+
+        rows = [{}]
+        for field, values in series["series"].items():
+            rows = [{**row, field: value} for row in rows for value in values]
+
+        cursor.executemany("""
+            INSERT INTO stock_sizes (material_id, profile_id, dimensions_json, stock_length, stock_width, unit)
+            VALUES (?, ?, ?, ?, ?, ?);
+        """, [
+            (
+                material_id,
+                profile_id,
+                json.dumps(row),
+                series.get("stock_length"),
+                series.get("stock_width"),
+                series.get("unit", "mm"),
+            )
+            for row in rows
+        ])
+
+    conn.commit()
+    print("✅ Stock sizes inserted successfully!")
+
+    # ✅ Load Cost Distributions
+    cost_distributions = load_json_data("cost_distributions.json")
+
+    for item in cost_distributions:
+        if not all(k in item for k in ["scope", "parameter", "low", "mode", "high"]):
+            print(f"❌ Skipping invalid cost distribution: {item}")
+            continue
+
+        cursor.execute("""
+            INSERT INTO cost_distributions (scope, ref_id, parameter, distribution, low, mode, high)
+            VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(scope, ref_id, parameter) DO NOTHING;
+        """, (
+            item["scope"],
+            item.get("ref_id", 0),
+            item["parameter"],
+            item.get("distribution", "triangular"),
+            item["low"],
+            item["mode"],
+            item["high"],
+        ))
+
+    conn.commit()
+    print("✅ Cost distributions inserted successfully!")
+
+    # ✅ Load Currency Rates
+    currency_rates = load_json_data("currency_rates.json")
+    cursor.executemany("""
+        INSERT INTO currency_rates (currency, rate) VALUES (?, ?)
+        ON CONFLICT(currency) DO NOTHING;
+    """, [(currency.upper(), float(rate)) for currency, rate in currency_rates.items()])
+
+    conn.commit()
+    print("✅ Currency rates inserted successfully!")
+
     # ✅ Load Operations Settings
     operations_data = load_json_data("operations_settings.json")
 
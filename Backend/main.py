@@ -2,13 +2,14 @@
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from modules.cad_file_analysis import router as cad_file_router
+from modules.cad_file_analysis import router as cad_file_router, start_prewarmer
 from modules.geometric_analysis import router as geometric_router
 from modules.cost_analysis import router as cost_router
 from modules.materials import router as materials_router
 from modules.settings import router as settings_router
 from modules.projects import router as projects_router
 from modules.parts import router as parts_router
+from modules.quote_export import router as quote_router
 
 app = FastAPI()
 
@@ -27,9 +28,16 @@ app.include_router(geometric_router, prefix="/geometry")
 app.include_router(cost_router, prefix="/cost")
 app.include_router(settings_router, prefix="/settings")
 app.include_router(projects_router, prefix="/projects", tags=["Projects"])
+app.include_router(quote_router, prefix="/projects", tags=["Projects"])
 app.include_router(parts_router, prefix="/parts", tags=["Parts"])
 
 
+# Background prewarming of lazily generated CAD artifacts
+@app.on_event("startup")
+async def start_background_tasks():
+    start_prewarmer()
+
+
 @app.get("/")
 def read_root():
     return {"message": "CAD File Analysis API is running."}
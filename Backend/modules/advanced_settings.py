@@ -1,5 +1,6 @@
 import sqlite3
 from fastapi import APIRouter, HTTPException
+from modules.cost_cache import bump_catalogue_version
 from typing import Dict, Any
 
 # ✅ Define the router for advanced settings
@@ -50,5 +51,6 @@ def update_advanced_settings(updates: Dict[str, Any]):
         )
 
     conn.commit()
+    bump_catalogue_version()
     conn.close()
     return {"message": "Advanced settings updated successfully."}
@@ -0,0 +1,147 @@
+# /modules/assembly_analysis.py
+
+import gzip
+import hashlib
+import os
+
+import cadquery as cq
+import numpy as np
+from cadquery import exporters
+from OCP.BRepGProp import BRepGProp
+from OCP.GProp import GProp_GProps
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE, TopAbs_SOLID
+from OCP.TopExp import TopExp, TopExp_Explorer
+from OCP.TopLoc import TopLoc_Location
+from OCP.TopTools import TopTools_IndexedMapOfShape
+
+from modules.geometric_analysis import (
+    BREP_CACHE_COMPRESS, BREP_CACHE_FOLDER, analyze_shape, generate_2d_projection, get_unit_preference,
+    load_step, prune_brep_cache, read_brep_sidecar, shape_to_brep,
+)
+from modules.file_utils import write_atomic
+from modules.svg_optimize import optimize_svg_file
+from modules.unit_conversion import convert_units
+
+
+def component_path(fingerprint):
+    """BREP cache file of one distinct solid, keyed by its placement-independent fingerprint."""
+    return os.path.join(BREP_CACHE_FOLDER, f"{fingerprint}.solid.brep" + (".gz" if BREP_CACHE_COMPRESS else ""))
+
+
+def solid_fingerprint(solid):
+    """
+    Hash of what a solid is, not where it is: volume, surface area, principal moments of
+    inertia about its centre of mass and face/edge counts, to 6 significant digits.
+    Moved or rotated copies share it; so do mirror images, which cost the same.
+    """
+    volume, area = GProp_GProps(), GProp_GProps()
+    BRepGProp.VolumeProperties_s(solid, volume)
+    BRepGProp.SurfaceProperties_s(solid, area)
+    matrix = volume.MatrixOfInertia()
+    moments = np.linalg.eigvalsh(np.array([[matrix.Value(i, j) for j in (1, 2, 3)] for i in (1, 2, 3)]))
+    counts = []
+    for kind in (TopAbs_FACE, TopAbs_EDGE):
+        seen = TopTools_IndexedMapOfShape()
+        TopExp.MapShapes_s(solid, kind, seen)
+        counts.append(seen.Extent())
+    signature = "|".join([f"{v:.6g}" for v in (volume.Mass(), area.Mass(), *moments)] + [str(c) for c in counts])
+    return hashlib.sha256(signature.encode("ascii")).hexdigest()
+
+
+def split_assembly(step_file):
+    """
+    Walks the solids of a STEP file and writes each distinct solid to the BREP cache.
+    Instances of one solid, whether shared through the assembly structure (one TShape
+    under several locations) or stored as separate moved or rotated copies, collapse
+    onto a single placement-independent fingerprint (see `solid_fingerprint`).
+
+    Returns {"bounding_box", "instances", "components": [{"fingerprint", "instances"}]}
+    in first-seen order, or None when the file has no solids. Runs inside a worker process.
+    """
+    part = load_step(step_file)
+    shape = cq.Compound.makeCompound(part.vals())
+
+    # ✅ Instances share one TShape under different locations; strip the location to group them
+    shared = TopTools_IndexedMapOfShape()
+    occurrences = []
+    explorer = TopExp_Explorer(shape.wrapped, TopAbs_SOLID)
+    while explorer.More():
+        occurrences.append(shared.Add(explorer.Current().Located(TopLoc_Location())))
+        explorer.Next()
+    if not occurrences:
+        return None
+
+    fingerprints, written = {}, False
+    for index in range(1, shared.Extent() + 1):
+        solid = shared.FindKey(index)
+        fingerprint = solid_fingerprint(solid)
+        fingerprints[index] = fingerprint
+        path = component_path(fingerprint)
+        if os.path.exists(path):
+            os.utime(path)  # ✅ Still in use; keeps it from being evicted
+            continue
+        # ✅ The first copy seen is the one stored for the whole group
+        data = shape_to_brep(cq.Workplane("XY").newObject([cq.Shape.cast(solid)]))
+        write_atomic(path, gzip.compress(data, compresslevel=1) if path.endswith(".gz") else data)
+        written = True
+    if written:
+        prune_brep_cache()
+
+    instances = {}
+    for index in occurrences:
+        instances[fingerprints[index]] = instances.get(fingerprints[index], 0) + 1
+
+    bbox = shape.BoundingBox()
+    length_unit = get_unit_preference("length")
+    return {
+        "bounding_box": {
+            "width": convert_units(bbox.xmax - bbox.xmin, "mm", length_unit),
+            "depth": convert_units(bbox.ymax - bbox.ymin, "mm", length_unit),
+            "height": convert_units(bbox.zmax - bbox.zmin, "mm", length_unit),
+            "unit": length_unit
+        },
+        "instances": len(occurrences),
+        "components": [{"fingerprint": fp, "instances": count} for fp, count in instances.items()],
+    }
+
+
+def analyze_components(fingerprints):
+    """Full geometric analysis of cached distinct solids, one at a time (worker process)."""
+    results = []
+    for fingerprint in fingerprints:
+        try:
+            part = read_brep_sidecar(component_path(fingerprint))
+        except Exception as e:
+            print(f"❌ Error loading component {fingerprint[:12]}: {e}")
+            results.append(None)
+            continue
+        results.append(analyze_shape(part))
+        del part  # ✅ Only one solid is alive at a time
+    return results
+
+
+def export_components(tasks):
+    """
+    Writes a STEP file (and, given "svg_path", a projection) for each cached solid in
+    `tasks` ([{"fingerprint", "step_path", "svg_path"}]) so it can live on as its own part.
+    Returns per task {"step_path", "projection"}, with None paths on failure.
+    """
+    results = []
+    for task in tasks:
+        result = {"step_path": None, "projection": None}
+        try:
+            part = read_brep_sidecar(component_path(task["fingerprint"]))
+            os.makedirs(os.path.dirname(task["step_path"]), exist_ok=True)
+            exporters.export(part, task["step_path"], exporters.ExportTypes.STEP)
+            result["step_path"] = task["step_path"]
+        except Exception as e:
+            print(f"❌ Error exporting component {task['fingerprint'][:12]}: {e}")
+            results.append(result)
+            continue
+        if task.get("svg_path"):
+            result["projection"] = generate_2d_projection(None, task["svg_path"], part=part)
+            if result["projection"]:
+                optimize_svg_file(result["projection"])
+        results.append(result)
+        del part
+    return results
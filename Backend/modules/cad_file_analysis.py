@@ -1,15 +1,30 @@
+import asyncio
+import io
 import os
+import re
 import shutil
 import cairosvg
 import sqlite3
 import uuid
 import json
 from PIL import Image
-from fastapi import APIRouter, UploadFile, File, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, Response
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
-from modules.geometric_analysis import analyze_step_file, generate_2d_projection
+from modules.cad_worker import (
+    ASSEMBLY_MODE, MESH_BASE, MESH_EXPORT_ENABLED, VIEW_DIRECTIONS, load_views_index, mesh_path, note_project_view,
+    recent_projects, remove_part_meshes, remove_projection_views, run_assembly_analysis, run_component_exports,
+    run_ingest, single_flight,
+)
+from modules.cost_cache import geometry_fingerprint
+from modules.file_utils import write_atomic
+from modules.step_prescan import StepPrescanError, admission, is_assembly, prescan_step
+from modules.svg_optimize import ENCODINGS, remove_svg_variants
+from modules.thumbnail_sprites import (
+    THUMBNAIL_FORMATS, THUMBNAIL_SIZES, sprite_paths, thumbnail_variant_name, update_project_sprite,
+)
 
 router = APIRouter()
 
@@ -46,6 +61,13 @@ ADVANCED_SETTINGS = get_advanced_settings()
 UPLOAD_BASE = ADVANCED_SETTINGS.get("UPLOAD_FOLDER", "uploads")
 PROJECTION_BASE = ADVANCED_SETTINGS.get("PROJECTION_FOLDER", "projections")
 THUMBNAIL_BASE = ADVANCED_SETTINGS.get("THUMBNAIL_FOLDER", "thumbnails")
+THUMBNAIL_QUALITY = int(ADVANCED_SETTINGS.get("thumbnail_quality", 80))
+STATIC_MAX_AGE = 31536000  # ✅ One year, for URLs pinned to a content hash
+# ✅ "lazy": uploads store geometry only; projections, thumbnails and meshes are built on first request
+LAZY_ARTIFACTS = str(ADVANCED_SETTINGS.get("artifact_mode", "eager")).lower() == "lazy"
+PREWARM_INTERVAL = float(ADVANCED_SETTINGS.get("prewarm_interval", 30))
+PREWARM_WINDOW = float(ADVANCED_SETTINGS.get("prewarm_window", 900))
+PREWARM_PROJECTS = int(ADVANCED_SETTINGS.get("prewarm_projects", 5))
 
 # ✅ Ensure required directories exist
 os.makedirs(UPLOAD_BASE, exist_ok=True)
@@ -190,7 +212,8 @@ async def upload_cad_file(
     file: UploadFile = File(...),
     project_id: str = Query(..., description="Project ID"),
     classification_id: int = Query(..., description="Classification ID"),
-    modified_by: str = Query("system", description="User making the upload")  # Optional for tracking
+    modified_by: str = Query("system", description="User making the upload"),  # Optional for tracking
+    explode: bool = Query(False, description="Also create a child part per distinct solid of an assembly")
 ):
     """Processes a CAD file, assigns a unique part ID, and saves it under a project."""
 
@@ -234,25 +257,21 @@ async def upload_cad_file(
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
+    # ✅ Reject bad or oversized files before the expensive import
+    step_header = await prescan_cad_file(file_path, discard=True)
+
     try:
-        # ✅ STEP 1: Analyze CAD file
-        analysis_result = analyze_step_file(file_path)
+        # ✅ STEP 1-3: Analyze CAD file, then projection, mesh and thumbnail (now or on first request)
+        explode_into = (
+            {"part_id": part_id, "classification_id": classification_id, "modified_by": modified_by}
+            if explode else None
+        )
+        analysis_result, svg_path, thumbnail_path = await ingest_part_file(
+            file_path, project_id, part_name, step_header, explode_into
+        )
         if not analysis_result:
             raise HTTPException(status_code=400, detail="Failed to analyze CAD file.")
 
-        # ✅ STEP 2: Generate Projection
-        svg_filename = f"{part_name}.svg"
-        svg_path = os.path.join(project_proj_dir, svg_filename)
-        svg_generated = generate_2d_projection(file_path, svg_path)
-        if not svg_generated or not os.path.exists(svg_path):
-            svg_path = None
-
-        # ✅ STEP 3: Generate Thumbnail
-        thumbnail_filename = f"{part_name}.png"
-        thumbnail_path = generate_thumbnail(svg_path, thumbnail_filename, project_id)
-        if not thumbnail_path or not os.path.exists(thumbnail_path):
-            thumbnail_path = None
-
         # ✅ STEP 4: Store Part Data
         part_data = {
             "part_id": part_id,
@@ -274,6 +293,8 @@ async def upload_cad_file(
 
         return {"status": "success", "data": part_data}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -283,6 +304,7 @@ async def reupload_cad_file(
     part_id: str,
     file: UploadFile = File(...),
     modified_by: str = Query(..., description="User performing reupload"),
+    explode: bool = Query(False, description="Also create or refresh a child part per distinct solid of an assembly"),
 ):
     """Replaces an existing part's CAD file and recalculates geometry & preview."""
     conn = get_db_connection()
@@ -307,26 +329,29 @@ async def reupload_cad_file(
     os.makedirs(project_proj_dir, exist_ok=True)
     os.makedirs(project_thumb_dir, exist_ok=True)
 
-    # ✅ Overwrite existing file
+    # ✅ Stage the upload beside the existing file; it only replaces it once the pre-scan accepts it,
+    # so a rejected reupload leaves the part's current CAD file intact
     file_path = os.path.join(project_upload_dir, file.filename)
-    with open(file_path, "wb") as buffer:
+    staged_path = f"{file_path}.{uuid.uuid4().hex}.upload"
+    with open(staged_path, "wb") as buffer:
         shutil.copyfileobj(file.file, buffer)
 
+    # ✅ Reject bad or oversized files before the expensive import
+    step_header = await prescan_cad_file(staged_path, discard=True)
+    os.replace(staged_path, file_path)
+
     try:
-        # ✅ Analyze CAD file
-        analysis_result = analyze_step_file(file_path)
+        # ✅ Analyze CAD file, then projection, mesh and thumbnail (now or on first request)
+        explode_into = (
+            {"part_id": part["part_id"], "classification_id": part["classification_id"], "modified_by": modified_by}
+            if explode else None
+        )
+        analysis_result, svg_path, thumbnail_path = await ingest_part_file(
+            file_path, project_id, part_name, step_header, explode_into
+        )
         if not analysis_result:
             raise HTTPException(status_code=400, detail="Failed to analyze CAD file.")
 
-        # ✅ Generate projection
-        svg_filename = f"{part_name}.svg"
-        svg_path = os.path.join(project_proj_dir, svg_filename)
-        generate_2d_projection(file_path, svg_path)
-
-        # ✅ Generate thumbnail
-        thumbnail_filename = f"{part_name}.png"
-        thumbnail_path = generate_thumbnail(svg_path, thumbnail_filename, project_id)
-
         # ✅ Build updated part data
         updated_part_data = {
             "id": part["id"],  # use primary key to force update
@@ -352,6 +377,8 @@ async def reupload_cad_file(
 
         return {"status": "success", "message": "Reupload successful", "data": updated_part_data}
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -465,20 +492,17 @@ async def recalculate_geometry(part_id: str, modified_by: str = Query("system"))
     os.makedirs(project_proj_dir, exist_ok=True)
     os.makedirs(project_thumb_dir, exist_ok=True)
 
-    # Re-run geometry analysis
-    analysis_result = analyze_step_file(file_path)
+    # Re-run geometry analysis, then projection, mesh and thumbnail (now or on first request)
+    try:
+        step_header = await prescan_cad_file(file_path)
+    except HTTPException:
+        conn.close()
+        raise
+    analysis_result, svg_path, thumbnail_path = await ingest_part_file(file_path, project_id, part_name, step_header)
     if not analysis_result:
+        conn.close()
         raise HTTPException(status_code=400, detail="Failed to analyze CAD file.")
 
-    # Generate updated projection
-    svg_filename = f"{part_name}.svg"
-    svg_path = os.path.join(project_proj_dir, svg_filename)
-    generate_2d_projection(file_path, svg_path)
-
-    # Generate updated thumbnail
-    thumbnail_filename = f"{part_name}.png"
-    thumbnail_path = generate_thumbnail(svg_path, thumbnail_filename, project_id)
-
     # Update in DB
     cursor.execute("""
         UPDATE parts SET 
@@ -506,6 +530,243 @@ async def recalculate_geometry(part_id: str, modified_by: str = Query("system"))
         }
     }
 
+# ✅ Cheap STEP pre-scan before the OCC import: rejects bad or oversized files and picks the queue
+async def prescan_cad_file(file_path, discard=False):
+    """
+    Header metadata of a STEP file plus its "queue" ("normal" or "low_priority").
+    Raises HTTPException for files that cannot or should not be imported; with `discard`
+    the rejected file is deleted.
+    """
+    try:
+        scan = await run_in_threadpool(prescan_step, file_path)
+        scan["queue"] = admission(scan)
+        return scan
+    except StepPrescanError as e:
+        if discard and os.path.exists(file_path):
+            os.remove(file_path)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+def _is_low_priority(part):
+    try:
+        geometry = json.loads(part["geometry_details"] or "{}")
+    except (TypeError, json.JSONDecodeError):
+        return False
+    return (geometry.get("step_header") or {}).get("queue") == "low_priority"
+
+# ✅ Shared ingest for upload, reupload and recalculate
+async def ingest_part_file(file_path, project_id, part_name, step_header=None, explode_into=None):
+    """
+    Analyzes a part's CAD file and builds its artifacts in the CAD worker.
+    `step_header` (from `prescan_cad_file`) is stored with the analysis and selects the worker pool;
+    when it reports several solids or instances the file is analyzed in assembly mode (see `analyze_assembly`).
+
+    Returns (analysis_result, svg_path, thumbnail_path). In lazy mode only the analysis runs:
+    stale artifacts are removed and the returned paths are where they will be generated.
+    """
+    svg_path = os.path.join(PROJECTION_BASE, project_id, f"{part_name}.svg")
+    thumbnail_filename = f"{part_name}.png"
+    low_priority = bool(step_header) and step_header.get("queue") == "low_priority"
+    assembly = ASSEMBLY_MODE and bool(step_header) and is_assembly(step_header)
+
+    if LAZY_ARTIFACTS:
+        clear_part_artifacts(project_id, part_name)
+        if assembly:
+            analysis_result = await analyze_assembly(file_path, project_id, part_name, explode_into, low_priority)
+        else:
+            analysis_result = (await run_ingest(file_path, low_priority=low_priority))["analysis"]
+        if analysis_result and step_header:
+            analysis_result["step_header"] = step_header
+        return analysis_result, svg_path, os.path.join(THUMBNAIL_BASE, project_id, thumbnail_filename)
+
+    ingest = await run_ingest(
+        file_path, svg_path, mesh_path(project_id, part_name), analyze=not assembly, low_priority=low_priority
+    )
+    if assembly:
+        analysis_result = await analyze_assembly(file_path, project_id, part_name, explode_into, low_priority)
+    else:
+        analysis_result = ingest["analysis"]
+    if analysis_result:
+        attach_mesh_details(analysis_result, ingest["mesh"])
+        if step_header:
+            analysis_result["step_header"] = step_header
+    if not ingest["projection"] or not os.path.exists(svg_path):
+        return analysis_result, None, None
+
+    # ✅ Rasterizing blocks, so it runs off the event loop like the other artifact builds
+    thumbnail_path = await run_in_threadpool(generate_thumbnail, svg_path, thumbnail_filename, project_id)
+    if not thumbnail_path or not os.path.exists(thumbnail_path):
+        thumbnail_path = None
+    return analysis_result, svg_path, thumbnail_path
+
+# ✅ Assembly mode: per-solid analysis, optionally exploded into child parts
+async def analyze_assembly(file_path, project_id, part_name, explode_into=None, low_priority=False):
+    """
+    Analyzes a multi-solid file one distinct solid at a time in the CAD workers. With
+    `explode_into` (the parent's part_id, classification_id and modified_by) every distinct
+    solid also becomes a child part. Falls back to whole-file analysis if splitting fails.
+    """
+    analysis_result, component_analyses = await run_assembly_analysis(file_path, low_priority)
+    if analysis_result is None:
+        return (await run_ingest(file_path, low_priority=low_priority))["analysis"]
+    if explode_into:
+        await explode_assembly(project_id, part_name, analysis_result, component_analyses, explode_into, low_priority)
+    return analysis_result
+
+def assembly_parent_id(geometry_details):
+    """part_id of the assembly a part was exploded from, or None."""
+    try:
+        return (json.loads(geometry_details or "{}").get("assembly_parent") or {}).get("part_id")
+    except (json.JSONDecodeError, AttributeError):
+        return None
+
+def child_part_names(project_id, part_name, count, parent_id):
+    """`<part>-01`, `<part>-02`, ... skipping names taken by parts that are not this parent's children."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT name, geometry_details FROM parts WHERE project_id = ?", (project_id,))
+    taken = {row["name"] for row in cursor.fetchall() if assembly_parent_id(row["geometry_details"]) != parent_id}
+    conn.close()
+
+    names, number = [], 0
+    while len(names) < count:
+        number += 1
+        name = f"{part_name}-{number:02d}"
+        if name not in taken:
+            names.append(name)
+    return names
+
+async def explode_assembly(project_id, part_name, analysis_result, component_analyses, parent, low_priority=False):
+    """
+    Turns each distinct solid of an analyzed assembly into a child part: a STEP file, its
+    projection and thumbnail (eager mode), then one batch upsert into `parts`. A reupload
+    refreshes the same children and deletes the ones it no longer has. Child names are
+    recorded on the parent's component list.
+    """
+    components = analysis_result["assembly"]["components"]
+    names = child_part_names(project_id, part_name, len(components), parent["part_id"])
+    exports = await run_component_exports([
+        {
+            "fingerprint": component["fingerprint"],
+            "step_path": os.path.join(UPLOAD_BASE, project_id, f"{name}.step"),
+            "svg_path": None if LAZY_ARTIFACTS else os.path.join(PROJECTION_BASE, project_id, f"{name}.svg"),
+        }
+        for component, name in zip(components, names)
+    ], low_priority)
+
+    rows = []
+    for component, analysis, name, export in zip(components, component_analyses, names, exports):
+        if not export["step_path"]:
+            continue
+        svg_path = os.path.join(PROJECTION_BASE, project_id, f"{name}.svg")
+        thumbnail_path = os.path.join(THUMBNAIL_BASE, project_id, f"{name}.png")
+        if LAZY_ARTIFACTS:
+            clear_part_artifacts(project_id, name)
+        elif export["projection"]:
+            thumbnail_path = await run_in_threadpool(generate_thumbnail, svg_path, f"{name}.png", project_id) or ""
+        else:
+            svg_path, thumbnail_path = "", ""
+
+        geometry = {
+            **analysis,
+            "assembly_parent": {
+                "part_id": parent["part_id"],
+                "fingerprint": component["fingerprint"],
+                "instances": component["instances"],
+            },
+        }
+        child_id = str(uuid.uuid4())[:8]
+        rows.append((
+            child_id, f"{name.lower().replace(' ', '-')}-{child_id}", project_id, name,
+            os.path.basename(export["step_path"]), export["step_path"], json.dumps(geometry),
+            parent["classification_id"], svg_path, thumbnail_path, parent["modified_by"],
+        ))
+        component["part_name"] = name
+
+    conn = get_db_connection()
+    try:
+        conn.execute("BEGIN")
+        conn.executemany("""
+            INSERT INTO parts (
+                part_id, slug, project_id, name, file_name, file_path, geometry_details,
+                raw_material_details, machining_details, costing_details,
+                classification_id, projection, thumbnail, is_manual, modified_by
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, '{}', '{}', '{}', ?, ?, ?, 0, ?)
+            ON CONFLICT(project_id, name) DO UPDATE SET
+                file_name = excluded.file_name, file_path = excluded.file_path,
+                geometry_details = excluded.geometry_details, classification_id = excluded.classification_id,
+                projection = excluded.projection, thumbnail = excluded.thumbnail, user_override = 0,
+                modified_by = excluded.modified_by, last_updated = CURRENT_TIMESTAMP
+        """, rows)
+        # ✅ Children of an earlier version of this assembly that it no longer has
+        kept = set(names)
+        cursor = conn.execute(
+            "SELECT part_id, name, file_path, thumbnail, geometry_details FROM parts WHERE project_id = ?",
+            (project_id,),
+        )
+        stale = [
+            row for row in cursor.fetchall()
+            if row["name"] not in kept and assembly_parent_id(row["geometry_details"]) == parent["part_id"]
+        ]
+        conn.executemany("DELETE FROM parts WHERE part_id = ?", [(row["part_id"],) for row in stale])
+        conn.commit()
+    except sqlite3.Error:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    for row in stale:
+        if row["file_path"] and os.path.exists(row["file_path"]):
+            os.remove(row["file_path"])
+        clear_part_artifacts(project_id, row["name"])
+    if any(row["thumbnail"] for row in stale):
+        update_project_sprite(project_id)  # ✅ Free their cells in the project sprite
+    if stale:
+        print(f"✅ Removed {len(stale)} child parts no longer in {part_name}.")
+    print(f"✅ Exploded {part_name} into {len(rows)} child parts.")
+    return len(rows)
+
+def clear_part_artifacts(project_id, part_name):
+    """Removes a part's generated files so they are rebuilt from the current CAD file."""
+    svg_path = os.path.join(PROJECTION_BASE, project_id, f"{part_name}.svg")
+    remove_projection_views(svg_path)
+    remove_svg_variants(svg_path)
+
+    thumbnail_filename = f"{part_name}.png"
+    thumbnails = [os.path.join(THUMBNAIL_BASE, project_id, thumbnail_filename)] + [
+        os.path.join(THUMBNAIL_BASE, project_id, thumbnail_variant_name(thumbnail_filename, size, fmt))
+        for size in THUMBNAIL_SIZES for fmt in THUMBNAIL_FORMATS
+    ]
+    for path in [svg_path] + thumbnails:
+        if os.path.exists(path):
+            os.remove(path)
+    remove_part_meshes(project_id, part_name)
+
+# ✅ Record the exported mesh beside the geometry it was tessellated from
+def attach_mesh_details(analysis_result, mesh):
+    if mesh:
+        analysis_result["mesh"] = {
+            "file": os.path.basename(mesh["path"]),
+            "format": "glb",
+            "tolerance": mesh["tolerance"],
+            "vertices": mesh["vertices"],
+            "triangles": mesh["triangles"],
+            "bytes": mesh["bytes"],
+            "lods": [
+                {
+                    "level": lod["level"],
+                    "file": os.path.basename(lod["path"]),
+                    "method": lod["method"],
+                    "tolerance": lod["tolerance"],
+                    "vertices": lod["vertices"],
+                    "triangles": lod["triangles"],
+                    "bytes": lod["bytes"],
+                }
+                for lod in mesh.get("lods", [])
+            ],
+        }
+    return analysis_result
+
 # ✅ Generate Thumbnail
 def generate_thumbnail(svg_path, thumbnail_filename, project_id):
     """Generates a thumbnail from an SVG and stores it in a project-specific folder."""
@@ -513,54 +774,379 @@ def generate_thumbnail(svg_path, thumbnail_filename, project_id):
     os.makedirs(project_thumb_dir, exist_ok=True)
     
     thumbnail_path = os.path.join(project_thumb_dir, thumbnail_filename)
-    temp_png_path = os.path.join(project_thumb_dir, "temp.png")
     
     try:
-        # Convert SVG to PNG
-        if not os.path.exists(svg_path):
+        if not svg_path or not os.path.exists(svg_path):
             print(f"❌ SVG file not found: {svg_path}")
             return None
 
-        cairosvg.svg2png(url=svg_path, write_to=temp_png_path, output_width=500, output_height=500)
-        
-        with Image.open(temp_png_path) as img:
+        # ✅ Rasterize in memory; no shared temp file for concurrent uploads to race on
+        with open(svg_path, "rb") as f:
+            png_bytes = cairosvg.svg2png(bytestring=f.read(), output_width=500, output_height=500)
+
+        with Image.open(io.BytesIO(png_bytes)) as img:
             img = img.convert("RGBA")
-            bbox = img.getbbox()
+            bbox = img.getchannel("A").getbbox()
             if bbox:
                 img = img.crop(bbox)  # Trim empty spaces
-            
-            left, top, right, bottom = img.getbbox()
-            img = img.crop((left + 0, top, right, bottom))  # Remove 50px from the left
-            
             img.thumbnail((500, 500))
-            img.save(thumbnail_path)
 
-        os.remove(temp_png_path)  # Cleanup temp file
+            buffer = io.BytesIO()
+            img.save(buffer, format="PNG")
+            write_atomic(thumbnail_path, buffer.getvalue())
+
+            # ✅ srcset variants, each resized from the cropped image
+            for size in THUMBNAIL_SIZES:
+                variant = img.copy()
+                variant.thumbnail((size, size))
+                for fmt in THUMBNAIL_FORMATS:
+                    buffer = io.BytesIO()
+                    variant.save(buffer, format=fmt.upper(), quality=THUMBNAIL_QUALITY)
+                    variant_name = thumbnail_variant_name(thumbnail_filename, size, fmt)
+                    write_atomic(os.path.join(project_thumb_dir, variant_name), buffer.getvalue())
         
         print(f"✅ Thumbnail created: {thumbnail_path}")
-        return thumbnail_path
     except Exception as e:
         print(f"❌ Error generating thumbnail: {e}")
         return None
 
+    # ✅ Patch the project sprite; a failure here must not lose the thumbnail itself
+    try:
+        update_project_sprite(project_id)
+    except Exception as e:
+        print(f"⚠️ Error updating project sprite: {e}")
+    return thumbnail_path
+
+# ✅ On-demand artifacts (lazy mode): each is generated once, however many requests ask at the same time
+VARIANT_NAME = re.compile(r"-\d+\.(webp|avif)$")                    # part-256.webp -> part.png
+LOD_NAME = re.compile(r"(\.lod\d+)?\.glb$")                           # part.lod1.glb -> part
+VIEW_NAME = re.compile(r"\.(%s)\.svg$" % "|".join(VIEW_DIRECTIONS))   # part.top.svg -> part.svg
+
+def find_part(project_id, column, value):
+    """Part row by `column` (optionally within a project), or None."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    if project_id is None:
+        cursor.execute(f"SELECT * FROM parts WHERE {column} = ?", (value,))
+    else:
+        cursor.execute(f"SELECT * FROM parts WHERE project_id = ? AND {column} = ?", (project_id, value))
+    part = cursor.fetchone()
+    conn.close()
+    return part
+
+def _has_cad_file(part):
+    return bool(part["file_path"]) and os.path.exists(part["file_path"])
+
+async def ensure_projection(part):
+    svg_path = part["projection"] or os.path.join(PROJECTION_BASE, part["project_id"], f"{part['name']}.svg")
+    if os.path.exists(svg_path) or not _has_cad_file(part):
+        return svg_path if os.path.exists(svg_path) else None
+
+    async def build():
+        if os.path.exists(svg_path):
+            return svg_path
+        ingest = await run_ingest(part["file_path"], svg_path, analyze=False, low_priority=_is_low_priority(part))
+        return svg_path if ingest["projection"] else None
+
+    return await single_flight(("projection", part["part_id"]), build)
+
+async def ensure_thumbnail(part):
+    thumbnail_path = part["thumbnail"] or os.path.join(THUMBNAIL_BASE, part["project_id"], f"{part['name']}.png")
+    if os.path.exists(thumbnail_path) or not _has_cad_file(part):
+        return thumbnail_path if os.path.exists(thumbnail_path) else None
+
+    async def build():
+        if os.path.exists(thumbnail_path):
+            return thumbnail_path
+        svg_path = await ensure_projection(part)
+        if not svg_path:
+            return None
+        return await run_in_threadpool(
+            generate_thumbnail, svg_path, os.path.basename(thumbnail_path), part["project_id"]
+        )
+
+    return await single_flight(("thumbnail", part["part_id"]), build)
+
+async def ensure_mesh(part):
+    """Builds a missing mesh and records its details; returns True when one was generated."""
+    glb_path = mesh_path(part["project_id"], part["name"])
+    if not MESH_EXPORT_ENABLED or os.path.exists(glb_path) or not _has_cad_file(part):
+        return False
+
+    async def build():
+        if os.path.exists(glb_path):
+            return False
+        ingest = await run_ingest(
+            part["file_path"], glb_path=glb_path, analyze=False, low_priority=_is_low_priority(part)
+        )
+        if not ingest["mesh"]:
+            return False
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        cursor.execute("SELECT geometry_details FROM parts WHERE part_id = ?", (part["part_id"],))
+        row = cursor.fetchone()
+        if row:
+            try:
+                geometry = json.loads(row["geometry_details"] or "{}")
+            except json.JSONDecodeError:
+                geometry = {}
+            cursor.execute(
+                "UPDATE parts SET geometry_details = ? WHERE part_id = ?",
+                (json.dumps(attach_mesh_details(geometry, ingest["mesh"])), part["part_id"]),
+            )
+            conn.commit()
+        conn.close()
+        return True
+
+    return await single_flight(("mesh", part["part_id"]), build)
+
+# ✅ part_id -> content hash of the CAD file the prewarmer last failed on; retried once the file changes
+_prewarm_failures = {}
+
+async def prewarm_part(part):
+    """Builds a part's missing thumbnail and mesh; returns False if either could not be made."""
+    try:
+        built = await ensure_thumbnail(part) is not None
+        await ensure_mesh(part)
+    except Exception as e:
+        print(f"⚠️ Prewarm failed for part {part['part_id']}: {e}")
+        return False
+    return built and (not MESH_EXPORT_ENABLED or os.path.exists(mesh_path(part["project_id"], part["name"])))
+
+async def prewarm_artifacts():
+    """Background loop: fills in missing artifacts for recently viewed projects, one part at a time."""
+    while True:
+        await asyncio.sleep(PREWARM_INTERVAL)
+        for project_id in recent_projects(PREWARM_WINDOW, PREWARM_PROJECTS):
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT * FROM parts WHERE project_id = ? AND is_manual = 0 AND file_path != ''", (project_id,)
+            )
+            parts = cursor.fetchall()
+            conn.close()
+            for part in parts:
+                if not _has_cad_file(part):
+                    continue
+                fingerprint = await run_in_threadpool(geometry_fingerprint, part["file_path"])
+                if _prewarm_failures.get(part["part_id"]) == fingerprint:
+                    continue
+                if await prewarm_part(part):
+                    _prewarm_failures.pop(part["part_id"], None)
+                else:
+                    print(f"⚠️ Prewarm skipping part {part['part_id']} until its CAD file changes.")
+                    _prewarm_failures[part["part_id"]] = fingerprint
+
+_prewarm_task = None
+
+def start_prewarmer():
+    """Starts the prewarmer on the running event loop (lazy mode only)."""
+    global _prewarm_task
+    if LAZY_ARTIFACTS and _prewarm_task is None:
+        _prewarm_task = asyncio.get_running_loop().create_task(prewarm_artifacts())
+    return _prewarm_task
+
+# ✅ Content-hash validators: `?v=<etag>` URLs are cached for a year, bare URLs revalidate
+def content_etag(file_path):
+    return geometry_fingerprint(file_path)[:32]
+
+def versioned_url(route, file_path):
+    return f"{route}?v={content_etag(file_path)}"
+
+def cached_file_response(request, file_path, media_type, version_path=None, headers=None):
+    """
+    FileResponse with a content-hash ETag and 304 handling. `version_path` is the file the
+    `?v=` URL was pinned to, when a different representation of it is being served.
+    """
+    etag = content_etag(file_path)
+    if request.query_params.get("v") == content_etag(version_path or file_path):
+        cache_control = f"public, max-age={STATIC_MAX_AGE}, immutable"
+    else:
+        cache_control = "public, max-age=0, must-revalidate"
+    headers = {**(headers or {}), "ETag": f'"{etag}"', "Cache-Control": cache_control}
+
+    if_none_match = request.headers.get("if-none-match", "")
+    if any(tag.strip().removeprefix("W/").strip('"') in (etag, "*") for tag in if_none_match.split(",")):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(file_path, media_type=media_type, headers=headers)
+
+THUMBNAIL_MEDIA_TYPES = {".png": "image/png", ".webp": "image/webp", ".avif": "image/avif"}
+
 # ✅ Serve thumbnails from stored paths
 @router.get("/thumbnail/{project_id}/{filename}")
-def get_thumbnail(project_id: str, filename: str):
-    """Serves the generated thumbnail file."""
-    file_path = os.path.join(THUMBNAIL_BASE, project_id, filename)
+async def get_thumbnail(project_id: str, filename: str, request: Request):
+    """Serves a generated thumbnail (PNG fallback or a sized variant) with cache validators."""
+    note_project_view(project_id)
+    file_path = os.path.join(THUMBNAIL_BASE, project_id, os.path.basename(filename))
+    media_type = THUMBNAIL_MEDIA_TYPES.get(os.path.splitext(filename)[1].lower())
+
+    if media_type and LAZY_ARTIFACTS and not os.path.exists(file_path):
+        fallback_name = VARIANT_NAME.sub(".png", os.path.basename(filename))
+        part = find_part(project_id, "thumbnail", os.path.join(THUMBNAIL_BASE, project_id, fallback_name))
+        if part:
+            await ensure_thumbnail(part)
     
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="image/png")
+    if media_type and os.path.exists(file_path):
+        return cached_file_response(request, file_path, media_type)
     
     raise HTTPException(status_code=404, detail="Thumbnail not found.")
 
-# ✅ Serve thumbnails from stored paths
+# ✅ srcset-ready URLs for every variant that exists on disk
+@router.get("/thumbnail_set/{project_id}/{filename}")
+def get_thumbnail_set(project_id: str, filename: str):
+    """Returns the PNG fallback URL and one `srcset` string per image format."""
+    project_thumb_dir = os.path.join(THUMBNAIL_BASE, project_id)
+    fallback_path = os.path.join(project_thumb_dir, os.path.basename(filename))
+    if not os.path.exists(fallback_path):
+        raise HTTPException(status_code=404, detail="Thumbnail not found.")
+
+    route = f"/cad/thumbnail/{project_id}"
+    sources = {}
+    for fmt in THUMBNAIL_FORMATS:
+        entries = []
+        for size in THUMBNAIL_SIZES:
+            variant_name = thumbnail_variant_name(filename, size, fmt)
+            variant_path = os.path.join(project_thumb_dir, variant_name)
+            if os.path.exists(variant_path):
+                with Image.open(variant_path) as img:
+                    width = img.width
+                entries.append(f"{versioned_url(f'{route}/{variant_name}', variant_path)} {width}w")
+        if entries:
+            sources[THUMBNAIL_MEDIA_TYPES[f".{fmt}"]] = ", ".join(entries)
+
+    return {
+        "src": versioned_url(f"{route}/{os.path.basename(filename)}", fallback_path),
+        "sources": sources,
+    }
+
+# ✅ Project sprite: one atlas image for a whole grid of thumbnails
+@router.get("/sprite/{project_id}")
+def get_project_sprite(project_id: str):
+    """Returns the sprite index (cell rectangles by thumbnail file name) and the atlas URL."""
+    if not os.path.isdir(os.path.join(THUMBNAIL_BASE, project_id)):
+        raise HTTPException(status_code=404, detail="No thumbnails for this project.")
+
+    index = update_project_sprite(project_id)  # ✅ No-op unless thumbnails changed
+    atlas_path, _ = sprite_paths(project_id)
+    return {
+        **index,
+        "url": versioned_url(f"/cad/sprite/{project_id}/image", atlas_path),
+    }
+
+@router.get("/sprite/{project_id}/image")
+def get_project_sprite_image(project_id: str, request: Request):
+    """Serves the project's sprite atlas with cache validators."""
+    atlas_path, _ = sprite_paths(project_id)
+    if not os.path.exists(atlas_path):
+        raise HTTPException(status_code=404, detail="Sprite not found.")
+    return cached_file_response(request, atlas_path, THUMBNAIL_MEDIA_TYPES[os.path.splitext(atlas_path)[1]])
+
+# ✅ Serve tessellated meshes; the ETag changes whenever the part is re-ingested
+@router.get("/mesh/{project_id}/{filename}")
+async def get_mesh(project_id: str, filename: str, request: Request):
+    """Serves the GLB mesh of a part with cache validators."""
+    file_path = os.path.join(MESH_BASE, project_id, os.path.basename(filename))
+    if LAZY_ARTIFACTS and not os.path.exists(file_path):
+        part_name = LOD_NAME.sub("", os.path.basename(filename))
+        part = find_part(project_id, "name", part_name)
+        if part:
+            await ensure_mesh(part)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Mesh not found.")
+    return cached_file_response(request, file_path, "model/gltf-binary")
+
+# ✅ LOD manifest: the viewer loads the first (coarsest) entry, then refines on demand
+@router.get("/mesh_manifest/{part_id}")
+async def get_mesh_manifest(part_id: str):
+    """Lists a part's mesh levels, coarse to fine, with their download URLs."""
+    part = find_part(None, "part_id", part_id)
+    if not part:
+        raise HTTPException(status_code=404, detail="Part not found.")
+    if LAZY_ARTIFACTS and await ensure_mesh(part):
+        part = find_part(None, "part_id", part_id)  # ✅ Re-read the freshly stored mesh details
+    try:
+        mesh = json.loads(part["geometry_details"] or "{}").get("mesh")
+    except json.JSONDecodeError:
+        mesh = None
+    if not mesh:
+        raise HTTPException(status_code=404, detail="No mesh exported for this part.")
+
+    lods = mesh.get("lods") or [{**mesh, "level": 0, "method": "tessellation"}]
+    lods = [lod for lod in lods if os.path.exists(os.path.join(MESH_BASE, part["project_id"], lod["file"]))]
+    levels = [
+        {
+            **{key: value for key, value in lod.items() if key != "lods"},
+            "url": versioned_url(
+                f"/cad/mesh/{part['project_id']}/{lod['file']}",
+                os.path.join(MESH_BASE, part["project_id"], lod["file"]),
+            ),
+        }
+        for lod in lods
+    ]
+    return {"part_id": part_id, "format": "glb", "levels": levels}
+
+# ✅ Serve projections, precompressed when the client accepts it
+def accepted_encodings(header):
+    """Content codings from an Accept-Encoding header, excluding any with q=0."""
+    accepted = set()
+    for item in (header or "").split(","):
+        coding, _, params = item.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+# ✅ Index of a part's projection views (the default drawing plus the configured extra views)
+@router.get("/projection_views/{project_id}/{filename}")
+async def get_projection_views(project_id: str, filename: str):
+    """Lists the projection views rendered for a part's default projection, with URLs."""
+    svg_path = os.path.join(PROJECTION_BASE, project_id, os.path.basename(filename))
+    if LAZY_ARTIFACTS and not os.path.exists(svg_path):
+        part = find_part(project_id, "projection", svg_path)
+        if part:
+            await ensure_projection(part)
+    if not os.path.exists(svg_path):
+        raise HTTPException(status_code=404, detail="Projection not found.")
+
+    route = f"/cad/projections/{project_id}"
+    index = load_views_index(svg_path) or {"views": []}
+    views = [{"name": "default", "file": os.path.basename(svg_path), "direction": None}] + [
+        view for view in index["views"]
+        if os.path.exists(os.path.join(PROJECTION_BASE, project_id, view["file"]))
+    ]
+    return {
+        "default": "default",
+        "views": [
+            {**view, "url": versioned_url(f"{route}/{view['file']}", os.path.join(PROJECTION_BASE, project_id, view["file"]))}
+            for view in views
+        ],
+    }
+
 @router.get("/projections/{project_id}/{filename}")
-def get_thumbnail(project_id: str, filename: str):
-    """Serves the generated thumbnail file."""
-    file_path = os.path.join(PROJECTION_BASE, project_id, filename)
-    
-    if os.path.exists(file_path):
-        return FileResponse(file_path, media_type="svg")
-    
-    raise HTTPException(status_code=404, detail="Projection not found.")
\ No newline at end of file
+async def get_projection(project_id: str, filename: str, request: Request):
+    """Serves the projection SVG, picking a precompressed variant by Accept-Encoding."""
+    note_project_view(project_id)
+    file_path = os.path.join(PROJECTION_BASE, project_id, os.path.basename(filename))
+    if LAZY_ARTIFACTS and not os.path.exists(file_path):
+        default_name = VIEW_NAME.sub(".svg", os.path.basename(filename))
+        part = find_part(project_id, "projection", os.path.join(PROJECTION_BASE, project_id, default_name))
+        if part:
+            await ensure_projection(part)
+    if not os.path.exists(file_path):
+        raise HTTPException(status_code=404, detail="Projection not found.")
+
+    accepted = accepted_encodings(request.headers.get("accept-encoding"))
+    for encoding, suffix in ENCODINGS.items():
+        if (encoding in accepted or "*" in accepted) and os.path.exists(file_path + suffix):
+            return cached_file_response(
+                request, file_path + suffix, "image/svg+xml",
+                version_path=file_path, headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+            )
+    return cached_file_response(request, file_path, "image/svg+xml", headers={"Vary": "Accept-Encoding"})
+
@@ -0,0 +1,342 @@
+# /modules/cad_worker.py
+
+import asyncio
+import glob
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+from modules.db_utils import get_advanced_settings
+from modules.file_utils import write_atomic
+from modules.mesh_export import lod_path
+
+ADVANCED_SETTINGS = get_advanced_settings()
+CAD_WORKERS = int(ADVANCED_SETTINGS.get("cad_workers", 2))
+# ✅ Oversized uploads are imported in their own pool so they never hold up ordinary parts
+CAD_LOW_PRIORITY_WORKERS = int(ADVANCED_SETTINGS.get("cad_low_priority_workers", 1))
+MESH_EXPORT_ENABLED = str(ADVANCED_SETTINGS.get("mesh_export_enabled", "true")).lower() in ("true", "1", "yes")
+MESH_TOLERANCE = float(ADVANCED_SETTINGS.get("mesh_tolerance", 0.2))
+# ✅ Coarser tessellation tolerances (mm) for the LOD pyramid, and the clustering grid for the preview level
+MESH_LOD_TOLERANCES = [
+    float(t) for t in str(ADVANCED_SETTINGS.get("mesh_lod_tolerances", "2.0,0.5")).split(",") if t.strip()
+]
+MESH_LOD_CLUSTER_GRID = int(ADVANCED_SETTINGS.get("mesh_lod_cluster_grid", 32))
+MESH_BASE = ADVANCED_SETTINGS.get("MESH_FOLDER", "meshes")
+# ✅ Multi-solid files are analyzed per distinct solid, in chunks spread over the worker pool
+ASSEMBLY_MODE = str(ADVANCED_SETTINGS.get("assembly_mode", "true")).lower() in ("true", "1", "yes")
+ASSEMBLY_CHUNK_SIZE = max(1, int(ADVANCED_SETTINGS.get("assembly_chunk_size", 8)))
+
+# ✅ Extra projection views rendered beside the default drawing, by name
+VIEW_DIRECTIONS = {
+    "top": (0, 0, 1),
+    "bottom": (0, 0, -1),
+    "front": (0, -1, 0),
+    "back": (0, 1, 0),
+    "left": (-1, 0, 0),
+    "right": (1, 0, 0),
+    "side": (1, 0, 0),
+    "iso": (1, -1, 1),
+}
+PROJECTION_VIEWS = [
+    view.strip().lower() for view in str(ADVANCED_SETTINGS.get("projection_views", "top,front,side,iso")).split(",")
+    if view.strip().lower() in VIEW_DIRECTIONS
+]
+
+os.makedirs(MESH_BASE, exist_ok=True)
+
+_executor = None
+_low_priority_executor = None
+
+def get_executor():
+    global _executor
+    # ✅ One crashed worker marks the whole pool broken; replace it instead of failing every later task
+    if _executor is None or _executor._broken:
+        _executor = ProcessPoolExecutor(max_workers=CAD_WORKERS)
+    return _executor
+
+
+def _lower_priority():
+    try:
+        os.nice(10)
+    except (AttributeError, OSError):
+        pass  # ✅ Not available on this platform; the separate pool still isolates the work
+
+
+def get_low_priority_executor():
+    """Pool for uploads the STEP pre-scan routed to the slow queue; its workers run at a lower OS priority."""
+    global _low_priority_executor
+    if _low_priority_executor is None or _low_priority_executor._broken:
+        _low_priority_executor = ProcessPoolExecutor(
+            max_workers=CAD_LOW_PRIORITY_WORKERS, initializer=_lower_priority
+        )
+    return _low_priority_executor
+
+
+def mesh_path(project_id, part_name):
+    return os.path.join(MESH_BASE, project_id, f"{part_name}.glb")
+
+
+def remove_part_meshes(project_id, part_name):
+    """Deletes a part's GLB mesh and its LOD levels."""
+    glb_path = mesh_path(project_id, part_name)
+    for path in [glb_path] + glob.glob(lod_path(glob.escape(glb_path), "*")):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def view_path(svg_path, view):
+    return f"{os.path.splitext(svg_path)[0]}.{view}.svg"
+
+
+def views_index_path(svg_path):
+    return f"{os.path.splitext(svg_path)[0]}.views.json"
+
+
+def load_views_index(svg_path):
+    try:
+        with open(views_index_path(svg_path), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+
+
+def remove_projection_views(svg_path):
+    """Deletes a part's extra views (and their compressed variants) and the views index."""
+    from modules.svg_optimize import remove_svg_variants
+
+    index = load_views_index(svg_path) or {}
+    folder = os.path.dirname(svg_path)
+    for view in index.get("views", []):
+        path = os.path.join(folder, view["file"])
+        if os.path.exists(path):
+            os.remove(path)
+        remove_svg_variants(path)
+    if os.path.exists(views_index_path(svg_path)):
+        os.remove(views_index_path(svg_path))
+
+
+def render_view(brep, svg_path, direction):
+    """Renders one projection view from a BREP-serialized shape (worker process)."""
+    from modules.geometric_analysis import shape_from_brep, generate_2d_projection
+    from modules.svg_optimize import optimize_svg_file
+
+    try:
+        part = shape_from_brep(brep)
+    except Exception as e:
+        print(f"❌ Error loading BREP for projection view: {e}")
+        return None
+    projection = generate_2d_projection(None, svg_path, part=part, projection_dir=direction)
+    if projection:
+        optimize_svg_file(projection)
+    return projection
+
+
+def ingest_step_file(step_file, svg_path=None, glb_path=None, with_brep=False, analyze=True):
+    """
+    Loads a STEP file once and runs every ingest stage on the same shape:
+    geometry analysis, the 2D projection and (optionally) the GLB mesh pyramid.
+    With `with_brep`, the loaded shape is also returned as BREP bytes for follow-up tasks;
+    `analyze=False` skips the analysis when only artifacts are being (re)generated.
+
+    Runs inside a worker process; returns plain data only.
+    """
+    # ✅ Imported here so the web process never loads OCC for this path
+    from modules.geometric_analysis import load_step, analyze_shape, generate_2d_projection, shape_to_brep
+    from modules.mesh_export import export_mesh_lods
+    from modules.svg_optimize import optimize_svg_file
+
+    try:
+        part = load_step(step_file)
+    except Exception as e:
+        print(f"❌ Error loading STEP file: {e}")
+        return {"analysis": None, "projection": None, "mesh": None}
+
+    analysis = analyze_shape(part) if analyze else None
+    loaded = analysis is not None or not analyze
+    projection = generate_2d_projection(step_file, svg_path, part=part) if svg_path else None
+    if projection:
+        optimize_svg_file(projection)
+    mesh = None
+    if glb_path and MESH_EXPORT_ENABLED and loaded:
+        mesh = export_mesh_lods(part.val(), glb_path, MESH_TOLERANCE, MESH_LOD_TOLERANCES, MESH_LOD_CLUSTER_GRID)
+    brep = None
+    if with_brep and loaded:
+        try:
+            brep = shape_to_brep(part)
+        except Exception as e:
+            print(f"⚠️ Error serializing shape to BREP: {e}")
+    return {"analysis": analysis, "projection": projection, "mesh": mesh, "brep": brep}
+
+
+async def render_views(brep, svg_path, views=None, low_priority=False):
+    """
+    Renders the configured views in parallel, one worker task per view, and writes
+    `<part>.views.json` beside the default projection. Returns the index.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_low_priority_executor() if low_priority else get_executor()
+    views = PROJECTION_VIEWS if views is None else views
+    previous = load_views_index(svg_path)
+    if previous:
+        remove_projection_views(svg_path)  # ✅ Drop views that are no longer configured
+
+    paths = [view_path(svg_path, view) for view in views]
+    rendered = await asyncio.gather(*(
+        loop.run_in_executor(executor, render_view, brep, path, VIEW_DIRECTIONS[view])
+        for view, path in zip(views, paths)
+    ))
+
+    index = {
+        "default": os.path.basename(svg_path),
+        "views": [
+            {"name": view, "file": os.path.basename(path), "direction": list(VIEW_DIRECTIONS[view])}
+            for view, path, result in zip(views, paths, rendered) if result
+        ],
+    }
+    write_atomic(views_index_path(svg_path), json.dumps(index, indent=2).encode("utf-8"))
+    return index
+
+
+async def run_ingest(step_file, svg_path=None, glb_path=None, analyze=True, low_priority=False):
+    """
+    Runs `ingest_step_file` in the CAD worker pool without blocking the event loop, then the
+    extra views; `low_priority` uses the separate pool for oversized files.
+    """
+    loop = asyncio.get_running_loop()
+    with_brep = bool(svg_path and PROJECTION_VIEWS)
+    executor = get_low_priority_executor() if low_priority else get_executor()
+    result = await loop.run_in_executor(
+        executor, ingest_step_file, step_file, svg_path, glb_path, with_brep, analyze
+    )
+
+    brep = result.pop("brep", None)
+    result["views"] = await render_views(brep, svg_path, low_priority=low_priority) if brep else None
+    return result
+
+
+def split_assembly_file(step_file):
+    """Worker entry point for `assembly_analysis.split_assembly`."""
+    from modules.assembly_analysis import split_assembly
+
+    try:
+        return split_assembly(step_file)
+    except Exception as e:
+        print(f"❌ Error splitting assembly: {e}")
+        return None
+
+
+def analyze_component_chunk(fingerprints):
+    from modules.assembly_analysis import analyze_components
+
+    return analyze_components(fingerprints)
+
+
+def export_component_chunk(tasks):
+    from modules.assembly_analysis import export_components
+
+    return export_components(tasks)
+
+
+def _chunks(items, size=ASSEMBLY_CHUNK_SIZE):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+async def _run_chunked(function, items, low_priority=False):
+    """Runs `function` over chunks of `items` in parallel and returns the flattened results in order."""
+    loop = asyncio.get_running_loop()
+    executor = get_low_priority_executor() if low_priority else get_executor()
+    chunks = await asyncio.gather(*(
+        loop.run_in_executor(executor, function, chunk) for chunk in _chunks(items)
+    ))
+    return [result for chunk in chunks for result in chunk]
+
+
+def _total(components, key):
+    return sum(c[key]["value"] * c["instances"] for c in components)
+
+
+async def run_assembly_analysis(step_file, low_priority=False):
+    """
+    Assembly mode: one worker splits the file into distinct solids (cached as BREP), then
+    every distinct solid is analyzed once, in parallel chunks. Totals count each instance.
+
+    Returns (analysis, component_analyses): the analysis in the usual geometry_details shape
+    plus an "assembly" section, and the full analysis of each distinct solid in the same order
+    as its components. (None, None) when the file has no solids or a component fails.
+    """
+    loop = asyncio.get_running_loop()
+    executor = get_low_priority_executor() if low_priority else get_executor()
+    split = await loop.run_in_executor(executor, split_assembly_file, step_file)
+    if not split:
+        return None, None
+
+    fingerprints = [c["fingerprint"] for c in split["components"]]
+    analyses = await _run_chunked(analyze_component_chunk, fingerprints, low_priority)
+    if not all(analyses):
+        return None, None
+
+    components = [
+        {
+            "fingerprint": c["fingerprint"],
+            "instances": c["instances"],
+            **{key: analysis[key] for key in ("bounding_box", "volume", "surface_area", "faces", "edges")},
+        }
+        for c, analysis in zip(split["components"], analyses)
+    ]
+    analysis = {
+        "bounding_box": split["bounding_box"],
+        "volume": {"value": _total(components, "volume"), "unit": components[0]["volume"]["unit"]},
+        "surface_area": {"value": _total(components, "surface_area"), "unit": components[0]["surface_area"]["unit"]},
+        "faces": sum(c["faces"] * c["instances"] for c in components),
+        "edges": sum(c["edges"] * c["instances"] for c in components),
+        "components": split["instances"],
+        "assembly": {
+            "instances": split["instances"],
+            "unique_components": len(components),
+            "components": components,
+        },
+    }
+    return analysis, analyses
+
+
+async def run_component_exports(tasks, low_priority=False):
+    """STEP files (and projections) for distinct solids, in parallel chunks; see `export_components`."""
+    return await _run_chunked(export_component_chunk, tasks, low_priority)
+
+
+# ✅ Single-flight: concurrent callers asking for the same artifact share one generation
+_inflight = {}
+
+async def single_flight(key, factory):
+    """Awaits `factory()` once per key at a time; callers arriving meanwhile get the same result."""
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(factory())
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _inflight.pop(key, None))
+    # ✅ Shielded so one cancelled request does not cancel the work others wait on
+    return await asyncio.shield(task)
+
+
+# ✅ Recently viewed projects, most recent last, for the artifact prewarmer
+RECENT_PROJECTS_LIMIT = 50
+_recent_projects = OrderedDict()
+# ✅ Views are noted from sync routes in the threadpool as well as from the event loop
+_recent_projects_lock = threading.Lock()
+
+def note_project_view(project_id):
+    with _recent_projects_lock:
+        _recent_projects[project_id] = time.time()
+        _recent_projects.move_to_end(project_id)
+        while len(_recent_projects) > RECENT_PROJECTS_LIMIT:
+            _recent_projects.popitem(last=False)
+
+def recent_projects(window, limit):
+    """Project ids viewed within the last `window` seconds, most recent first."""
+    cutoff = time.time() - window
+    with _recent_projects_lock:
+        recent = [project_id for project_id, seen in reversed(_recent_projects.items()) if seen >= cutoff]
+    return recent[:limit]
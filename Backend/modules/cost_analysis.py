@@ -1,51 +1,252 @@
 # /modules/cost_analysis.py
 
+import sqlite3
 from fastapi import APIRouter, HTTPException
+from typing import Optional
 from modules.geometric_analysis import analyze_step_file
-from modules.materials import get_materials
-from modules.part_classification import get_part_classification
+from modules.cost_cache import (
+    GEOMETRY_CACHE, COST_CACHE, geometry_fingerprint, cost_cache_key, cache_stats,
+)
+from modules.currency import convert_amounts, get_currency_context, present_amount, present_amounts
+from modules.material_catalogue import get_classification, get_material, material_price_currency, material_unit_price
+from modules.price_history import materials_as_of, parse_as_of, prices_without_history
+from modules.machining_estimator import estimate_project_machining
+from modules.project_costing import load_cost_components, price_nesting_groups, project_point_costs
+from modules.cost_uncertainty import simulate_project_costs
+from modules.cost_sensitivity import project_sensitivity
+from modules.sheet_nesting import NESTING_TIME_BUDGET, nest_project_sheets
+from modules.stock_catalogue import fit_stock, fit_stock_batch, fit_project_stock, geometry_envelope
+from modules.unit_conversion import conversion_factor
 
 router = APIRouter()
 
-def calculate_raw_material_size(step_file, extra_x=10.0, extra_y=10.0, extra_z=10.0):
-    """Computes the required raw material size based on bounding box dimensions."""
-    analysis = analyze_step_file(step_file)
+def get_cached_analysis(step_file):
+    """Returns the geometry analysis of a STEP file, memoized by its content hash."""
+    fingerprint = geometry_fingerprint(step_file)
+    if fingerprint is None:
+        return None
+    analysis = GEOMETRY_CACHE.get(fingerprint)
+    if analysis is None:
+        analysis = analyze_step_file(step_file)
+        if analysis:
+            GEOMETRY_CACHE.put(fingerprint, analysis)
+    return analysis
+
+def calculate_raw_material_size(step_file, extra_x=10.0, extra_y=10.0, extra_z=10.0, material_id=None, pricing_type=None):
+    """
+    Computes the required raw material size for a part.
+
+    Uses the smallest standard stock from the stock catalogue when one fits,
+    otherwise falls back to the bounding box plus the given allowances.
+    """
+    analysis = get_cached_analysis(step_file)
     if not analysis:
         return None
     bbox = analysis["bounding_box"]
+
+    envelope, diameter = geometry_envelope(analysis, (extra_x, extra_y, extra_z))
+    stock = fit_stock_batch([{
+        "envelope": envelope,
+        "diameter": diameter,
+        "material_id": material_id,
+        "pricing_type": pricing_type,
+    }])[0]
+    if stock and stock.get("volume") is not None:
+        dims = stock["dimensions"]
+        cross_section = sorted(v for k, v in dims.items() if k not in ("length", "wall_thickness"))
+        if len(cross_section) == 1:
+            cross_section = cross_section * 2  # ✅ Round bar/tube: diameter in both directions
+        return {
+            "raw_x": dims["length"],
+            "raw_y": cross_section[-1],
+            "raw_z": cross_section[0],
+            "volume": stock["volume"],
+            "volume_unit": stock["volume_unit"],
+            "stock": stock,
+        }
+
     return {
         "raw_x": bbox["width"] + extra_x,
         "raw_y": bbox["depth"] + extra_y,
         "raw_z": bbox["height"] + extra_z,
+        "volume": envelope[0] * envelope[1] * envelope[2],
+        "volume_unit": "mm³",
     }
 
-def calculate_material_cost(step_file, material, classification, extra_x=10.0, extra_y=10.0, extra_z=10.0):
-    """Computes material cost based on raw material size and classification."""
-    raw_material_size = calculate_raw_material_size(step_file, extra_x, extra_y, extra_z)
-    if not raw_material_size:
+def calculate_material_cost(step_file, material, classification, extra_x=10.0, extra_y=10.0, extra_z=10.0, as_of=None):
+    """Computes material cost based on raw material size and classification, memoized per input set."""
+    fingerprint = geometry_fingerprint(step_file)
+    if fingerprint is None:
         return None
-    material_data = get_materials(material)
-    classification_data = get_part_classification(classification)
+    cache_key = cost_cache_key(fingerprint, material, classification, (extra_x, extra_y, extra_z), as_of)
+    cached = COST_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    cost_data = _calculate_material_cost(step_file, material, classification, extra_x, extra_y, extra_z, as_of)
+    if cost_data:
+        COST_CACHE.put(cache_key, cost_data)
+    return cost_data
+
+def _calculate_material_cost(step_file, material, classification, extra_x, extra_y, extra_z, as_of=None):
+    material_data = get_material(material)
+    classification_data = get_classification(classification)
     if not material_data or not classification_data:
         return None
+    if as_of:
+        material_data = materials_as_of(as_of)[material_data["id"]]
     pricing_type = classification_data["pricing_type"]
-    price_per_volume = material_data["price"][pricing_type]
-    raw_volume = raw_material_size["raw_x"] * raw_material_size["raw_y"] * raw_material_size["raw_z"]
-    raw_weight_kg = (raw_volume / 1e6) * material_data["density"]
-    total_cost = (raw_volume / 1e6) * price_per_volume
-    return {
+
+    raw_material_size = calculate_raw_material_size(
+        step_file, extra_x, extra_y, extra_z, material_id=material_data["id"], pricing_type=pricing_type
+    )
+    if not raw_material_size:
+        return None
+    raw_volume = raw_material_size["volume"] * conversion_factor(raw_material_size["volume_unit"], "mm³")
+
+    # ✅ Density is held in kg/mm³ and prices per kg by the material catalogue
+    raw_weight_kg = raw_volume * material_data["density"]
+    total_cost = convert_amounts(
+        [raw_weight_kg * material_unit_price(material_data, pricing_type)],
+        [material_price_currency(material_data, pricing_type)],
+    )[0]
+    cost_data = {
         "raw_material_size": raw_material_size,
         "raw_weight_kg": raw_weight_kg,
-        "cost": total_cost,
+        "cost": float(total_cost),
     }
+    if as_of:
+        # ✅ None when the material had no history yet and was priced at current prices
+        cost_data["price_as_of"] = material_data["price_as_of"]
+    return cost_data
 
 @router.get("/calculate_cost/")
-def get_material_cost(file_name: str, material: str, classification: str):
-    """API endpoint to calculate material cost for a given CAD file."""
+def get_material_cost(file_name: str, material: str, classification: str, as_of: Optional[str] = None):
+    """API endpoint to calculate material cost for a given CAD file, optionally at historical prices."""
     file_path = f"uploads/{file_name}"
     if not file_path:
         raise HTTPException(status_code=404, detail="File not found.")
-    cost_data = calculate_material_cost(file_path, material, classification)
+    cost_data = calculate_material_cost(file_path, material, classification, as_of=parse_as_of(as_of))
     if not cost_data:
         raise HTTPException(status_code=400, detail="Material cost calculation failed.")
+    cost_data = {**cost_data, "cost": present_amount(cost_data["cost"]), "currency": get_currency_context()["currency"]}
     return {"status": "success", "cost_data": cost_data}
+
+@router.get("/stock/fit")
+def get_stock_fit(
+    width: float,
+    depth: float,
+    height: float,
+    unit: str = "mm",
+    material_id: Optional[int] = None,
+    profile_id: Optional[int] = None,
+    pricing_type: Optional[str] = None,
+):
+    """Returns the smallest standard stock that holds a part envelope, plus its cut length."""
+    stock = fit_stock(
+        {"width": width, "depth": depth, "height": height, "unit": unit},
+        material_id=material_id, pricing_type=pricing_type, profile_id=profile_id,
+    )
+    if not stock:
+        raise HTTPException(status_code=404, detail="No catalogue stock fits this envelope.")
+    return {"status": "success", "stock": stock}
+
+@router.get("/stock/project/{project_id}")
+def get_project_stock(project_id: str, extra: float = 0.0):
+    """Fits standard stock for every part in a project."""
+    return {"status": "success", "parts": fit_project_stock(project_id, (extra, extra, extra))}
+
+@router.post("/machining/project/{project_id}")
+def estimate_machining(project_id: str, save: bool = True):
+    """Estimates machining hours and cost for all parts of a project and stores the breakdowns."""
+    try:
+        estimate = estimate_project_machining(project_id, save=save)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+    return {"status": "success", **estimate}
+
+@router.get("/nesting/project/{project_id}")
+def get_project_nesting(
+    project_id: str,
+    time_budget: float = NESTING_TIME_BUDGET,
+    placements: bool = False,
+    as_of: Optional[str] = None,
+):
+    """
+    Nests the project's sheet metal parts onto catalogue sheet sizes.
+
+    Returns sheet count, utilization and sheet material cost per material/thickness group.
+    """
+    if time_budget <= 0 or time_budget > 30:
+        raise HTTPException(status_code=400, detail="time_budget must be between 0 and 30 seconds.")
+
+    pricing = materials_as_of(parse_as_of(as_of))
+    groups = price_nesting_groups(nest_project_sheets(project_id, time_budget, include_placements=placements), pricing)
+    total_cost = sum(g["sheet_cost"] or 0.0 for g in groups)
+    rounded = present_amounts([g["sheet_cost"] or 0.0 for g in groups])
+    for group, value in zip(groups, rounded):
+        if group["sheet_cost"] is not None:
+            group["sheet_cost"] = float(value)
+    result = {
+        "status": "success",
+        "currency": get_currency_context()["currency"],
+        "groups": groups,
+        "sheet_count": sum(g["nesting"]["sheet_count"] for g in groups if g["nesting"]),
+        "sheet_cost": present_amount(total_cost),
+    }
+    if as_of:
+        result["prices_without_history"] = prices_without_history(pricing, [g["material_id"] for g in groups])
+    return result
+
+@router.get("/project/{project_id}")
+def get_project_cost(
+    project_id: str,
+    uncertainty: bool = False,
+    samples: int = 10000,
+    seed: Optional[int] = None,
+    per_part: bool = False,
+    as_of: Optional[str] = None,
+):
+    """
+    Returns the project's material and machining cost.
+
+    With `uncertainty=true`, also returns P10/P50/P90 bands from a Monte Carlo run
+    over the configured price, allowance, scrap and rate distributions. With `as_of`
+    (ISO date or datetime), materials are priced from the price history at that time;
+    materials with no history before then are listed in `prices_without_history`.
+    """
+    if samples < 1 or samples > 200000:
+        raise HTTPException(status_code=400, detail="samples must be between 1 and 200000.")
+
+    components = load_cost_components(project_id, as_of=parse_as_of(as_of))
+    result = {"status": "success", **project_point_costs(components)}
+    if as_of:
+        result["prices_without_history"] = components["prices_without_history"]
+    if uncertainty:
+        result["uncertainty"] = simulate_project_costs(components, samples=samples, seed=seed, per_part=per_part)
+    return result
+
+@router.get("/sensitivity/project/{project_id}")
+def get_project_sensitivity(project_id: str, delta: float = 10.0, top: Optional[int] = None, as_of: Optional[str] = None):
+    """
+    Ranks which inputs drive the project total.
+
+    Every material price, material stock allowance and operation rate is moved by
+    ±`delta` percent; all scenarios are evaluated in one batch and returned as a
+    tornado table sorted by swing.
+    """
+    if delta <= 0 or delta >= 100:
+        raise HTTPException(status_code=400, detail="delta must be between 0 and 100 percent.")
+    if top is not None and top < 1:
+        raise HTTPException(status_code=400, detail="top must be a positive integer.")
+
+    components = load_cost_components(project_id, as_of=parse_as_of(as_of))
+    result = {"status": "success", "currency": get_currency_context()["currency"], **project_sensitivity(components, delta / 100.0, top)}
+    if as_of:
+        result["prices_without_history"] = components["prices_without_history"]
+    return result
+
+@router.get("/cache/stats")
+def get_cost_cache_stats():
+    """Returns hit-rate metrics for the geometry and cost memoization caches."""
+    return cache_stats()
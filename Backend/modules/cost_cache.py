@@ -0,0 +1,144 @@
+# /modules/cost_cache.py
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from modules.db_utils import get_advanced_settings
+
+ADVANCED_SETTINGS = get_advanced_settings()
+COST_CACHE_SIZE = int(ADVANCED_SETTINGS.get("cost_cache_size", 512))
+COST_CACHE_TTL = float(ADVANCED_SETTINGS.get("cost_cache_ttl", 600))
+
+
+class MemoCache:
+    """Thread-safe LRU cache with a per-entry time-to-live and hit/miss counters."""
+
+    def __init__(self, name, max_size=COST_CACHE_SIZE, ttl=COST_CACHE_TTL):
+        self.name = name
+        self.max_size = max(1, int(max_size))
+        self.ttl = float(ttl)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, stored_at = entry
+            if self.ttl > 0 and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]  # ✅ Expired entries count as misses
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)  # ✅ Drop least recently used
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "name": self.name,
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+# ✅ Geometry analysis only depends on file content, so it survives catalogue edits
+GEOMETRY_CACHE = MemoCache("geometry")
+# ✅ Cost results depend on material, classification and settings as well
+COST_CACHE = MemoCache("cost")
+
+# ✅ Bumped on every catalogue/settings write so stale cost entries never match.
+# The counter is per process; the TTL bounds staleness when several workers run.
+_catalogue_version = 0
+_version_lock = threading.Lock()
+
+def get_catalogue_version():
+    return _catalogue_version
+
+def bump_catalogue_version():
+    """Invalidates cached cost results after a material, price, classification or settings change."""
+    global _catalogue_version
+    with _version_lock:
+        _catalogue_version += 1
+    COST_CACHE.clear()
+    return _catalogue_version
+
+def invalidate_geometry_cache():
+    """Drops cached geometry analyses, e.g. after the preferred length/area/volume units change."""
+    GEOMETRY_CACHE.clear()
+    return bump_catalogue_version()
+
+
+# ✅ File fingerprints are memoized by (path, size, mtime) to avoid re-hashing unchanged files
+_fingerprints = {}
+_fingerprint_lock = threading.Lock()
+
+def geometry_fingerprint(file_path):
+    """Returns a SHA-256 content hash of a CAD file, or None if the file is missing."""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+
+    stat_key = (os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns)
+    with _fingerprint_lock:
+        cached = _fingerprints.get(stat_key)
+    if cached:
+        return cached
+
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    fingerprint = digest.hexdigest()
+
+    with _fingerprint_lock:
+        _fingerprints[stat_key] = fingerprint
+    return fingerprint
+
+
+def cost_cache_key(fingerprint, material, classification, allowances, as_of=None):
+    """Builds the memoization key for a cost result."""
+    return (
+        fingerprint,
+        str(material),
+        str(classification),
+        tuple(round(float(a), 6) for a in allowances),
+        as_of,
+        get_catalogue_version(),
+    )
+
+
+def cache_stats():
+    return {
+        "catalogue_version": get_catalogue_version(),
+        "caches": [GEOMETRY_CACHE.stats(), COST_CACHE.stats()],
+    }
@@ -0,0 +1,116 @@
+# /modules/cost_sensitivity.py
+
+import numpy as np
+
+from modules.currency import present_amounts
+from modules.material_catalogue import get_material
+
+# ✅ Upper bound for one (scenarios × parts) block of the machining evaluation
+CHUNK_BYTES = 32 * 1024 * 1024
+
+
+def build_scenarios(components, delta):
+    """
+    One row per perturbed input: each material price, each material's stock allowance
+    and each operation rate, moved down and up by `delta` (a fraction).
+
+    Returns:
+        (parameters, price, allowance, rate) where the factor matrices have one row per
+        scenario and a trailing column of ones for parts without a material/operation.
+    """
+    materials, operations = components["materials"], components["operations"]
+    parameters = (
+        [("price", m) for m in materials]
+        + [("allowance", m) for m in materials]
+        + [("rate", o) for o in operations]
+    )
+    scenarios = 2 * len(parameters)
+    price = np.ones((scenarios, len(materials) + 1))
+    allowance = np.ones((scenarios, len(materials) + 1))
+    rate = np.ones((scenarios, len(operations) + 1))
+
+    targets = {"price": price, "allowance": allowance, "rate": rate}
+    columns = {"price": materials, "allowance": materials, "rate": operations}
+    for p, (kind, ref_id) in enumerate(parameters):
+        column = columns[kind].index(ref_id)
+        targets[kind][2 * p, column] = 1.0 - delta
+        targets[kind][2 * p + 1, column] = 1.0 + delta
+    return parameters, price, allowance, rate
+
+
+def evaluate_scenarios(components, price, allowance, rate):
+    """
+    Project totals for every scenario row in one batched evaluation.
+
+    Material cost is linear in price × allowance, so it reduces to a matrix product
+    over per-material base costs. Machining re-derives roughing time from the scaled
+    stock volume, evaluated as (scenarios × parts) blocks.
+    """
+    material_index = components["material_index"]
+    operation_index = components["operation_index"]
+    material_base = np.bincount(
+        material_index % price.shape[1], weights=components["material_cost"], minlength=price.shape[1]
+    )
+    material_totals = (price * allowance) @ material_base
+
+    stock = components["stock_volume"]
+    part = components["part_volume"]
+    removal_rate = np.where(components["removal_rate"] > 0, components["removal_rate"], np.inf)
+    finishing = components["finishing_hours"]
+    hourly = components["rate_per_hour"]
+
+    scenarios, parts = price.shape[0], len(stock)
+    machining_totals = np.zeros(scenarios)
+    chunk = max(1, CHUNK_BYTES // (max(parts, 1) * 8 * 3))
+    for start in range(0, scenarios, chunk):
+        stop = start + chunk
+        scaled_stock = allowance[start:stop][:, material_index] * stock
+        hours = finishing + np.clip(scaled_stock - part, 0.0, None) / removal_rate
+        machining_totals[start:stop] = (rate[start:stop][:, operation_index] * hours * hourly).sum(axis=1)
+
+    return material_totals + machining_totals
+
+
+def project_sensitivity(components, delta=0.1, top=None):
+    """
+    Tornado table for a project: each input moved by ±delta, ranked by the swing in total cost.
+    """
+    baseline = float(components["material_cost"].sum() + components["machining_cost"].sum())
+    parameters, price, allowance, rate = build_scenarios(components, delta)
+    if not parameters:
+        return {"baseline": float(present_amounts([baseline])[0]), "delta": delta, "rows": []}
+
+    totals = evaluate_scenarios(components, price, allowance, rate).reshape(-1, 2)
+    swing = np.abs(totals[:, 1] - totals[:, 0])
+    order = np.argsort(-swing, kind="stable")
+    if top:
+        order = order[:top]
+
+    operation_names = {}
+    for i, operation_id in enumerate(components["operations"]):
+        positions = np.flatnonzero(components["operation_index"] == i)
+        if len(positions):
+            operation_names[operation_id] = components["parts"][positions[0]].get("operation")
+
+    shown = present_amounts(np.column_stack([totals, totals - baseline, swing]))
+    rows = []
+    for rank, p in enumerate(order, start=1):
+        kind, ref_id = parameters[p]
+        if kind == "rate":
+            name = operation_names.get(ref_id) or f"Operation {ref_id}"
+        else:
+            material = get_material(ref_id)
+            name = material["name"] if material else f"Material {ref_id}"
+        rows.append({
+            "rank": rank,
+            "parameter": kind,
+            "ref_id": ref_id,
+            "name": name,
+            "low_total": float(shown[p, 0]),
+            "high_total": float(shown[p, 1]),
+            "low_change": float(shown[p, 2]),
+            "high_change": float(shown[p, 3]),
+            "swing": float(shown[p, 4]),
+        })
+
+    return {"baseline": float(present_amounts([baseline])[0]), "delta": delta, "rows": rows}
@@ -0,0 +1,210 @@
+# /modules/cost_uncertainty.py
+
+import sqlite3
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from modules.cost_cache import bump_catalogue_version
+from modules.currency import present_amounts
+from modules.db_utils import get_db_connection
+
+router = APIRouter()
+
+# ✅ Parameters that can be sampled and the scope they are configured on
+#   price     : multiplier on the material unit price       (material / global)
+#   allowance : multiplier on the stock mass                (material / global)
+#   scrap     : fraction of material lost, cost × (1+scrap) (material / global)
+#   rate      : multiplier on the machining hourly rate     (operation / global)
+PARAMETER_SCOPES = {"price": "material", "allowance": "material", "scrap": "material", "rate": "operation"}
+DISTRIBUTIONS = ("triangular", "uniform", "normal", "fixed")
+
+# ✅ Used when neither a specific nor a global row exists
+FALLBACK_DISTRIBUTIONS = {
+    "price": ("triangular", 1.0, 1.0, 1.0),
+    "allowance": ("triangular", 1.0, 1.0, 1.0),
+    "scrap": ("triangular", 0.0, 0.0, 0.0),
+    "rate": ("triangular", 1.0, 1.0, 1.0),
+}
+
+DEFAULT_PERCENTILES = (10, 50, 90)
+# ✅ Upper bound for a per-part sample block (samples × parts × 8 bytes)
+CHUNK_BYTES = 32 * 1024 * 1024
+
+# ✅ z-score of the 90th percentile; normal low/high are read as P10/P90
+Z_90 = 1.2815515655446004
+
+class CostDistribution(BaseModel):
+    scope: str                   # "global", "material" or "operation"
+    ref_id: int = 0              # Material/operation ID, 0 for global rows
+    parameter: str               # "price", "allowance", "scrap" or "rate"
+    distribution: str = "triangular"
+    low: float
+    mode: float
+    high: float
+
+
+def load_distributions():
+    """Returns {(scope, ref_id, parameter): (distribution, low, mode, high)}."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT scope, ref_id, parameter, distribution, low, mode, high FROM cost_distributions")
+    rows = cursor.fetchall()
+    conn.close()
+    return {
+        (row["scope"], row["ref_id"], row["parameter"]): (row["distribution"], row["low"], row["mode"], row["high"])
+        for row in rows
+    }
+
+
+def resolve_distribution(distributions, parameter, ref_id):
+    scope = PARAMETER_SCOPES[parameter]
+    return (
+        distributions.get((scope, ref_id, parameter))
+        or distributions.get(("global", 0, parameter))
+        or FALLBACK_DISTRIBUTIONS[parameter]
+    )
+
+
+def draw(spec, size, rng):
+    """Draws `size` samples from a (distribution, low, mode, high) spec."""
+    distribution, low, mode, high = spec
+    if distribution == "fixed" or low == high:
+        return np.full(size, float(mode))
+    if distribution == "uniform":
+        return rng.uniform(low, high, size)
+    if distribution == "normal":
+        sigma = (high - low) / (2 * Z_90)
+        return np.clip(rng.normal(mode, sigma, size), 0.0, None)
+    return rng.triangular(low, min(max(mode, low), high), high, size)
+
+
+def sample_factor_matrix(distributions, parameter, ref_ids, samples, rng):
+    """(samples, len(ref_ids) + 1) matrix; the trailing column of ones serves parts with no reference (-1)."""
+    columns = [draw(resolve_distribution(distributions, parameter, ref_id), samples, rng) for ref_id in ref_ids]
+    columns.append(np.ones(samples))
+    return np.column_stack(columns)
+
+
+def simulate_project_costs(components, samples=10000, seed=None, per_part=False, percentiles=DEFAULT_PERCENTILES):
+    """
+    Monte Carlo cost bands for a project.
+
+    Every sample draws one price/allowance/scrap factor per material and one rate factor
+    per operation, shared by all parts using them. Project totals reduce to two small
+    matrix products; per-part bands are evaluated in part chunks to bound memory.
+    """
+    rng = np.random.default_rng(seed)
+    distributions = load_distributions()
+
+    price = sample_factor_matrix(distributions, "price", components["materials"], samples, rng)
+    allowance = sample_factor_matrix(distributions, "allowance", components["materials"], samples, rng)
+    scrap = sample_factor_matrix(distributions, "scrap", components["materials"], samples, rng)
+    scrap[:, -1] = 0.0
+    rate = sample_factor_matrix(distributions, "rate", components["operations"], samples, rng)
+    # ✅ Base material costs already carry the modal scrap, so samples scale relative to it
+    material_factor = price * allowance * (1.0 + scrap) / (1.0 + components["scrap"])
+
+    material_index = components["material_index"]
+    operation_index = components["operation_index"]
+    material_cost = components["material_cost"]
+    machining_cost = components["machining_cost"]
+
+    # ✅ Base cost per material/operation column (unassigned parts land in the trailing column)
+    material_base = np.bincount(material_index % material_factor.shape[1], weights=material_cost, minlength=material_factor.shape[1])
+    machining_base = np.bincount(operation_index % rate.shape[1], weights=machining_cost, minlength=rate.shape[1])
+    totals = material_factor @ material_base + rate @ machining_base
+
+    result = {
+        "samples": samples,
+        "percentiles": list(percentiles),
+        "total": _bands(totals, percentiles),
+        "material_cost": _bands(material_factor @ material_base, percentiles),
+        "machining_cost": _bands(rate @ machining_base, percentiles),
+    }
+
+    if per_part and len(components["parts"]):
+        chunk = max(1, CHUNK_BYTES // (samples * 8 * 3))
+        bands = []
+        for start in range(0, len(components["parts"]), chunk):
+            stop = start + chunk
+            part_costs = (
+                material_cost[start:stop] * material_factor[:, material_index[start:stop]]
+                + machining_cost[start:stop] * rate[:, operation_index[start:stop]]
+            )
+            bands.append(np.percentile(part_costs, percentiles, axis=0).T)
+        bands = present_amounts(np.vstack(bands))
+        result["parts"] = [
+            {**part, "bands": {f"p{p}": float(v) for p, v in zip(percentiles, bands[i])}}
+            for i, part in enumerate(components["parts"])
+        ]
+
+    return result
+
+
+def _bands(values, percentiles):
+    return {f"p{p}": float(v) for p, v in zip(percentiles, present_amounts(np.percentile(values, percentiles)))}
+
+
+# ✅ API: Fetch Cost Distributions
+@router.get("/")
+def get_cost_distributions():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM cost_distributions")
+    distributions = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return distributions
+
+# ✅ API: Add or Replace a Cost Distribution
+@router.put("/")
+def upsert_cost_distribution(distribution: CostDistribution):
+    if distribution.parameter not in PARAMETER_SCOPES:
+        raise HTTPException(status_code=400, detail=f"Unknown parameter '{distribution.parameter}'.")
+    if distribution.scope not in ("global", PARAMETER_SCOPES[distribution.parameter]):
+        raise HTTPException(status_code=400, detail=f"Parameter '{distribution.parameter}' cannot be set on scope '{distribution.scope}'.")
+    if distribution.distribution not in DISTRIBUTIONS:
+        raise HTTPException(status_code=400, detail=f"Unknown distribution '{distribution.distribution}'.")
+    if not distribution.low <= distribution.mode <= distribution.high:
+        raise HTTPException(status_code=400, detail="Expected low <= mode <= high.")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO cost_distributions (scope, ref_id, parameter, distribution, low, mode, high)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(scope, ref_id, parameter) DO UPDATE SET
+                distribution = excluded.distribution, low = excluded.low,
+                mode = excluded.mode, high = excluded.high
+        """, (
+            distribution.scope,
+            distribution.ref_id if distribution.scope != "global" else 0,
+            distribution.parameter,
+            distribution.distribution,
+            distribution.low,
+            distribution.mode,
+            distribution.high,
+        ))
+        conn.commit()
+        bump_catalogue_version()
+        return {"message": "Cost distribution saved successfully."}
+
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    finally:
+        conn.close()
+
+# ✅ API: Delete a Cost Distribution
+@router.delete("/{distribution_id}")
+def delete_cost_distribution(distribution_id: int):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM cost_distributions WHERE id = ?", (distribution_id,))
+    conn.commit()
+    conn.close()
+    bump_catalogue_version()
+    return {"message": f"Cost distribution ID '{distribution_id}' deleted successfully."}
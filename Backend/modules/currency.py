@@ -0,0 +1,174 @@
+# /modules/currency.py
+
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from modules.cost_cache import bump_catalogue_version, get_catalogue_version
+from modules.db_utils import get_db_connection
+
+router = APIRouter()
+
+# ✅ Symbols accepted in free-text price units such as "₹/kg"
+CURRENCY_SYMBOLS = {"₹": "INR", "$": "USD", "€": "EUR", "£": "GBP", "¥": "JPY"}
+DEFAULT_QUANTITY_UNIT = "kg"
+# ✅ Currency of the seeded catalogue; used when no base_currency setting exists
+SEEDED_BASE_CURRENCY = "INR"
+
+class CurrencyRate(BaseModel):
+    currency: str
+    rate: float     # Reference units per one unit of this currency
+
+
+@lru_cache(maxsize=256)
+def parse_price_unit(price_unit):
+    """
+    Splits a free-text price unit into (currency, quantity unit).
+
+    "INR/kg" -> ("INR", "kg"), "$ per lb" -> ("USD", "lb"), "kg" or "per kg" -> (None, "kg").
+    A missing currency means the base currency the catalogue was entered in.
+    """
+    text = (price_unit or "").strip()
+    if text.lower().startswith("per "):
+        text = text[4:].strip()
+    if " per " in text:
+        text = text.replace(" per ", "/")
+    if "/" not in text:
+        code = CURRENCY_SYMBOLS.get(text, text.upper())
+        if text in CURRENCY_SYMBOLS or (len(text) == 3 and text.isalpha() and text.isupper()):
+            return code, DEFAULT_QUANTITY_UNIT
+        return None, text or DEFAULT_QUANTITY_UNIT
+
+    currency, quantity_unit = (part.strip() for part in text.split("/", 1))
+    currency = CURRENCY_SYMBOLS.get(currency, currency.upper()) or None
+    return currency, quantity_unit or DEFAULT_QUANTITY_UNIT
+
+
+# ✅ Rates and presentation settings, reloaded when the catalogue version changes
+_context_lock = threading.Lock()
+_context_state = {"version": None, "context": None}
+_warned = set()
+
+def get_currency_context():
+    """
+    Returns {"currency": display currency, "base_currency": currency of prices and rates
+    stored without one, "precision": decimals, "rates": {code: rate}}.
+    """
+    version = get_catalogue_version()
+    with _context_lock:
+        if _context_state["version"] != version:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            cursor.execute(
+                "SELECT setting, value FROM advanced_settings WHERE setting IN ('default_currency', 'base_currency', 'rounding_precision')"
+            )
+            settings = {row["setting"]: row["value"] for row in cursor.fetchall()}
+            cursor.execute("SELECT currency, rate FROM currency_rates")
+            rates = {row["currency"]: float(row["rate"]) for row in cursor.fetchall()}
+            conn.close()
+
+            try:
+                precision = int(float(settings.get("rounding_precision", 2)))
+            except (TypeError, ValueError):
+                precision = 2
+            _context_state["context"] = {
+                "currency": (settings.get("default_currency") or SEEDED_BASE_CURRENCY).upper(),
+                "base_currency": (settings.get("base_currency") or SEEDED_BASE_CURRENCY).upper(),
+                "precision": precision,
+                "rates": rates,
+            }
+            _context_state["version"] = version
+        return _context_state["context"]
+
+
+def _factor(source, target, rates):
+    if source == target:
+        return 1.0
+    if source not in rates or target not in rates or rates[target] == 0:
+        if (source, target) not in _warned:
+            _warned.add((source, target))
+            print(f"⚠️ No exchange rate for {source} -> {target}; amounts left unconverted.")
+        return 1.0
+    return rates[source] / rates[target]
+
+
+def conversion_factors(currencies, target=None):
+    """One factor per entry of `currencies` (None = base currency), looked up once per distinct code."""
+    context = get_currency_context()
+    target = (target or context["currency"]).upper()
+    # ✅ Never read a missing currency as the display currency: that would relabel instead of convert
+    codes = np.array([c or context["base_currency"] for c in currencies], dtype=object)
+    if not len(codes):
+        return np.zeros(0)
+    unique, inverse = np.unique(codes.astype(str), return_inverse=True)
+    factors = np.array([_factor(code, target, context["rates"]) for code in unique])
+    return factors[inverse]
+
+
+def convert_amounts(amounts, currencies, target=None):
+    """
+    Converts an array of amounts, each in its own currency (None = base currency), to `target`
+    (default: display currency).
+    """
+    return np.asarray(amounts, dtype=float) * conversion_factors(currencies, target)
+
+
+def present_amounts(values):
+    """Rounds amounts for display; apply once, after all arithmetic."""
+    return np.round(np.asarray(values, dtype=float), get_currency_context()["precision"])
+
+
+def present_amount(value):
+    return float(present_amounts([value])[0])
+
+
+# ✅ API: Fetch Currency Rates
+@router.get("/")
+def get_currency_rates():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM currency_rates ORDER BY currency")
+    rates = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    context = get_currency_context()
+    return {"display_currency": context["currency"], "base_currency": context["base_currency"], "rates": rates}
+
+# ✅ API: Add or Update a Currency Rate
+@router.put("/")
+def upsert_currency_rate(rate: CurrencyRate):
+    currency = rate.currency.strip().upper()
+    if not currency or rate.rate <= 0:
+        raise HTTPException(status_code=400, detail="Currency code and a positive rate are required.")
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO currency_rates (currency, rate, updated_at) VALUES (?, ?, CURRENT_TIMESTAMP)
+            ON CONFLICT(currency) DO UPDATE SET rate = excluded.rate, updated_at = excluded.updated_at
+        """, (currency, rate.rate))
+        conn.commit()
+        bump_catalogue_version()
+        return {"message": f"Rate for '{currency}' saved successfully."}
+
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    finally:
+        conn.close()
+
+# ✅ API: Delete a Currency Rate
+@router.delete("/{currency}")
+def delete_currency_rate(currency: str):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM currency_rates WHERE currency = ?", (currency.upper(),))
+    conn.commit()
+    conn.close()
+    bump_catalogue_version()
+    return {"message": f"Rate for '{currency.upper()}' deleted successfully."}
@@ -0,0 +1,22 @@
+# /modules/db_utils.py
+
+import sqlite3
+
+# ✅ Database file path
+DB_FILE = "database.db"
+
+def get_db_connection(check_same_thread=True):
+    # ✅ check_same_thread=False for streaming responses, which advance their generator from worker threads
+    conn = sqlite3.connect(DB_FILE, timeout=5, check_same_thread=check_same_thread)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA busy_timeout = 5000;")  # ✅ Prevent DB lock issues
+    return conn
+
+# ✅ Fetch advanced settings
+def get_advanced_settings():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT setting, value FROM advanced_settings;")
+    settings = {row["setting"]: row["value"] for row in cursor.fetchall()}
+    conn.close()
+    return settings
@@ -0,0 +1,18 @@
+# /modules/file_utils.py
+
+import os
+import uuid
+
+
+def write_atomic(path, data):
+    """Writes bytes under a unique temporary name and renames it into place."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+    try:
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+    return path
@@ -1,11 +1,19 @@
 from fastapi import APIRouter, HTTPException
 import cadquery as cq
+import gzip
+import io
 import os
 import sqlite3
+import time
 from cadquery import exporters
+from OCP.TopoDS import TopoDS_Iterator
 import json
 
 from modules.unit_conversion import convert_units
+from modules.oriented_bounds import compute_oriented_bounds
+from modules.topology_features import topology_stats
+from modules.cost_cache import geometry_fingerprint
+from modules.file_utils import write_atomic
 
 router = APIRouter()
 
@@ -31,12 +39,24 @@ def get_advanced_settings():
 # ✅ Load settings dynamically from SQLite
 ADVANCED_SETTINGS = get_advanced_settings()
 PROJECTION_FOLDER = ADVANCED_SETTINGS.get("PROJECTION_FOLDER", "projections")
+ORIENTED_BBOX_ENABLED = str(ADVANCED_SETTINGS.get("oriented_bbox_enabled", "true")).lower() in ("true", "1", "yes")
+ORIENTED_BBOX_TIME_BUDGET = float(ADVANCED_SETTINGS.get("oriented_bbox_time_budget", 2.0))
+ORIENTED_BBOX_MAX_FACES = int(ADVANCED_SETTINGS.get("oriented_bbox_max_faces", 20000))
+TESSELLATION_TOLERANCE = float(ADVANCED_SETTINGS.get("tessellation_tolerance", 0.5))
+# ✅ Native BREP sidecars of imported STEP files, keyed by STEP content hash
+BREP_CACHE_ENABLED = str(ADVANCED_SETTINGS.get("brep_cache_enabled", "true")).lower() in ("true", "1", "yes")
+BREP_CACHE_COMPRESS = str(ADVANCED_SETTINGS.get("brep_cache_compress", "true")).lower() in ("true", "1", "yes")
+BREP_CACHE_FOLDER = ADVANCED_SETTINGS.get("BREP_CACHE_FOLDER", "brep_cache")
+# ✅ Sidecars outlive the files they came from; unused ones are evicted by age, then by size
+BREP_CACHE_MAX_MB = float(ADVANCED_SETTINGS.get("brep_cache_max_mb", 2048))
+BREP_CACHE_MAX_AGE_DAYS = float(ADVANCED_SETTINGS.get("brep_cache_max_age_days", 30))
 
 # ✅ Enable or Disable Debug Mode
 DEBUG_MODE = False  # Set to False to disable debug prints
 
 # ✅ Ensure directory exists
 os.makedirs(PROJECTION_FOLDER, exist_ok=True)
+os.makedirs(BREP_CACHE_FOLDER, exist_ok=True)
 
 # ✅ Fetch user-selected target units dynamically from SQLite
 def get_unit_preference(unit_type):
@@ -62,11 +82,89 @@ def get_unit_preference_route(unit_type: str):
         raise HTTPException(status_code=500, detail=f"Error fetching unit preference: {str(e)}")
 
 
+# ✅ Load a STEP file once so analysis, projection and mesh export can share it
+def brep_sidecar_path(step_file):
+    """Sidecar path for a STEP file's content, or None if the file is missing."""
+    fingerprint = geometry_fingerprint(step_file)
+    if not fingerprint:
+        return None
+    return os.path.join(BREP_CACHE_FOLDER, f"{fingerprint}.brep" + (".gz" if BREP_CACHE_COMPRESS else ""))
+
+def read_brep_sidecar(path):
+    with open(path, "rb") as f:
+        data = f.read()
+    try:
+        os.utime(path)  # ✅ mtime doubles as the last-use time for eviction
+    except OSError:
+        pass
+    return shape_from_brep(gzip.decompress(data) if path.endswith(".gz") else data)
+
+def prune_brep_cache():
+    """
+    Deletes BREP cache files (STEP sidecars and assembly solids) not used for
+    BREP_CACHE_MAX_AGE_DAYS, then the least recently used ones until the folder fits
+    in BREP_CACHE_MAX_MB. Returns the number of files removed.
+    """
+    entries = []
+    for entry in os.scandir(BREP_CACHE_FOLDER):
+        if entry.is_file() and entry.name.endswith((".brep", ".brep.gz")):
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+    entries.sort()
+
+    cutoff = time.time() - BREP_CACHE_MAX_AGE_DAYS * 86400
+    total = sum(size for _, size, _ in entries)
+    limit = BREP_CACHE_MAX_MB * 1024 * 1024
+    removed = 0
+    for mtime, size, path in entries:
+        if mtime >= cutoff and total <= limit:
+            break
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass  # ✅ Another worker evicted it first
+        total -= size
+    return removed
+
+def load_step(step_file):
+    """
+    Loads a STEP file, from its BREP sidecar when one exists. The first import writes the
+    sidecar, so later analyses, projections and mesh exports skip the STEP translator.
+    """
+    sidecar = brep_sidecar_path(step_file) if BREP_CACHE_ENABLED else None
+    if sidecar and os.path.exists(sidecar):
+        try:
+            return read_brep_sidecar(sidecar)
+        except Exception as e:
+            print(f"⚠️ Unreadable BREP sidecar {sidecar}, re-importing STEP: {e}")
+
+    part = cq.importers.importStep(step_file)
+    if sidecar:
+        try:
+            data = shape_to_brep(part)
+            write_atomic(sidecar, gzip.compress(data, compresslevel=1) if sidecar.endswith(".gz") else data)
+            prune_brep_cache()
+        except Exception as e:
+            print(f"⚠️ Could not write BREP sidecar: {e}")
+    return part
+
+
 # ✅ Analyze STEP file and return JSON-based geometric details
 def analyze_step_file(step_file):
     try:
-        # ✅ Load STEP File
-        part = cq.importers.importStep(step_file)
+        return analyze_shape(load_step(step_file))
+    except Exception as e:
+        print(f"❌ Error analyzing STEP file: {e}")
+        return None
+
+
+def analyze_shape(part):
+    """Geometric details of an already loaded cadquery Workplane."""
+    try:
         bbox = part.val().BoundingBox()
         
         # ✅ Extract original values (SI units: mm, mm², mm³)
@@ -110,11 +208,63 @@ def analyze_step_file(step_file):
             }
         }
 
+        # ✅ Optional orientation-independent envelope, stored beside the axis-aligned box
+        if ORIENTED_BBOX_ENABLED:
+            oriented = compute_oriented_bounds(
+                part.val(), ORIENTED_BBOX_TIME_BUDGET, TESSELLATION_TOLERANCE, ORIENTED_BBOX_MAX_FACES
+            )
+            if oriented:
+                obb = oriented["oriented_bounding_box"]
+                cylinder = oriented["enclosing_cylinder"]
+                converted_values["oriented_bounding_box"] = {
+                    "length": convert_units(obb["length"], "mm", length_unit),
+                    "width": convert_units(obb["width"], "mm", length_unit),
+                    "height": convert_units(obb["height"], "mm", length_unit),
+                    "extents_xyz": [convert_units(v, "mm", length_unit) for v in obb["extents_xyz"]],
+                    "axes": obb["axes"],
+                    "unit": length_unit
+                }
+                converted_values["enclosing_cylinder"] = {
+                    "diameter": convert_units(cylinder["diameter"], "mm", length_unit),
+                    "length": convert_units(cylinder["length"], "mm", length_unit),
+                    "axis": cylinder["axis"],
+                    "unit": length_unit
+                }
+
+        # ✅ Face types, holes, planar areas, thinnest wall and edge length from one topology pass
+        topology = topology_stats(part)
+        wall = topology["thinnest_wall"]
+        converted_values["topology"] = {
+            "face_types": topology["face_types"],
+            "planar_area": {
+                "total": convert_units(topology["planar_area_total"], "mm²", area_unit),
+                "largest": [convert_units(a, "mm²", area_unit) for a in topology["planar_areas"]],
+                "unit": area_unit
+            },
+            "holes": [
+                {
+                    **hole,
+                    "diameter": convert_units(hole["diameter"], "mm", length_unit),
+                    "depth": convert_units(hole["depth"], "mm", length_unit),
+                    "unit": length_unit
+                }
+                for hole in topology["holes"]
+            ],
+            "thinnest_wall": {
+                "value": convert_units(wall, "mm", length_unit),
+                "unit": length_unit
+            } if wall is not None else None,
+            "edge_length": {
+                "value": convert_units(topology["edge_length"], "mm", length_unit),
+                "unit": length_unit
+            }
+        }
+
         # ✅ Final Analysis Result in JSON Format
         analysis_result = {
             **converted_values,  # ✅ Store as JSON
-            "faces": part.faces().size(),
-            "edges": part.edges().size(),
+            "faces": topology["faces"],
+            "edges": topology["edges"],
             "components": len(part.objects)
         }
 
@@ -122,7 +272,7 @@ def analyze_step_file(step_file):
 
         return analysis_result
     except Exception as e:
-        print(f"❌ Error analyzing STEP file: {e}")
+        print(f"❌ Error analyzing shape: {e}")
         return None
 
 @router.get("/analyze/")
@@ -136,18 +286,39 @@ def analyze_geometry(file_name: str):
         raise HTTPException(status_code=400, detail="Failed to analyze geometry.")
     return {"status": "success", "data": result}
 
-def generate_2d_projection(step_file, svg_path):
-    """Generates a 2D SVG projection of the STEP file without XYZ axes."""
+def generate_2d_projection(step_file, svg_path, part=None, projection_dir=None):
+    """
+    Generates a 2D SVG projection of the STEP file without XYZ axes; pass `part` to reuse a
+    loaded shape and `projection_dir` (x, y, z) to look from another direction than cadquery's default.
+    """
     try:
-        part = cq.importers.importStep(step_file)
+        if part is None:
+            part = load_step(step_file)
         os.makedirs(os.path.dirname(svg_path), exist_ok=True)
 
-        exporters.export(
-            part, svg_path, exporters.ExportTypes.SVG,
-            opt={"showAxes": False}  # Removes XYZ axes
-        )
+        opt = {"showAxes": False}  # Removes XYZ axes
+        if projection_dir:
+            opt["projectionDir"] = tuple(projection_dir)
+        exporters.export(part, svg_path, exporters.ExportTypes.SVG, opt=opt)
 
         return svg_path
     except Exception as e:
         print(f"❌ Error generating SVG: {e}")
         return None
+
+# ✅ BREP round trip: far cheaper than re-reading STEP when another process needs the shape.
+# The Workplane's objects are always wrapped in one compound so the object list survives intact.
+def shape_to_brep(part):
+    buffer = io.BytesIO()
+    cq.Compound.makeCompound(part.vals()).exportBrep(buffer)
+    return buffer.getvalue()
+
+def shape_from_brep(data):
+    # ✅ The iterator does not own the compound it walks, so keep the imported shape alive until done
+    compound = cq.Shape.importBrep(io.BytesIO(data))
+    iterator = TopoDS_Iterator(compound.wrapped)
+    objects = []
+    while iterator.More():
+        objects.append(cq.Shape.cast(iterator.Value()))
+        iterator.Next()
+    return cq.Workplane("XY").newObject(objects)
@@ -0,0 +1,205 @@
+# /modules/machining_estimator.py
+
+import json
+import sqlite3
+
+import numpy as np
+
+from modules.currency import convert_amounts
+from modules.db_utils import get_advanced_settings, get_db_connection
+from modules.material_catalogue import get_material_catalogue, material_property
+from modules.stock_catalogue import fit_stock_batch, geometry_envelope
+from modules.unit_conversion import conversion_factor
+
+ADVANCED_SETTINGS = get_advanced_settings()
+# ✅ Fallback rates (cm³/min and cm²/min) when a material has no removal/finishing properties
+DEFAULT_REMOVAL_RATE = float(ADVANCED_SETTINGS.get("default_removal_rate", 10))
+DEFAULT_FINISHING_RATE = float(ADVANCED_SETTINGS.get("default_finishing_rate", 50))
+
+# ✅ Material property names holding the machining rates
+REMOVAL_RATE_PROPERTY = "Material Removal Rate"
+FINISHING_RATE_PROPERTY = "Finishing Rate"
+
+MACHINING_CATEGORY = "Machining Operations"
+TURNING_PROFILES = ("Round Bar", "Circular Tube")
+
+
+def _quantity_mm(quantity, target_unit):
+    """Reads a {"value", "unit"} geometry entry and converts it to a mm-based unit."""
+    if not isinstance(quantity, dict):
+        return 0.0
+    return float(quantity.get("value") or 0.0) * conversion_factor(quantity.get("unit") or target_unit, target_unit)
+
+
+def load_material_rates():
+    """Returns {material_id: (removal mm³/h, finishing mm²/h)} from the material catalogue."""
+    return {
+        material_id: (
+            material_property(material, REMOVAL_RATE_PROPERTY, "mm³/hour", "cm³/min"),
+            material_property(material, FINISHING_RATE_PROPERTY, "mm²/hour", "cm²/min"),
+        )
+        for material_id, material in get_material_catalogue().materials.items()
+    }
+
+
+def load_machining_operations():
+    """Returns {classification_id: [operation, ...]} for enabled time-based machining operations."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT o.id, o.name, o.default_rate, o.costing_unit, opc.classification_id
+        FROM operations o
+        JOIN costing_defaults c ON o.costing_default_id = c.id
+        JOIN operation_part_classification opc ON opc.operation_id = o.id
+        WHERE c.type = 'Time Based' AND o.category = ? AND o.enabled = 1
+    """, (MACHINING_CATEGORY,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    operations = {}
+    for row in rows:
+        operation = dict(row)
+        # ✅ Rates are stored per costing_unit (e.g. per hr); normalize to per hour
+        operation["rate_per_hour"] = float(operation["default_rate"]) * conversion_factor("hour", operation["costing_unit"] or "hour")
+        operations.setdefault(row["classification_id"], []).append(operation)
+    return operations
+
+
+def select_operation(operations, stock_profile):
+    """Turning for round stock, milling otherwise, limited to what the classification allows."""
+    if not operations:
+        return None
+    preferred = "Turning" if stock_profile in TURNING_PROFILES else "Milling"
+    return next((op for op in operations if op["name"].lower() == preferred.lower()), operations[0])
+
+
+def estimate_project_machining(project_id, save=True):
+    """
+    Estimates machining hours and cost for every part of a project in one vectorized pass.
+
+    Removed volume is stock volume minus part volume; roughing time uses the material's
+    removal rate and finishing time uses the part surface area and finishing rate.
+    Per-part breakdowns are written to `machining_details.time_estimate` in one transaction.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT part_id, name, classification_id, geometry_details, raw_material_details, machining_details
+        FROM parts WHERE project_id = ?
+    """, (project_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    parts = []
+    for row in rows:
+        try:
+            geometry = json.loads(row["geometry_details"] or "{}")
+            raw_details = json.loads(row["raw_material_details"] or "{}")
+            machining = json.loads(row["machining_details"] or "{}")
+        except json.JSONDecodeError:
+            continue
+        parts.append({
+            "part_id": row["part_id"],
+            "name": row["name"],
+            "classification_id": row["classification_id"],
+            "geometry": geometry,
+            "raw": raw_details,
+            "machining": machining,
+        })
+
+    if not parts:
+        return {"parts": [], "total_hours": 0.0, "total_cost": 0.0}
+
+    # ✅ Stock volume: saved raw material volume, else the best-fit catalogue stock
+    stock_volume = np.array([
+        _quantity_mm({"value": p["raw"].get("volume"), "unit": p["raw"].get("volume_unit")}, "mm³")
+        for p in parts
+    ])
+    missing = [i for i, volume in enumerate(stock_volume) if volume <= 0 and parts[i]["geometry"].get("bounding_box")]
+    stock_profiles = [None] * len(parts)
+    if missing:
+        requests = []
+        for i in missing:
+            envelope, diameter = geometry_envelope(parts[i]["geometry"])
+            requests.append({"envelope": envelope, "diameter": diameter, "material_id": parts[i]["raw"].get("material_id")})
+        for i, fit, request in zip(missing, fit_stock_batch(requests), requests):
+            if fit and fit.get("volume") is not None:
+                stock_volume[i] = fit["volume"] * conversion_factor(fit["volume_unit"], "mm³")
+                stock_profiles[i] = fit["profile"]
+            else:
+                a, b, c = request["envelope"]
+                stock_volume[i] = a * b * c
+
+    part_volume = np.array([_quantity_mm(p["geometry"].get("volume"), "mm³") for p in parts])
+    surface_area = np.array([_quantity_mm(p["geometry"].get("surface_area"), "mm²") for p in parts])
+
+    material_rates = load_material_rates()
+    default_removal = DEFAULT_REMOVAL_RATE * conversion_factor("cm³/min", "mm³/hour")
+    default_finishing = DEFAULT_FINISHING_RATE * conversion_factor("cm²/min", "mm²/hour")
+    removal_rate = np.array([
+        material_rates.get(p["raw"].get("material_id"), (None, None))[0] or default_removal for p in parts
+    ])
+    finishing_rate = np.array([
+        material_rates.get(p["raw"].get("material_id"), (None, None))[1] or default_finishing for p in parts
+    ])
+
+    operations_by_class = load_machining_operations()
+    selected = [
+        select_operation(operations_by_class.get(p["classification_id"], []), stock_profiles[i] or p["raw"].get("stock_profile"))
+        for i, p in enumerate(parts)
+    ]
+    # ✅ Operation rates are stored in the base currency; costs are reported in the display currency
+    hourly_rate = convert_amounts([op["rate_per_hour"] if op else 0.0 for op in selected], [None] * len(selected))
+
+    # ✅ Vectorized estimate for the whole project
+    removed_volume = np.clip(stock_volume - part_volume, 0.0, None)
+    roughing_hours = removed_volume / removal_rate
+    finishing_hours = surface_area / finishing_rate
+    total_hours = roughing_hours + finishing_hours
+    cost = total_hours * hourly_rate
+
+    breakdowns = []
+    for i, part in enumerate(parts):
+        operation = selected[i]
+        breakdowns.append({
+            "part_id": part["part_id"],
+            "name": part["name"],
+            "operation": operation["name"] if operation else None,
+            "operation_id": operation["id"] if operation else None,
+            "stock_volume": float(stock_volume[i]),
+            "part_volume": float(part_volume[i]),
+            "removed_volume": float(removed_volume[i]),
+            "volume_unit": "mm³",
+            "surface_area": float(surface_area[i]),
+            "area_unit": "mm²",
+            "removal_rate": float(removal_rate[i]),
+            "roughing_hours": float(roughing_hours[i]),
+            "finishing_hours": float(finishing_hours[i]),
+            "hours": float(total_hours[i]),
+            "rate_per_hour": float(hourly_rate[i]),
+            "cost": float(cost[i]),
+        })
+
+    if save:
+        updates = []
+        for part, breakdown in zip(parts, breakdowns):
+            machining = dict(part["machining"])
+            machining["time_estimate"] = {k: v for k, v in breakdown.items() if k not in ("part_id", "name")}
+            updates.append((json.dumps(machining), part["part_id"]))
+
+        conn = get_db_connection()
+        try:
+            conn.execute("BEGIN")
+            conn.executemany("UPDATE parts SET machining_details = ? WHERE part_id = ?", updates)
+            conn.commit()
+        except sqlite3.OperationalError:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    return {
+        "parts": breakdowns,
+        "total_hours": float(total_hours.sum()),
+        "total_cost": float(cost.sum()),
+    }
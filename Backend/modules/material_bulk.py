@@ -0,0 +1,443 @@
+# /modules/material_bulk.py
+
+import codecs
+import csv
+import io
+import json
+import math
+import os
+import re
+import sqlite3
+import tempfile
+import unicodedata
+from typing import Optional
+from urllib.parse import quote
+
+from fastapi import APIRouter, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+
+from modules.cost_cache import bump_catalogue_version
+from modules.currency import parse_price_unit
+from modules.db_utils import get_db_connection
+from modules.material_catalogue import PriceUnitError, kg_factor
+from modules.price_history import append_price_history
+from modules.unit_conversion import ureg
+
+try:
+    import openpyxl  # ✅ Optional: only needed for .xlsx import/export
+except ImportError:
+    openpyxl = None
+
+router = APIRouter()
+
+# ✅ Flat column layout shared by import and export
+MATERIAL_COLUMNS = ("name", "density", "density_unit")
+COSTING_COLUMNS = ("block_price", "block_price_unit", "sheet_price", "sheet_price_unit")
+PRICE_COLUMNS = ("block_price", "sheet_price")
+PROPERTY_PREFIX = "property:"
+PROPERTY_UNIT_PREFIX = "property_unit:"
+
+FORMATS = ("csv", "xlsx", "json")
+MAX_REPORTED_ERRORS = 100
+EXPORT_CHUNK_ROWS = 500
+KEEP_UNIT = object()
+
+
+def detect_format(filename, requested=None):
+    if requested and requested != "auto":
+        fmt = requested.lower()
+    else:
+        fmt = (filename or "").rsplit(".", 1)[-1].lower()
+    if fmt not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{fmt}'. Use one of: {', '.join(FORMATS)}.")
+    if fmt == "xlsx" and openpyxl is None:
+        raise HTTPException(status_code=400, detail="XLSX support requires the 'openpyxl' package.")
+    return fmt
+
+
+def iter_rows(stream, fmt):
+    """Yields one dict per data row from an uploaded CSV, XLSX or JSON file without loading it whole (CSV/XLSX)."""
+    if fmt == "csv":
+        yield from csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+
+    elif fmt == "xlsx":
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+        try:
+            rows = workbook.active.iter_rows(values_only=True)
+            header = [str(h).strip() if h is not None else "" for h in next(rows, [])]
+            for values in rows:
+                if values and any(v is not None for v in values):
+                    yield dict(zip(header, values))
+        finally:
+            workbook.close()
+
+    else:
+        data = json.load(stream)
+        if isinstance(data, dict):
+            data = data.get("materials", [])
+        for item in data:
+            row = {k: v for k, v in item.items() if k != "properties"}
+            for name, prop in (item.get("properties") or {}).items():
+                if isinstance(prop, dict):
+                    row[PROPERTY_PREFIX + name] = prop.get("value")
+                    row[PROPERTY_UNIT_PREFIX + name] = prop.get("unit")
+                else:
+                    row[PROPERTY_PREFIX + name] = prop
+            yield row
+
+
+def _blank(value):
+    return value is None or (isinstance(value, str) and not value.strip())
+
+
+def _number(value, column, errors, line):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        errors.append({"row": line, "column": column, "error": f"'{value}' is not a number."})
+        return None
+    if math.isnan(number) or number < 0:
+        errors.append({"row": line, "column": column, "error": "Expected a non-negative number."})
+        return None
+    return number
+
+
+def _density_unit(value, errors, line):
+    """A pint-readable mass-per-volume unit, or None with a row error."""
+    unit = str(value).strip()
+    try:
+        valid = ureg.parse_units(unit).dimensionality == ureg.parse_units("kg/m**3").dimensionality
+    except Exception:
+        valid = False
+    if not valid:
+        errors.append({"row": line, "column": "density_unit", "error": f"'{unit}' is not a density unit (e.g. g/cm³, kg/m³)."})
+        return None
+    return unit
+
+
+def _price_unit(value, column, errors, line):
+    """A price unit per mass (e.g. "kg", "INR/lb"), or None with a row error."""
+    unit = str(value).strip()
+    try:
+        kg_factor(parse_price_unit(unit)[1])
+    except PriceUnitError as e:
+        errors.append({"row": line, "column": column, "error": str(e)})
+        return None
+    return unit
+
+
+def validate_row(row, line, errors):
+    """Normalizes one input row into {name, material, costing, properties}, recording problems in `errors`."""
+    row = {str(k).strip(): v for k, v in row.items() if k is not None}
+    name = str(row.get("name") or "").strip()
+    if not name:
+        errors.append({"row": line, "column": "name", "error": "Material name is required."})
+        return None
+
+    material = {}
+    if not _blank(row.get("density")):
+        material["density"] = _number(row["density"], "density", errors, line)
+    if not _blank(row.get("density_unit")):
+        material["density_unit"] = _density_unit(row["density_unit"], errors, line)
+
+    costing = {}
+    for column in COSTING_COLUMNS:
+        if _blank(row.get(column)):
+            continue
+        if column in PRICE_COLUMNS:
+            costing[column] = _number(row[column], column, errors, line)
+        else:
+            costing[column] = _price_unit(row[column], column, errors, line)
+
+    properties = {}
+    for column, value in row.items():
+        if column.startswith(PROPERTY_PREFIX) and not _blank(value):
+            prop_name = column[len(PROPERTY_PREFIX):].strip()
+            unit_column = PROPERTY_UNIT_PREFIX + prop_name
+            if unit_column not in row:
+                unit = KEEP_UNIT  # ✅ No unit column: keep whatever unit is stored
+            else:
+                unit = None if _blank(row[unit_column]) else str(row[unit_column]).strip()
+            properties[prop_name] = (str(value).strip(), unit)
+
+    return {"line": line, "name": name, "material": material, "costing": costing, "properties": properties}
+
+
+def load_existing(cursor):
+    """Current catalogue keyed by material name, in three queries."""
+    cursor.execute("SELECT id, name, density, density_unit FROM materials")
+    materials = {row["name"]: dict(row) for row in cursor.fetchall()}
+    by_id = {m["id"]: m for m in materials.values()}
+    for material in materials.values():
+        material["costing"] = None
+        material["properties"] = {}
+
+    cursor.execute("SELECT * FROM material_costing")
+    for row in cursor.fetchall():
+        if row["material_id"] in by_id:
+            by_id[row["material_id"]]["costing"] = {c: row[c] for c in COSTING_COLUMNS}
+
+    cursor.execute("SELECT material_id, property_name, property_value, property_unit FROM material_properties")
+    for row in cursor.fetchall():
+        if row["material_id"] in by_id:
+            by_id[row["material_id"]]["properties"][row["property_name"]] = (row["property_value"], row["property_unit"])
+    return materials
+
+
+def plan_import(records, existing, errors):
+    """Merges validated records over the current catalogue and returns the write plan and the diff."""
+    material_rows, costing_rows, property_rows, changes, priced = [], [], [], [], []
+    counts = {"added": 0, "updated": 0, "unchanged": 0}
+
+    for record in records:
+        current = existing.get(record["name"])
+        change = {"name": record["name"], "fields": {}}
+
+        if current is None:
+            if record["material"].get("density") is None or not record["material"].get("density_unit"):
+                errors.append({"row": record["line"], "column": "density", "error": "New materials need density and density_unit."})
+                continue
+            change["action"] = "added"
+            merged = dict(record["material"])
+            costing_base = {"block_price": 0.0, "block_price_unit": "", "sheet_price": 0.0, "sheet_price_unit": ""}
+            property_base = {}
+        else:
+            merged = {k: current[k] for k in ("density", "density_unit")}
+            for key, value in record["material"].items():
+                if value != current[key]:
+                    change["fields"][key] = [current[key], value]
+                merged[key] = value
+            costing_base = current["costing"] or {"block_price": 0.0, "block_price_unit": "", "sheet_price": 0.0, "sheet_price_unit": ""}
+            property_base = current["properties"]
+
+        costing = dict(costing_base)
+        for key, value in record["costing"].items():
+            if current is not None and value != costing_base.get(key):
+                change["fields"][key] = [costing_base.get(key), value]
+            costing[key] = value
+
+        for prop_name, (value, unit) in record["properties"].items():
+            if unit is KEEP_UNIT:
+                unit = property_base[prop_name][1] if prop_name in property_base else None
+            if current is not None and property_base.get(prop_name) != (value, unit):
+                old = property_base.get(prop_name)
+                change["fields"][PROPERTY_PREFIX + prop_name] = [list(old) if old else None, [value, unit]]
+            property_rows.append((record["name"], prop_name, value, unit))
+
+        material_rows.append((record["name"], merged["density"], merged["density_unit"]))
+        costing_rows.append((record["name"], costing["block_price"], costing["block_price_unit"], costing["sheet_price"], costing["sheet_price_unit"]))
+
+        if current is None or any(key in change["fields"] for key in COSTING_COLUMNS):
+            priced.append(record["name"])
+
+        if current is not None:
+            change["action"] = "updated" if change["fields"] else "unchanged"
+        counts[change["action"]] += 1
+        if change["action"] != "unchanged":
+            changes.append(change)
+
+    plan = {"materials": material_rows, "costing": costing_rows, "properties": property_rows, "priced": priced}
+    return plan, counts, changes
+
+
+def apply_import(conn, plan):
+    """Upserts the whole plan with executemany inside one transaction."""
+    cursor = conn.cursor()
+    cursor.execute("BEGIN")
+    cursor.executemany("""
+        INSERT INTO materials (name, density, density_unit) VALUES (?, ?, ?)
+        ON CONFLICT(name) DO UPDATE SET density = excluded.density, density_unit = excluded.density_unit
+    """, plan["materials"])
+    cursor.executemany("""
+        INSERT INTO material_costing (material_id, block_price, block_price_unit, sheet_price, sheet_price_unit)
+        SELECT id, ?, ?, ?, ? FROM materials WHERE name = ?
+        ON CONFLICT(material_id) DO UPDATE SET
+            block_price = excluded.block_price, block_price_unit = excluded.block_price_unit,
+            sheet_price = excluded.sheet_price, sheet_price_unit = excluded.sheet_price_unit
+    """, [(bp, bpu, sp, spu, name) for name, bp, bpu, sp, spu in plan["costing"]])
+    cursor.executemany("""
+        INSERT INTO material_properties (material_id, property_name, property_value, property_unit)
+        SELECT id, ?, ?, ? FROM materials WHERE name = ?
+        ON CONFLICT(material_id, property_name) DO UPDATE SET
+            property_value = excluded.property_value, property_unit = excluded.property_unit
+    """, [(prop, value, unit, name) for name, prop, value, unit in plan["properties"]])
+
+    # ✅ Append changed prices to the history in the same transaction
+    priced = set(plan["priced"])
+    cursor.execute("SELECT id, name FROM materials")
+    append_price_history(cursor, [row["id"] for row in cursor.fetchall() if row["name"] in priced], "bulk_import")
+    conn.commit()
+
+
+# ✅ API: Bulk Import Materials, Prices and Properties
+@router.post("/import")
+def import_materials(file: UploadFile = File(...), format: str = "auto", dry_run: bool = False):
+    """
+    Imports a CSV, XLSX or JSON catalogue file.
+
+    Rows are validated in one streaming pass; nothing is written if any row fails.
+    Valid files are upserted by material name in a single transaction and a diff
+    summary of added, updated and unchanged materials is returned.
+    """
+    fmt = detect_format(file.filename, format)
+
+    errors, records, seen = [], {}, {}
+    try:
+        for line, row in enumerate(iter_rows(file.file, fmt), start=2 if fmt != "json" else 1):
+            record = validate_row(row, line, errors)
+            if record:
+                if record["name"] in seen:
+                    errors.append({"row": line, "column": "name", "error": f"Duplicate of row {seen[record['name']]}."})
+                    continue
+                seen[record["name"]] = line
+                records[record["name"]] = record
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Could not read {fmt.upper()} file: {str(e)}")
+
+    conn = get_db_connection()
+    try:
+        existing = load_existing(conn.cursor())
+        plan, counts, changes = plan_import(records.values(), existing, errors)
+        if errors:
+            raise HTTPException(status_code=400, detail={
+                "message": f"{len(errors)} row error(s); nothing was imported.",
+                "errors": errors[:MAX_REPORTED_ERRORS],
+            })
+
+        if not dry_run and (counts["added"] or counts["updated"]):
+            try:
+                apply_import(conn, plan)
+            except sqlite3.Error as e:
+                conn.rollback()
+                raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+            bump_catalogue_version()
+    finally:
+        conn.close()
+
+    return {
+        "message": "Dry run complete." if dry_run else "Import complete.",
+        "dry_run": dry_run,
+        "rows": len(records),
+        **counts,
+        "changes": changes,
+    }
+
+
+def _export_header(cursor):
+    cursor.execute("SELECT DISTINCT property_name FROM material_properties ORDER BY property_name")
+    property_names = [row["property_name"] for row in cursor.fetchall()]
+    header = list(MATERIAL_COLUMNS) + list(COSTING_COLUMNS)
+    for name in property_names:
+        header += [PROPERTY_PREFIX + name, PROPERTY_UNIT_PREFIX + name]
+    return header, property_names
+
+
+def iter_catalogue(cursor):
+    """Yields one dict per material from a single joined query, folding property rows as the cursor advances."""
+    cursor.execute("""
+        SELECT m.id, m.name, m.density, m.density_unit,
+               c.block_price, c.block_price_unit, c.sheet_price, c.sheet_price_unit,
+               p.property_name, p.property_value, p.property_unit
+        FROM materials m
+        LEFT JOIN material_costing c ON c.material_id = m.id
+        LEFT JOIN material_properties p ON p.material_id = m.id
+        ORDER BY m.id
+    """)
+    current = None
+    for row in cursor:
+        if current is None or current["id"] != row["id"]:
+            if current is not None:
+                yield current
+            current = {key: row[key] for key in ("id",) + MATERIAL_COLUMNS + COSTING_COLUMNS}
+            current["properties"] = {}
+        if row["property_name"] is not None:
+            current["properties"][row["property_name"]] = {"value": row["property_value"], "unit": row["property_unit"]}
+    if current is not None:
+        yield current
+
+
+def _flat_row(material, property_names):
+    values = [material[c] for c in MATERIAL_COLUMNS + COSTING_COLUMNS]
+    for name in property_names:
+        prop = material["properties"].get(name) or {}
+        values += [prop.get("value"), prop.get("unit")]
+    return values
+
+
+def _stream_csv(conn):
+    try:
+        cursor = conn.cursor()
+        header, property_names = _export_header(cursor)
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(header)
+        for count, material in enumerate(iter_catalogue(cursor), start=1):
+            writer.writerow(_flat_row(material, property_names))
+            if count % EXPORT_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+def _stream_json(conn):
+    try:
+        yield '{"materials": ['
+        for count, material in enumerate(iter_catalogue(conn.cursor())):
+            material.pop("id")
+            yield ("," if count else "") + json.dumps(material, ensure_ascii=False)
+        yield "]}"
+    finally:
+        conn.close()
+
+
+def _stream_xlsx(conn):
+    try:
+        cursor = conn.cursor()
+        header, property_names = _export_header(cursor)
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet("Materials")
+        sheet.append(header)
+        for material in iter_catalogue(cursor):
+            sheet.append(_flat_row(material, property_names))
+    finally:
+        conn.close()
+
+    # ✅ XLSX is a zip archive; spool it and stream the result in chunks
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+def content_disposition(filename, fallback="download"):
+    """Attachment header with an ASCII-safe filename plus the RFC 5987 UTF-8 form for any name."""
+    name = os.path.basename(str(filename).replace("\\", "/")).strip() or fallback
+    ascii_name = unicodedata.normalize("NFKD", name).encode("ascii", "replace").decode("ascii")
+    ascii_name = re.sub(r"[^A-Za-z0-9._ -]", "_", ascii_name).strip() or fallback
+    return f"attachment; filename=\"{ascii_name}\"; filename*=UTF-8''{quote(name, safe='')}"
+
+
+# ✅ API: Bulk Export Materials, Prices and Properties
+@router.get("/export")
+def export_materials(format: str = "csv", filename: Optional[str] = None):
+    """Streams the full material catalogue as CSV, XLSX or JSON in the import layout."""
+    fmt = detect_format(None, format)
+    media_types = {
+        "csv": "text/csv",
+        "json": "application/json",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    }
+    streams = {"csv": _stream_csv, "json": _stream_json, "xlsx": _stream_xlsx}
+    filename = filename or f"materials.{fmt}"
+    return StreamingResponse(
+        streams[fmt](get_db_connection(check_same_thread=False)),  # ✅ Streamed from worker threads
+        media_type=media_types[fmt],
+        headers={"Content-Disposition": content_disposition(filename, f"materials.{fmt}")},
+    )
@@ -0,0 +1,195 @@
+# /modules/material_catalogue.py
+
+import threading
+from functools import lru_cache
+
+from fastapi import HTTPException
+
+from modules.cost_cache import get_catalogue_version
+from modules.currency import parse_price_unit
+from modules.db_utils import get_db_connection
+from modules.unit_conversion import conversion_factor, ureg
+
+# ✅ Canonical units held by the catalogue
+DENSITY_UNIT = "kg/mm³"
+PRICE_UNIT = "kg"
+PRICING_TYPES = ("block_price", "sheet_price")
+
+
+class PriceUnitError(ValueError):
+    """A price unit whose quantity is not a mass unit, so the price cannot be expressed per kg."""
+
+
+@lru_cache(maxsize=256)
+def kg_factor(quantity_unit):
+    """Quantity units per kg for a mass unit ("g" -> 1000); raises PriceUnitError for anything else."""
+    try:
+        units = ureg.parse_units(quantity_unit)
+    except Exception:
+        raise PriceUnitError(f"Unknown price unit '{quantity_unit}'.") from None
+    # ✅ Pieces, lots, volumes or hours would silently pass as kg through a plain conversion
+    if units.dimensionality != ureg.kilogram.dimensionality:
+        raise PriceUnitError(f"Price unit '{quantity_unit}' is not a mass unit (use kg, g, lb, t, ...).")
+    return ureg.Quantity(1.0, "kg").to(units).magnitude
+
+
+def price_per_kg(price, price_unit):
+    """
+    Normalizes a material price quoted per `price_unit` (e.g. "kg", "g", "INR/lb") to price per kg.
+    Raises PriceUnitError when the unit is not per mass.
+    """
+    _, quantity_unit = parse_price_unit(price_unit)
+    return float(price or 0.0) * kg_factor(quantity_unit)
+
+
+def price_currency(price_unit):
+    """Currency code of a price unit, or None for the base currency."""
+    return parse_price_unit(price_unit)[0]
+
+
+def resolve_prices(name, row):
+    """
+    Block and sheet prices per kg with their currencies from a row holding `*_price` and
+    `*_price_unit` columns. A price with an unusable unit becomes None and its reason is
+    kept in "price_errors", so one bad row never takes the whole catalogue down.
+    """
+    resolved = {"price_errors": {}}
+    for pricing_type in PRICING_TYPES:
+        unit = row[f"{pricing_type}_unit"]
+        try:
+            resolved[pricing_type] = price_per_kg(row[pricing_type], unit)
+        except PriceUnitError as e:
+            print(f"⚠️ Material '{name}' {pricing_type}: {e}")
+            resolved[pricing_type] = None
+            resolved["price_errors"][pricing_type] = str(e)
+        resolved[pricing_type.replace("_price", "_currency")] = price_currency(unit)
+    return resolved
+
+
+def _property_value(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return value
+
+
+def _load_catalogue():
+    """Reads materials, costing and properties in one joined query and folds them per material."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT m.id, m.name, m.density, m.density_unit,
+               c.block_price, c.block_price_unit, c.sheet_price, c.sheet_price_unit,
+               p.property_name, p.property_value, p.property_unit
+        FROM materials m
+        LEFT JOIN material_costing c ON c.material_id = m.id
+        LEFT JOIN material_properties p ON p.material_id = m.id
+        ORDER BY m.id
+    """)
+    rows = cursor.fetchall()
+    cursor.execute("SELECT id, name, pricing_type FROM part_classification")
+    classifications = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    materials = {}
+    for row in rows:
+        material = materials.get(row["id"])
+        if material is None:
+            material = materials[row["id"]] = {
+                "id": row["id"],
+                "name": row["name"],
+                "density": float(row["density"]) * conversion_factor(row["density_unit"], DENSITY_UNIT),
+                "density_unit": DENSITY_UNIT,
+                **resolve_prices(row["name"], row),
+                "price_unit": PRICE_UNIT,
+                "has_costing": row["block_price_unit"] is not None,
+                "properties": {},
+            }
+        if row["property_name"] is not None:
+            material["properties"][row["property_name"]] = {
+                "value": _property_value(row["property_value"]),
+                "unit": row["property_unit"],
+            }
+    return materials, classifications
+
+
+class MaterialCatalogue:
+    """Materials and part classifications indexed by id and case-insensitive name."""
+
+    def __init__(self, materials, classifications):
+        self.materials = materials
+        self.materials_by_name = {m["name"].lower(): m for m in materials.values()}
+        self.classifications = {c["id"]: c for c in classifications}
+        self.classifications_by_name = {c["name"].lower(): c for c in classifications}
+
+    @staticmethod
+    def _lookup(by_id, by_name, key):
+        if key is None:
+            return None
+        if isinstance(key, int) or (isinstance(key, str) and key.strip().isdigit()):
+            found = by_id.get(int(key))
+            if found:
+                return found
+        return by_name.get(str(key).strip().lower())
+
+    def material(self, key):
+        return self._lookup(self.materials, self.materials_by_name, key)
+
+    def classification(self, key):
+        return self._lookup(self.classifications, self.classifications_by_name, key)
+
+
+# ✅ Rebuilt lazily whenever the catalogue version changes
+_catalogue_lock = threading.Lock()
+_catalogue_state = {"version": None, "catalogue": None}
+
+def get_material_catalogue():
+    version = get_catalogue_version()
+    with _catalogue_lock:
+        if _catalogue_state["version"] != version:
+            _catalogue_state["catalogue"] = MaterialCatalogue(*_load_catalogue())
+            _catalogue_state["version"] = version
+        return _catalogue_state["catalogue"]
+
+
+def get_material(key):
+    """Material by id or name with density in kg/mm³ and prices per kg, or None."""
+    return get_material_catalogue().material(key)
+
+
+def get_classification(key):
+    """Part classification by id or name, or None."""
+    return get_material_catalogue().classification(key)
+
+
+def material_unit_price(material, pricing_type):
+    """
+    Price per kg for a pricing type, falling back to the block price, in the material's own currency.
+    Raises HTTPException(422) when that price was stored with a unit that is not per mass.
+    """
+    if pricing_type not in PRICING_TYPES:
+        pricing_type = "block_price"
+    if material[pricing_type] is None:
+        raise HTTPException(
+            status_code=422,
+            detail=f"Material '{material['name']}' has an invalid {pricing_type} unit: "
+                   f"{material['price_errors'].get(pricing_type, 'unknown unit')}",
+        )
+    return material[pricing_type]
+
+
+def material_price_currency(material, pricing_type):
+    """Currency of `material_unit_price` (None = base currency)."""
+    if pricing_type not in PRICING_TYPES:
+        pricing_type = "block_price"
+    return material.get(pricing_type.replace("_price", "_currency"))
+
+
+def material_property(material, name, target_unit=None, default_unit=None):
+    """Numeric property value, converted to `target_unit` when given, or None."""
+    prop = (material or {}).get("properties", {}).get(name)
+    if not prop or not isinstance(prop["value"], float):
+        return None
+    if target_unit:
+        return prop["value"] * conversion_factor(prop["unit"] or default_unit or target_unit, target_unit)
+    return prop["value"]
@@ -1,8 +1,10 @@
 from fastapi import APIRouter, HTTPException
+from modules.cost_cache import bump_catalogue_version
 import sqlite3
 import json
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Optional, Dict, List
+from modules.profile_formulas import FormulaError, validate_formula, evaluate_profile_volumes
 
 router = APIRouter()
 
@@ -18,6 +20,20 @@ class MaterialProfileBase(BaseModel):
     volume_formula: Optional[str] = None
     default_unit: str
 
+class ProfileVolumeRequest(BaseModel):
+    dimensions: List[Dict[str, float]]   # E.g., [{"length": 100, "width": 20, "height": 10}, ...]
+    dimensions_unit: Optional[str] = None
+    volume_unit: Optional[str] = None
+
+# ✅ Reject formulas that cannot be compiled before they reach the database
+def check_profile_formula(profile: MaterialProfileBase):
+    if not profile.volume_formula:
+        return
+    try:
+        validate_formula(profile.volume_formula, profile.fields_json)
+    except FormulaError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid volume formula: {str(e)}")
+
 # ✅ Fetch All Profiles
 @router.get("/")
 def get_profiles():
@@ -61,6 +77,7 @@ def get_profile(profile_id: int):
 
 @router.post("/")
 def create_profile(profile: MaterialProfileBase):
+    check_profile_formula(profile)
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -78,6 +95,7 @@ def create_profile(profile: MaterialProfileBase):
         ))
 
         conn.commit()
+        bump_catalogue_version()
         profile_id = cursor.lastrowid
         return { "message": "Profile created successfully", "id": profile_id }
 
@@ -95,6 +113,7 @@ def create_profile(profile: MaterialProfileBase):
 
 @router.put("/{profile_id}")
 def update_profile(profile_id: int, profile: MaterialProfileBase):
+    check_profile_formula(profile)
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -119,6 +138,7 @@ def update_profile(profile_id: int, profile: MaterialProfileBase):
         ))
 
         conn.commit()
+        bump_catalogue_version()
         return { "message": f"Profile '{profile.name}' updated successfully." }
 
     except sqlite3.OperationalError as e:
@@ -129,4 +149,22 @@ def update_profile(profile_id: int, profile: MaterialProfileBase):
         conn.close()
 
 
+# ✅ Evaluate a profile's volume formula for many dimension sets at once
+@router.post("/{profile_id}/volumes")
+def calculate_profile_volumes(profile_id: int, request: ProfileVolumeRequest):
+    profile = get_profile(profile_id)
+    if not profile.get("volume_formula"):
+        raise HTTPException(status_code=400, detail="Profile has no volume formula.")
 
+    try:
+        volumes = evaluate_profile_volumes(
+            profile, request.dimensions, request.dimensions_unit, request.volume_unit
+        )
+    except FormulaError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "profile_id": profile_id,
+        "volume_unit": request.volume_unit or profile["default_unit"],
+        "volumes": volumes.tolist(),
+    }
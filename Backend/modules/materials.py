@@ -1,4 +1,6 @@
 from fastapi import APIRouter, HTTPException
+from modules.cost_cache import bump_catalogue_version
+from modules.price_history import append_price_history
 from pydantic import BaseModel
 import sqlite3
 from typing import Optional
@@ -61,8 +63,10 @@ def add_material(material: MaterialBase):
             "INSERT INTO material_costing (material_id, block_price, block_price_unit, sheet_price, sheet_price_unit) VALUES (?, 0.0, '', 0.0, '')",
             (material_id,),
         )
+        append_price_history(cursor, [material_id], "material_created")
 
         conn.commit()
+        bump_catalogue_version()
         return {"message": f"Material '{material.name}' added successfully.", "material_id": material_id}
 
     except sqlite3.IntegrityError:
@@ -82,13 +86,14 @@ def update_material(material_id: int, material: MaterialBase):
         (material.name, material.density, material.density_unit, material_id),
     )
     conn.commit()
+    bump_catalogue_version()
     conn.close()
     return {"message": f"Material '{material.name}' updated successfully."}
 
 # ✅ API: Delete Material (Cascade Deletes Properties & Costing)
 @router.delete("/{material_id}")
 def delete_material(material_id: int):
-    """Delete a material and all related properties & costing."""
+    """Delete a material and all related properties & costing (its price history is kept)."""
     conn = get_db_connection()
     cursor = conn.cursor()
 
@@ -103,9 +108,12 @@ def delete_material(material_id: int):
 
         cursor.execute("DELETE FROM material_properties WHERE material_id = ?", (material_id,))
         cursor.execute("DELETE FROM material_costing WHERE material_id = ?", (material_id,))
+        # ✅ The price history is append-only and stays behind for quotes priced in the past;
+        # material ids are AUTOINCREMENT, so the orphaned rows are never picked up by a new material
         cursor.execute("DELETE FROM materials WHERE id = ?", (material_id,))
 
         conn.commit()
+        bump_catalogue_version()
         return {"message": f"Material '{material_id}' and all associated data deleted successfully."}
 
     except sqlite3.OperationalError as e:
@@ -139,6 +147,7 @@ def add_material_property(property: MaterialProperty):
         )
         property_id = cursor.lastrowid  # ✅ Retrieve the last inserted ID
         conn.commit()
+        bump_catalogue_version()
         conn.close()
 
         # ✅ Return the new property with its ID
@@ -164,6 +173,7 @@ def update_material_property(property_id: int, property: MaterialProperty):
         (property.property_name, property.property_value, property.property_unit, property_id),
     )
     conn.commit()
+    bump_catalogue_version()
     conn.close()
     return {"message": f"Property '{property.property_name}' updated successfully."}
 
@@ -174,6 +184,7 @@ def delete_material_property(property_id: int):
     cursor = conn.cursor()
     cursor.execute("DELETE FROM material_properties WHERE id = ?", (property_id,))
     conn.commit()
+    bump_catalogue_version()
     conn.close()
     return {"message": f"Property ID '{property_id}' deleted successfully."}
 
@@ -201,6 +212,8 @@ def update_material_costing(material_id: int, costing: MaterialCosting):
         """,
         (costing.block_price, costing.block_price_unit, costing.sheet_price, costing.sheet_price_unit, material_id),
     )
+    append_price_history(cursor, [material_id], "costing_update")  # ✅ Keep the old price reproducible
     conn.commit()
+    bump_catalogue_version()
     conn.close()
     return {"message": f"Costing for Material ID '{material_id}' updated successfully."}
@@ -0,0 +1,209 @@
+# /modules/mesh_export.py
+
+import glob
+import json
+import os
+import struct
+
+import numpy as np
+
+from modules.file_utils import write_atomic
+
+# ✅ glTF constants
+GLB_MAGIC = 0x46546C67          # "glTF"
+GLB_VERSION = 2
+CHUNK_JSON = 0x4E4F534A         # "JSON"
+CHUNK_BIN = 0x004E4942          # "BIN\0"
+ARRAY_BUFFER = 34962
+ELEMENT_ARRAY_BUFFER = 34963
+UNSIGNED_SHORT = 5123
+UNSIGNED_INT = 5125
+QUANTIZED_MAX = 65535           # ✅ Positions are stored as uint16 per axis
+
+
+def _pad(data, fill=b"\x00"):
+    return data + fill * (-len(data) % 4)
+
+
+def tessellate_shape(shape, tolerance=0.5):
+    """Tessellates a cadquery shape once; returns (float64 vertices (n, 3), int triangles (m, 3))."""
+    vertices, triangles = shape.tessellate(tolerance)
+    vertices = np.array([v.toTuple() for v in vertices], dtype=float).reshape(-1, 3)
+    triangles = np.array(triangles, dtype=np.int64).reshape(-1, 3)
+    return vertices, triangles
+
+
+def quantize_mesh(vertices, triangles):
+    """
+    Maps positions onto a uint16 grid over the bounding box and welds vertices that land on
+    the same grid point (face seams from per-face tessellation).
+
+    Returns (quantized (k, 3) uint16, triangles (j, 3), offset, scale) where
+    position = quantized * scale + offset. Degenerate triangles are dropped.
+    """
+    offset = vertices.min(axis=0)
+    extent = vertices.max(axis=0) - offset
+    scale = np.where(extent > 0, extent / QUANTIZED_MAX, 1.0)
+    quantized = np.rint((vertices - offset) / scale).astype(np.uint16)
+
+    quantized, inverse = np.unique(quantized, axis=0, return_inverse=True)
+    triangles = inverse.reshape(-1)[triangles]
+    keep = (
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    )
+    return quantized, triangles[keep], offset, scale
+
+
+def decimate_clusters(vertices, triangles, grid=32):
+    """
+    Vertex-clustering decimation: snaps vertices to a `grid`-cell lattice over the longest
+    side, merges each occupied cell into its mean vertex and drops collapsed or duplicate triangles.
+    """
+    offset = vertices.min(axis=0)
+    cell = max(float((vertices.max(axis=0) - offset).max()), 1e-9) / max(int(grid), 1)
+    cells = np.floor((vertices - offset) / cell).astype(np.int64)
+    _, cluster = np.unique(cells, axis=0, return_inverse=True)
+    cluster = cluster.reshape(-1)
+
+    counts = np.bincount(cluster)[:, None]
+    merged = np.zeros((len(counts), 3))
+    np.add.at(merged, cluster, vertices)
+    merged /= counts
+
+    triangles = cluster[triangles]
+    keep = (
+        (triangles[:, 0] != triangles[:, 1])
+        & (triangles[:, 1] != triangles[:, 2])
+        & (triangles[:, 0] != triangles[:, 2])
+    )
+    triangles = triangles[keep]
+    # ✅ Same triangle with either winding counts as a duplicate once sorted
+    _, first = np.unique(np.sort(triangles, axis=1), axis=0, return_index=True)
+    return merged, triangles[np.sort(first)]
+
+
+def build_glb(vertices, triangles):
+    """
+    Binary glTF 2.0 for an indexed triangle mesh, positions quantized with KHR_mesh_quantization.
+
+    The dequantization (scale/translation) lives on the node, so viewers place the mesh in
+    millimetres without any client-side decoding.
+    """
+    quantized, triangles, offset, scale = quantize_mesh(vertices, triangles)
+
+    # ✅ Vertex attributes must be 4-byte aligned, so each uint16 xyz is padded to 8 bytes
+    positions = np.zeros((len(quantized), 4), dtype="<u2")
+    positions[:, :3] = quantized
+    if len(quantized) <= QUANTIZED_MAX + 1:
+        index_type, index_dtype = UNSIGNED_SHORT, "<u2"
+    else:
+        index_type, index_dtype = UNSIGNED_INT, "<u4"
+    indices = triangles.astype(index_dtype).tobytes()
+
+    position_bytes = positions.tobytes()
+    index_offset = len(position_bytes)
+    binary = _pad(position_bytes + _pad(indices))
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "cost-estimator mesh export"},
+        "extensionsUsed": ["KHR_mesh_quantization"],
+        "extensionsRequired": ["KHR_mesh_quantization"],
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{
+            "mesh": 0,
+            "translation": [float(v) for v in offset],
+            "scale": [float(v) for v in scale],
+        }],
+        "meshes": [{"primitives": [{"attributes": {"POSITION": 0}, "indices": 1, "mode": 4}]}],
+        "buffers": [{"byteLength": len(binary)}],
+        "bufferViews": [
+            {"buffer": 0, "byteOffset": 0, "byteLength": len(position_bytes), "byteStride": 8, "target": ARRAY_BUFFER},
+            {"buffer": 0, "byteOffset": index_offset, "byteLength": len(indices), "target": ELEMENT_ARRAY_BUFFER},
+        ],
+        "accessors": [
+            {
+                "bufferView": 0,
+                "componentType": UNSIGNED_SHORT,
+                "count": len(quantized),
+                "type": "VEC3",
+                "min": quantized.min(axis=0).tolist() if len(quantized) else [0, 0, 0],
+                "max": quantized.max(axis=0).tolist() if len(quantized) else [0, 0, 0],
+            },
+            {
+                "bufferView": 1,
+                "componentType": index_type,
+                "count": int(triangles.size),
+                "type": "SCALAR",
+            },
+        ],
+    }
+
+    json_chunk = _pad(json.dumps(gltf, separators=(",", ":")).encode("utf-8"), b" ")
+    length = 12 + 8 + len(json_chunk) + 8 + len(binary)
+    glb = b"".join([
+        struct.pack("<III", GLB_MAGIC, GLB_VERSION, length),
+        struct.pack("<II", len(json_chunk), CHUNK_JSON), json_chunk,
+        struct.pack("<II", len(binary), CHUNK_BIN), binary,
+    ])
+    stats = {"vertices": int(len(quantized)), "triangles": int(len(triangles))}
+    return glb, stats
+
+
+def lod_path(glb_path, level):
+    return f"{os.path.splitext(glb_path)[0]}.lod{level}.glb"
+
+
+def export_mesh_lods(shape, glb_path, tolerance=0.5, lod_tolerances=(), cluster_grid=32, min_reduction=0.9):
+    """
+    Writes a coarse-to-fine mesh pyramid next to the full mesh at `glb_path`.
+
+    Levels: a vertex-clustered decimation of the coarsest tessellation, each tolerance in
+    `lod_tolerances` coarser than `tolerance`, then the full mesh itself. A level is kept only
+    if it has fewer than `min_reduction` × the triangles of the next finer one.
+    Returns the full-mesh details with a "lods" list (coarse first), or None.
+    """
+    # ✅ Imported here so the web process can use this module's file helpers without loading OCC
+    from OCP.BRepTools import BRepTools
+
+    try:
+        # ✅ OCC keeps a face triangulation that is at least as fine as the tolerance asked for, so
+        # without clearing it every level would come back as the finest mesh made so far (e.g. the
+        # oriented-bounds analysis tessellates the same shape first)
+        tolerances = sorted({float(t) for t in lod_tolerances if float(t) > tolerance}, reverse=True)
+        meshes = []
+        for tol in tolerances + [tolerance]:
+            BRepTools.Clean_s(shape.wrapped)
+            vertices, triangles = tessellate_shape(shape, tol)
+            if len(vertices) and len(triangles):
+                meshes.append({"tolerance": tol, "method": "tessellation", "mesh": (vertices, triangles)})
+        if not meshes:
+            print("⚠️ Tessellation produced no triangles; mesh export skipped.")
+            return None
+        if cluster_grid:
+            decimated = decimate_clusters(*meshes[0]["mesh"], grid=cluster_grid)
+            if len(decimated[1]):
+                meshes.insert(0, {"tolerance": meshes[0]["tolerance"], "method": "clustering",
+                                  "grid": int(cluster_grid), "mesh": decimated})
+
+        levels = [meshes[-1]]
+        for candidate in reversed(meshes[:-1]):
+            if len(candidate["mesh"][1]) < min_reduction * len(levels[0]["mesh"][1]):
+                levels.insert(0, candidate)
+
+        for stale in glob.glob(lod_path(glob.escape(glb_path), "*")):
+            os.remove(stale)
+
+        lods = []
+        for level, entry in enumerate(levels):
+            path = glb_path if entry is levels[-1] else lod_path(glb_path, level)
+            glb, stats = build_glb(*entry.pop("mesh"))
+            write_atomic(path, glb)
+            lods.append({"level": level, "path": path, "bytes": len(glb), **entry, **stats})
+
+        return {**lods[-1], "lods": lods}
+    except Exception as e:
+        print(f"❌ Error exporting mesh: {e}")
+        return None
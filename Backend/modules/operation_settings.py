@@ -1,4 +1,5 @@
 from fastapi import APIRouter, HTTPException, Body
+from modules.cost_cache import bump_catalogue_version
 from pydantic import BaseModel
 import sqlite3
 from typing import List, Dict
@@ -91,6 +92,7 @@ def create_operation(operation: OperationBase):
                   operation.costing_unit, operation.universal))
 
             conn.commit()
+            bump_catalogue_version()
             operation_id = cursor.lastrowid
         return {"message": "Operation added successfully", "operation_id": operation_id}
 
@@ -115,6 +117,7 @@ def update_operation(operation_id: int, operation: OperationBase):
                   operation.costing_unit, operation.universal, operation_id))
 
             conn.commit()
+            bump_catalogue_version()
         return {"message": "Operation updated successfully"}
 
     except sqlite3.OperationalError as e:
@@ -141,6 +144,7 @@ def delete_operation(operation_id: int):
             cursor.execute("DELETE FROM operations WHERE id = ?", (operation_id,))
 
             conn.commit()
+            bump_catalogue_version()
         return {"message": "Operation deleted successfully"}
 
     except sqlite3.OperationalError as e:
@@ -177,6 +181,7 @@ def add_classification_to_operation(operation_id: int, classification_id: int):
             """, (operation_id, classification_id))
 
             conn.commit()
+            bump_catalogue_version()
         return {"message": "Classification added successfully"}
 
     except sqlite3.IntegrityError:
@@ -195,6 +200,7 @@ def remove_classification_from_operation(operation_id: int, classification_id: i
             """, (operation_id, classification_id))
 
             conn.commit()
+            bump_catalogue_version()
         return {"message": "Classification removed from operation successfully"}
 
     except sqlite3.OperationalError as e:
@@ -226,6 +232,7 @@ def bulk_add_classifications_to_operation(
             )
 
             conn.commit()
+            bump_catalogue_version()
         return {"message": "Classifications added successfully"}
 
     except sqlite3.IntegrityError:
@@ -267,6 +274,7 @@ def update_classifications_for_operation(
                 )
 
             conn.commit()
+            bump_catalogue_version()
 
         return {"message": "Classifications updated successfully"}
 
@@ -0,0 +1,238 @@
+# /modules/oriented_bounds.py
+
+import itertools
+import time
+
+import numpy as np
+
+
+class TimeBudgetExceeded(Exception):
+    """Raised when the oriented bounds search runs past its time budget."""
+
+
+def _check_deadline(deadline):
+    if deadline is not None and time.perf_counter() > deadline:
+        raise TimeBudgetExceeded()
+
+
+def tessellated_vertices(shape, tolerance=0.5):
+    """Returns the unique vertices of a tessellated cadquery shape as an (n, 3) array."""
+    vertices, _ = shape.tessellate(tolerance)
+    points = np.array([(v.x, v.y, v.z) for v in vertices], dtype=float)
+    if len(points) == 0:
+        return points
+    # ✅ Faces share edge vertices, so drop duplicates before building hulls
+    return np.unique(np.round(points, 6), axis=0)
+
+
+def convex_hull_2d(points, deadline=None):
+    """Andrew's monotone chain convex hull of an (n, 2) array, counter-clockwise."""
+    points = np.unique(points, axis=0)
+    if len(points) <= 2:
+        return points
+
+    def build(sequence):
+        hull = []
+        for index, p in enumerate(sequence):
+            while len(hull) >= 2:
+                o, a = hull[-2], hull[-1]
+                if (a[0] - o[0]) * (p[1] - o[1]) - (a[1] - o[1]) * (p[0] - o[0]) > 0:
+                    break
+                hull.pop()
+            hull.append(p)
+            if index % 4096 == 0:
+                _check_deadline(deadline)
+        return hull
+
+    pts = [tuple(p) for p in points]  # ✅ np.unique already sorted the points lexicographically
+    lower = build(pts)
+    upper = build(reversed(pts))
+    return np.array(lower[:-1] + upper[:-1], dtype=float)
+
+
+def min_area_rectangle(hull):
+    """
+    Rotating calipers: the minimum-area enclosing rectangle of a convex polygon.
+
+    Returns:
+        (area, angle, extents) where `angle` orients the rectangle's first side.
+    """
+    if len(hull) < 3:
+        extent = np.ptp(hull, axis=0) if len(hull) else np.zeros(2)
+        return float(extent[0] * extent[1]), 0.0, extent
+
+    edges = np.roll(hull, -1, axis=0) - hull
+    angles = np.unique(np.mod(np.arctan2(edges[:, 1], edges[:, 0]), np.pi / 2))
+
+    cos, sin = np.cos(angles)[:, None], np.sin(angles)[:, None]
+    x = cos * hull[:, 0] + sin * hull[:, 1]
+    y = -sin * hull[:, 0] + cos * hull[:, 1]
+    widths = x.max(axis=1) - x.min(axis=1)
+    heights = y.max(axis=1) - y.min(axis=1)
+    areas = widths * heights
+
+    best = int(np.argmin(areas))
+    return float(areas[best]), float(angles[best]), np.array([widths[best], heights[best]])
+
+
+def min_enclosing_circle(points, seed=0):
+    """Welzl-style randomized incremental minimal enclosing circle. Returns (center, radius)."""
+    pts = np.array(points, dtype=float)
+    np.random.default_rng(seed).shuffle(pts)
+
+    def circle_two(a, b):
+        center = (a + b) / 2
+        return center, np.linalg.norm(a - center)
+
+    def circle_three(a, b, c):
+        d = 2 * (a[0] * (b[1] - c[1]) + b[0] * (c[1] - a[1]) + c[0] * (a[1] - b[1]))
+        if abs(d) < 1e-12:
+            # ✅ Collinear points: the circle through the farthest pair covers all three
+            pairs = [(a, b), (a, c), (b, c)]
+            return max((circle_two(p, q) for p, q in pairs), key=lambda cr: cr[1])
+        ux = ((a @ a) * (b[1] - c[1]) + (b @ b) * (c[1] - a[1]) + (c @ c) * (a[1] - b[1])) / d
+        uy = ((a @ a) * (c[0] - b[0]) + (b @ b) * (a[0] - c[0]) + (c @ c) * (b[0] - a[0])) / d
+        center = np.array([ux, uy])
+        return center, np.linalg.norm(a - center)
+
+    def inside(circle, p):
+        return np.linalg.norm(p - circle[0]) <= circle[1] * (1 + 1e-9) + 1e-9
+
+    if len(pts) == 0:
+        return np.zeros(2), 0.0
+
+    circle = (pts[0], 0.0)
+    for i in range(1, len(pts)):
+        if inside(circle, pts[i]):
+            continue
+        circle = (pts[i], 0.0)
+        for j in range(i):
+            if inside(circle, pts[j]):
+                continue
+            circle = circle_two(pts[i], pts[j])
+            for k in range(j):
+                if not inside(circle, pts[k]):
+                    circle = circle_three(pts[i], pts[j], pts[k])
+    return circle[0], float(circle[1])
+
+
+def _plane_basis(axis):
+    """Two unit vectors spanning the plane orthogonal to `axis`."""
+    helper = np.array([1.0, 0.0, 0.0]) if abs(axis[0]) < 0.9 else np.array([0.0, 1.0, 0.0])
+    v = np.cross(axis, helper)
+    v /= np.linalg.norm(v)
+    return v, np.cross(axis, v)
+
+
+def oriented_bounding_box(points, deadline=None):
+    """
+    Approximate minimum-volume oriented bounding box.
+
+    Each PCA axis (and the world Z axis) is tried as the box's extrusion axis;
+    the cross-section orthogonal to it is minimized with rotating calipers.
+    """
+    centered = points - points.mean(axis=0)
+    _, eigenvectors = np.linalg.eigh(np.cov(centered.T))
+    candidates = [eigenvectors[:, i] for i in range(3)] + [np.array([0.0, 0.0, 1.0])]
+
+    best = None
+    for axis in candidates:
+        _check_deadline(deadline)
+        axis = axis / np.linalg.norm(axis)
+        v, w = _plane_basis(axis)
+        projected = np.column_stack((points @ v, points @ w))
+        hull = convex_hull_2d(projected, deadline)
+        area, angle, extents = min_area_rectangle(hull)
+        along = points @ axis
+        volume = area * float(np.ptp(along))
+        if best is None or volume < best["volume"]:
+            e1 = np.cos(angle) * v + np.sin(angle) * w
+            e2 = -np.sin(angle) * v + np.cos(angle) * w
+            best = {
+                "volume": volume,
+                "axes": [e1, e2, axis],
+                "extents": [float(extents[0]), float(extents[1]), float(np.ptp(along))],
+            }
+    return best
+
+
+def enclosing_cylinder(points, axes, deadline=None):
+    """Smallest enclosing cylinder among the candidate axes (minimal circle per projection)."""
+    best = None
+    for axis in axes:
+        _check_deadline(deadline)
+        axis = axis / np.linalg.norm(axis)
+        v, w = _plane_basis(axis)
+        hull = convex_hull_2d(np.column_stack((points @ v, points @ w)), deadline)
+        _, radius = min_enclosing_circle(hull)
+        length = float(np.ptp(points @ axis))
+        volume = np.pi * radius ** 2 * length
+        if best is None or volume < best["volume"]:
+            best = {"volume": float(volume), "diameter": 2 * radius, "length": length, "axis": axis}
+    return best
+
+
+def world_aligned_extents(axes, extents):
+    """
+    Box extents reordered to world X, Y, Z: each box axis is matched to the world axis it
+    is closest to (the permutation with the largest total |cos|), so per-axis allowances
+    still land on the axis they were configured for.
+    """
+    alignment = np.abs(np.array(axes, dtype=float))  # ✅ Row i: |cos| of box axis i with X, Y, Z
+    order = max(itertools.permutations(range(3)), key=lambda p: sum(alignment[i, p[i]] for i in range(3)))
+    aligned = [0.0, 0.0, 0.0]
+    for box_axis, world_axis in enumerate(order):
+        aligned[world_axis] = float(extents[box_axis])
+    return aligned
+
+
+def compute_oriented_bounds(shape, time_budget=2.0, tolerance=0.5, max_faces=None):
+    """
+    Computes an oriented bounding box and a minimal enclosing cylinder for a cadquery shape.
+
+    - shape: cadquery Shape (e.g. `workplane.val()`).
+    - time_budget: Seconds allowed for the search; None disables the limit. Tessellation
+      cannot be interrupted, so it counts against the budget but may overrun it.
+    - tolerance: Linear tessellation tolerance in mm.
+    - max_faces: Shapes with more faces are skipped before tessellating, since their
+      tessellation alone would blow the budget.
+
+    Returns:
+        Dict with `oriented_bounding_box` and `enclosing_cylinder` (values in mm),
+        or None when the budget is exceeded so callers keep the axis-aligned box.
+    """
+    if max_faces and len(shape.Faces()) > max_faces:
+        print(f"⚠️ Oriented bounds skipped for a shape with over {max_faces} faces, using the axis-aligned box.")
+        return None
+
+    deadline = time.perf_counter() + time_budget if time_budget else None
+    try:
+        points = tessellated_vertices(shape, tolerance)
+        _check_deadline(deadline)
+        if len(points) < 4:
+            return None
+
+        box = oriented_bounding_box(points, deadline)
+        pca_axes = list(np.linalg.eigh(np.cov((points - points.mean(axis=0)).T))[1].T)
+        cylinder = enclosing_cylinder(points, box["axes"] + pca_axes, deadline)
+    except TimeBudgetExceeded:
+        print("⚠️ Oriented bounds exceeded time budget, falling back to axis-aligned box.")
+        return None
+
+    length, width, height = sorted(box["extents"], reverse=True)
+    return {
+        "oriented_bounding_box": {
+            "length": length,
+            "width": width,
+            "height": height,
+            "volume": box["volume"],
+            "axes": [[round(float(c), 6) for c in axis] for axis in box["axes"]],
+            "extents_xyz": world_aligned_extents(box["axes"], box["extents"]),
+        },
+        "enclosing_cylinder": {
+            "diameter": cylinder["diameter"],
+            "length": cylinder["length"],
+            "volume": cylinder["volume"],
+            "axis": [round(float(c), 6) for c in cylinder["axis"]],
+        },
+    }
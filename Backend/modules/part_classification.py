@@ -1,5 +1,6 @@
 import sqlite3
 from fastapi import APIRouter, HTTPException
+from modules.cost_cache import bump_catalogue_version
 from pydantic import BaseModel
 from typing import Optional
 
@@ -53,6 +54,7 @@ def add_part_classification(new_part: PartClassificationModel):
         """, (new_part.name, new_part.pricing_type))
 
         conn.commit()
+        bump_catalogue_version()
         return {"message": f"Part classification '{new_part.name}' created successfully."}
 
     except sqlite3.OperationalError as e:
@@ -86,6 +88,7 @@ def update_part_classification(id: int, updated_part: PartClassificationModel):
         """, (updated_part.name, updated_part.pricing_type, id))
 
         conn.commit()
+        bump_catalogue_version()
         return {"message": f"Part classification ID {id} updated successfully."}
 
     except sqlite3.OperationalError as e:
@@ -114,6 +117,7 @@ def delete_part_classification(id: int):
 
         cursor.execute("DELETE FROM part_classification WHERE id = ?", (id,))
         conn.commit()
+        bump_catalogue_version()
 
         return {"message": f"Part classification ID {id} deleted successfully."}
 
@@ -6,6 +6,9 @@ from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel, Field
 from typing import Dict, Any, List, Optional
 import json
+from modules.cad_worker import remove_part_meshes, remove_projection_views
+from modules.svg_optimize import remove_svg_variants
+from modules.thumbnail_sprites import remove_thumbnail_variants, update_project_sprite
 
 router = APIRouter()
 
@@ -213,7 +216,7 @@ def delete_part(part_id: str):
         conn.execute("BEGIN TRANSACTION;")
 
         # Retrieve part details before deletion
-        cursor.execute("SELECT file_path, thumbnail, projection FROM parts WHERE part_id = ?", (part_id,))
+        cursor.execute("SELECT project_id, name, file_path, thumbnail, projection FROM parts WHERE part_id = ?", (part_id,))
         part = cursor.fetchone()
 
         if not part:
@@ -233,9 +236,19 @@ def delete_part(part_id: str):
 
         if thumbnail and os.path.exists(thumbnail):
             os.remove(thumbnail)
+        if thumbnail:
+            remove_thumbnail_variants(thumbnail)
 
         if projection and os.path.exists(projection):
             os.remove(projection)
+        if projection:
+            remove_svg_variants(projection)
+            remove_projection_views(projection)
+        remove_part_meshes(part["project_id"], part["name"])
+
+        # ✅ Free the part's cell in the project sprite
+        if thumbnail:
+            update_project_sprite(part["project_id"])
 
         return {"message": "Part and associated files deleted successfully."}
 
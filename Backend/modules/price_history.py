@@ -0,0 +1,162 @@
+# /modules/price_history.py
+
+import sqlite3
+from datetime import datetime, time as dt_time
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from modules.cost_cache import bump_catalogue_version
+from modules.db_utils import get_db_connection
+from modules.material_catalogue import get_material_catalogue, resolve_prices
+
+router = APIRouter()
+
+# ✅ Same layout as SQLite's CURRENT_TIMESTAMP so text comparison orders correctly
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+class PriceHistoryEntry(BaseModel):
+    material_id: int
+    block_price: float
+    block_price_unit: str
+    sheet_price: float
+    sheet_price_unit: str
+    effective_from: str          # ISO date or datetime (UTC)
+    source: Optional[str] = None
+
+
+def parse_as_of(value, end_of_day=True):
+    """Normalizes an ISO date/datetime to the stored timestamp format; a bare date means the end (or start) of that day."""
+    if value is None:
+        return None
+    try:
+        parsed = datetime.fromisoformat(str(value).strip().replace("Z", "+00:00"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid date '{value}'. Use ISO format, e.g. 2024-05-31 or 2024-05-31T14:00:00.")
+    if len(str(value).strip()) == 10:
+        parsed = datetime.combine(parsed.date(), dt_time(23, 59, 59) if end_of_day else dt_time(0, 0, 0))
+    if parsed.tzinfo is not None:
+        parsed = (parsed - parsed.utcoffset()).replace(tzinfo=None)  # ✅ Stored timestamps are UTC
+    return parsed.strftime(TIMESTAMP_FORMAT)
+
+
+def append_price_history(cursor, material_ids, source=None):
+    """Snapshots the current material_costing rows of `material_ids` into the history in one executemany."""
+    cursor.executemany("""
+        INSERT INTO material_price_history (material_id, block_price, block_price_unit, sheet_price, sheet_price_unit, source)
+        SELECT material_id, block_price, block_price_unit, sheet_price, sheet_price_unit, ?
+        FROM material_costing WHERE material_id = ?
+    """, [(source, material_id) for material_id in material_ids])
+
+
+def load_prices_as_of(as_of, material_ids=None):
+    """
+    Resolves the price rows in effect at `as_of` for many materials with one indexed query.
+
+    Returns:
+        {material_id: row} with the latest history row whose effective_from <= as_of.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query = """
+        SELECT * FROM (
+            SELECT h.*, ROW_NUMBER() OVER (
+                PARTITION BY h.material_id ORDER BY h.effective_from DESC, h.id DESC
+            ) AS row_rank
+            FROM material_price_history h
+            WHERE h.effective_from <= ? {material_filter}
+        ) WHERE row_rank = 1
+    """
+    params = [as_of]
+    if material_ids is not None:
+        material_ids = list(material_ids)
+        if not material_ids:
+            conn.close()
+            return {}
+        query = query.format(material_filter=f"AND h.material_id IN ({', '.join('?' * len(material_ids))})")
+        params += material_ids
+    else:
+        query = query.format(material_filter="")
+    cursor.execute(query, params)
+    rows = {row["material_id"]: dict(row) for row in cursor.fetchall()}
+    conn.close()
+    return rows
+
+
+def materials_as_of(as_of):
+    """
+    The material catalogue with prices replaced by those in effect at `as_of`.
+    Materials without history before that date keep their current prices and are
+    flagged with "price_as_of": None (see prices_without_history).
+    """
+    materials = get_material_catalogue().materials
+    if as_of is None:
+        return materials
+
+    history = load_prices_as_of(as_of)
+    resolved = {}
+    for material_id, material in materials.items():
+        row = history.get(material_id)
+        if row is None:
+            resolved[material_id] = {**material, "price_as_of": None}
+            continue
+        resolved[material_id] = {
+            **material,
+            **resolve_prices(material["name"], row),
+            "price_as_of": row["effective_from"],
+        }
+    return resolved
+
+
+def prices_without_history(pricing, material_ids):
+    """Names of the materials in `material_ids` that materials_as_of priced at current prices."""
+    return sorted({
+        pricing[material_id]["name"] for material_id in material_ids
+        if material_id in pricing and "price_as_of" in pricing[material_id]
+        and pricing[material_id]["price_as_of"] is None
+    })
+
+
+# ✅ API: Fetch Price History of a Material
+@router.get("/{material_id}")
+def get_price_history(material_id: int, since: Optional[str] = None, until: Optional[str] = None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT * FROM material_price_history
+        WHERE material_id = ? AND effective_from >= ? AND effective_from <= ?
+        ORDER BY effective_from, id
+    """, (material_id, parse_as_of(since, end_of_day=False) if since else "", parse_as_of(until) if until else "9999"))
+    history = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return history
+
+# ✅ API: Record a Historical Price (e.g. back-filling older quotes)
+@router.post("/")
+def add_price_history(entry: PriceHistoryEntry):
+    effective_from = parse_as_of(entry.effective_from, end_of_day=False)
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        cursor.execute("SELECT id FROM materials WHERE id = ?", (entry.material_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail=f"Material with ID '{entry.material_id}' not found.")
+        cursor.execute("""
+            INSERT INTO material_price_history
+                (material_id, block_price, block_price_unit, sheet_price, sheet_price_unit, effective_from, source)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, (
+            entry.material_id, entry.block_price, entry.block_price_unit,
+            entry.sheet_price, entry.sheet_price_unit, effective_from, entry.source or "manual",
+        ))
+        conn.commit()
+        bump_catalogue_version()
+        return {"message": "Price history entry added successfully.", "id": cursor.lastrowid, "effective_from": effective_from}
+
+    except sqlite3.Error as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    finally:
+        conn.close()
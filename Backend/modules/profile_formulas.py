@@ -0,0 +1,228 @@
+# /modules/profile_formulas.py
+
+import math
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from modules.unit_conversion import UnitConversionError, conversion_factor
+
+# ✅ Grammar supported by material profile volume formulas:
+#   expr   := term (("+" | "-") term)*
+#   term   := unary (("*" | "/") unary)*
+#   unary  := "-" unary | power
+#   power  := atom ("^" unary)?          (right associative)
+#   atom   := number | name | "(" expr ")"
+CONSTANTS = {"π": math.pi, "pi": math.pi}
+
+TOKEN_PATTERN = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)|([^\W\d]\w*)|(.))", re.UNICODE)
+
+OPERATORS = {
+    "+": np.add,
+    "-": np.subtract,
+    "*": np.multiply,
+    "/": np.divide,
+    "^": np.power,
+}
+
+
+class FormulaError(ValueError):
+    """Raised when a volume formula cannot be parsed or evaluated."""
+
+
+def tokenize(formula):
+    tokens = []
+    position = 0
+    formula = formula.strip()
+    while position < len(formula):
+        match = TOKEN_PATTERN.match(formula, position)
+        if not match:
+            break
+        number, name, symbol = match.groups()
+        if number is not None:
+            tokens.append(("num", float(number)))
+        elif name is not None:
+            tokens.append(("name", name))
+        elif symbol in OPERATORS or symbol in "()":
+            tokens.append(("op", symbol))
+        elif symbol.strip():
+            raise FormulaError(f"Unexpected character '{symbol}' in formula.")
+        position = match.end()
+    return tokens
+
+
+class _Parser:
+    """Recursive-descent parser producing a small tuple-based AST."""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.index = 0
+
+    def peek(self):
+        return self.tokens[self.index] if self.index < len(self.tokens) else (None, None)
+
+    def take(self, expected=None):
+        kind, value = self.peek()
+        if kind is None or (expected is not None and value != expected):
+            raise FormulaError(f"Expected '{expected}' in formula." if expected else "Unexpected end of formula.")
+        self.index += 1
+        return kind, value
+
+    def parse(self):
+        node = self.expr()
+        if self.index != len(self.tokens):
+            raise FormulaError(f"Unexpected token '{self.peek()[1]}' in formula.")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while self.peek() in (("op", "+"), ("op", "-")):
+            _, op = self.take()
+            node = ("bin", op, node, self.term())
+        return node
+
+    def term(self):
+        node = self.unary()
+        while self.peek() in (("op", "*"), ("op", "/")):
+            _, op = self.take()
+            node = ("bin", op, node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek() == ("op", "-"):
+            self.take()
+            return ("neg", self.unary())
+        return self.power()
+
+    def power(self):
+        node = self.atom()
+        if self.peek() == ("op", "^"):
+            self.take()
+            node = ("bin", "^", node, self.unary())
+        return node
+
+    def atom(self):
+        kind, value = self.take()
+        if kind == "num":
+            return ("const", value)
+        if kind == "name":
+            if value in CONSTANTS:
+                return ("const", CONSTANTS[value])
+            return ("var", value)
+        if value == "(":
+            node = self.expr()
+            self.take(")")
+            return node
+        raise FormulaError(f"Unexpected token '{value}' in formula.")
+
+
+def _collect_variables(node, names):
+    kind = node[0]
+    if kind == "var":
+        names.add(node[1])
+    elif kind == "neg":
+        _collect_variables(node[1], names)
+    elif kind == "bin":
+        _collect_variables(node[2], names)
+        _collect_variables(node[3], names)
+    return names
+
+
+def _build(node):
+    """Turns an AST node into a closure evaluating it over a dict of NumPy arrays."""
+    kind = node[0]
+    if kind == "const":
+        value = node[1]
+        return lambda env: value
+    if kind == "var":
+        name = node[1]
+        return lambda env: env[name]
+    if kind == "neg":
+        operand = _build(node[1])
+        return lambda env: np.negative(operand(env))
+
+    ufunc = OPERATORS[node[1]]
+    left, right = _build(node[2]), _build(node[3])
+    return lambda env: ufunc(left(env), right(env))
+
+
+class CompiledFormula:
+    def __init__(self, source, evaluator, variables):
+        self.source = source
+        self.variables = variables
+        self._evaluator = evaluator
+
+    def __call__(self, env):
+        missing = self.variables - env.keys()
+        if missing:
+            raise FormulaError(f"Missing dimension(s): {', '.join(sorted(missing))}")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.asarray(self._evaluator(env), dtype=float)
+
+
+@lru_cache(maxsize=128)
+def compile_formula(formula):
+    """Parses a volume formula once; repeated calls with the same string hit the cache."""
+    if not formula or not formula.strip():
+        raise FormulaError("Formula is empty.")
+    ast = _Parser(tokenize(formula)).parse()
+    return CompiledFormula(formula, _build(ast), frozenset(_collect_variables(ast, set())))
+
+
+def validate_formula(formula, fields):
+    """Compiles a formula and checks it only references the profile's fields."""
+    compiled = compile_formula(formula)
+    unknown = compiled.variables - set(fields)
+    if unknown:
+        raise FormulaError(f"Formula references unknown field(s): {', '.join(sorted(unknown))}")
+    return compiled
+
+
+def _dimension(row, field, index):
+    """A row's value for `field`; a missing or non-numeric value is an error, never a silent 0."""
+    value = row.get(field)
+    if value is None or value == "":
+        raise FormulaError(f"Row {index + 1} is missing dimension '{field}'.")
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        raise FormulaError(f"Row {index + 1} has a non-numeric '{field}': {value!r}") from None
+
+
+def evaluate_profile_volumes(profile, rows, dimensions_unit=None, volume_unit=None):
+    """
+    Evaluates a profile's volume formula for many dimension sets in one vectorized call.
+
+    - profile: Material profile dict with `fields_json`, `volume_formula` and `default_unit`.
+    - rows: List of dicts mapping field names to numeric values.
+    - dimensions_unit: Unit of the input values; defaults to each field's unit in `fields_json`.
+    - volume_unit: Unit of the returned volumes; defaults to the profile's `default_unit`.
+
+    Returns:
+        NumPy array with one volume per row.
+    """
+    fields = profile.get("fields_json") or {}
+    compiled = validate_formula(profile.get("volume_formula"), fields)
+
+    env = {}
+    for field in compiled.variables:
+        values = np.fromiter((_dimension(row, field, i) for i, row in enumerate(rows)), dtype=float, count=len(rows))
+        field_unit = fields.get(field)
+        if dimensions_unit and field_unit and dimensions_unit != field_unit:
+            values = values * _unit_factor(dimensions_unit, field_unit)  # ✅ One scale factor per field
+        env[field] = values
+
+    volumes = np.broadcast_to(compiled(env), (len(rows),)).astype(float)
+
+    default_unit = profile.get("default_unit")
+    if volume_unit and default_unit and volume_unit != default_unit:
+        volumes = volumes * _unit_factor(default_unit, volume_unit)
+    return volumes
+
+
+def _unit_factor(from_unit, to_unit):
+    try:
+        return conversion_factor(from_unit, to_unit)
+    except UnitConversionError as e:
+        raise FormulaError(str(e)) from None
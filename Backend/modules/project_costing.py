@@ -0,0 +1,161 @@
+# /modules/project_costing.py
+
+import json
+
+import numpy as np
+
+from modules.db_utils import get_db_connection
+from modules.machining_estimator import estimate_project_machining
+from modules.cost_uncertainty import load_distributions, resolve_distribution
+from modules.currency import convert_amounts, get_currency_context, present_amounts
+from modules.material_catalogue import get_material_catalogue, material_price_currency, material_unit_price
+from modules.price_history import materials_as_of, prices_without_history
+from modules.sheet_nesting import nest_project_sheets
+
+def price_nesting_groups(groups, pricing=None):
+    """Adds `sheet_mass` (kg) and `sheet_cost` (display currency) to nested sheet groups using the sheet price."""
+    pricing = pricing if pricing is not None else get_material_catalogue().materials
+    costs, currencies = [], []
+    for group in groups:
+        material = pricing.get(group["material_id"])
+        if material and group.get("sheet_volume"):
+            group["sheet_mass"] = group["sheet_volume"] * material["density"]
+            costs.append(group["sheet_mass"] * material_unit_price(material, "sheet_price"))
+            currencies.append(material.get("sheet_currency"))
+        else:
+            group["sheet_mass"] = None
+            costs.append(None)
+            currencies.append(None)
+
+    converted = convert_amounts([c or 0.0 for c in costs], currencies)
+    for group, cost, value in zip(groups, costs, converted):
+        group["sheet_cost"] = float(value) if cost is not None else None
+    return groups
+
+
+def load_cost_components(project_id, nest_sheets=True, as_of=None):
+    """
+    Breaks a project's cost into per-part arrays that batch evaluators can scale.
+
+    With `nest_sheets`, sheet-priced parts are charged their area share of the nested
+    sheets instead of their own stock volume. `as_of` (stored timestamp format) prices
+    materials from the price history in effect at that time.
+
+    Returns:
+        Dict with the part list, `materials`/`operations` id lists, index arrays mapping
+        each part to them (-1 = none), the modal `scrap` fraction per material,
+        base `material_cost` (scrap included), `machining_cost`,
+        `mass_kg` and `hours` arrays, and the stock/part volumes, removal rates,
+        finishing hours and hourly rates the machining time is built from, plus
+        `prices_without_history`: materials an `as_of` run had to price at current prices.
+    """
+    machining = estimate_project_machining(project_id, save=False)
+    breakdowns = machining["parts"]
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.part_id, p.raw_material_details, c.pricing_type
+        FROM parts p
+        LEFT JOIN part_classification c ON p.classification_id = c.id
+        WHERE p.project_id = ?
+    """, (project_id,))
+    part_rows = {row["part_id"]: row for row in cursor.fetchall()}
+    conn.close()
+
+    pricing = materials_as_of(as_of)
+
+    nesting_groups = nest_project_sheets(project_id) if nest_sheets else []
+    nested_volume = {}
+    for group in nesting_groups:
+        nested_volume.update(group.get("part_volume_share", {}))
+
+    materials, operations = {}, {}  # ✅ id -> column position, in first-seen order
+    material_index, operation_index = [], []
+    mass_kg, unit_price, price_currencies = [], [], []
+    for breakdown in breakdowns:
+        row = part_rows.get(breakdown["part_id"])
+        try:
+            raw_details = json.loads(row["raw_material_details"] or "{}") if row else {}
+        except json.JSONDecodeError:
+            raw_details = {}
+
+        material_id = raw_details.get("material_id")
+        material = pricing.get(material_id)
+        if material:
+            material_index.append(materials.setdefault(material_id, len(materials)))
+            pricing_type = (row["pricing_type"] if row else None) or "block_price"
+            stock_volume = breakdown["stock_volume"]
+            if pricing_type == "sheet_price" and breakdown["part_id"] in nested_volume:
+                stock_volume = nested_volume[breakdown["part_id"]]
+            mass_kg.append(stock_volume * material["density"])
+            unit_price.append(material_unit_price(material, pricing_type))
+            price_currencies.append(material_price_currency(material, pricing_type))
+        else:
+            material_index.append(-1)
+            mass_kg.append(0.0)
+            unit_price.append(0.0)
+            price_currencies.append(None)
+
+        operation_id = breakdown["operation_id"]
+        if operation_id is not None:
+            operation_index.append(operations.setdefault(operation_id, len(operations)))
+        else:
+            operation_index.append(-1)
+
+    mass_kg = np.array(mass_kg, dtype=float)
+    # ✅ Currency stage: every material price converted to the display currency in one pass
+    unit_price = convert_amounts(unit_price, price_currencies)
+    # ✅ Most likely scrap fraction per material (trailing 0 for parts without one), the same
+    # mode the Monte Carlo bands draw around
+    distributions = load_distributions()
+    scrap = np.array([resolve_distribution(distributions, "scrap", m)[2] for m in materials] + [0.0], dtype=float)
+    material_index = np.array(material_index, dtype=int)
+    return {
+        "parts": [{"part_id": b["part_id"], "name": b["name"], "operation": b["operation"]} for b in breakdowns],
+        "materials": list(materials),
+        "operations": list(operations),
+        "material_index": material_index,
+        "operation_index": np.array(operation_index, dtype=int),
+        "mass_kg": mass_kg,
+        "unit_price": unit_price,
+        "scrap": scrap,
+        "material_cost": mass_kg * unit_price * (1.0 + scrap[material_index]),
+        "hours": np.array([b["hours"] for b in breakdowns], dtype=float),
+        "stock_volume": np.array([b["stock_volume"] for b in breakdowns], dtype=float),
+        "part_volume": np.array([b["part_volume"] for b in breakdowns], dtype=float),
+        "removal_rate": np.array([b["removal_rate"] for b in breakdowns], dtype=float),
+        "finishing_hours": np.array([b["finishing_hours"] for b in breakdowns], dtype=float),
+        "rate_per_hour": np.array([b["rate_per_hour"] for b in breakdowns], dtype=float),
+        "machining_cost": np.array([b["cost"] for b in breakdowns], dtype=float),
+        "nesting": price_nesting_groups(nesting_groups, pricing),
+        "prices_without_history": prices_without_history(
+            pricing, list(materials) + [group["material_id"] for group in nesting_groups]
+        ),
+    }
+
+
+def project_point_costs(components):
+    """Per-part and total point estimates from a component set, rounded for display in one vectorized step."""
+    material_cost = components["material_cost"]
+    machining_cost = components["machining_cost"]
+    total = material_cost + machining_cost
+
+    # ✅ Totals are summed before rounding; rounding is presentation only
+    parts = present_amounts(np.column_stack([material_cost, machining_cost, total])) if len(total) else np.zeros((0, 3))
+    totals = present_amounts([material_cost.sum(), machining_cost.sum(), total.sum()])
+    return {
+        "currency": get_currency_context()["currency"],
+        "parts": [
+            {
+                **part,
+                "material_cost": float(parts[i, 0]),
+                "machining_cost": float(parts[i, 1]),
+                "total_cost": float(parts[i, 2]),
+            }
+            for i, part in enumerate(components["parts"])
+        ],
+        "material_cost": float(totals[0]),
+        "machining_cost": float(totals[1]),
+        "total_cost": float(totals[2]),
+    }
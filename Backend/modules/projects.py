@@ -3,6 +3,8 @@ import sqlite3
 import uuid
 from fastapi import APIRouter, HTTPException
 from modules.parts import delete_part  # Import delete_part function from parts.py
+from modules.cad_worker import MESH_BASE, note_project_view
+from modules.thumbnail_sprites import remove_project_sprite
 from pydantic import BaseModel
 
 router = APIRouter()
@@ -110,6 +112,7 @@ def get_project_details(project_id: str):
 
         cursor.execute("SELECT * FROM parts WHERE project_id = ?", (project_id,))
         parts = [dict(part) for part in cursor.fetchall()]
+        note_project_view(project_id)  # ✅ Lets the prewarmer build this project's artifacts first
 
         return {
             "project_id": project["project_id"],
@@ -207,6 +210,7 @@ def delete_project(project_id: str):
             os.path.join(UPLOAD_BASE, project_id),
             os.path.join(PROJECTION_BASE, project_id),
             os.path.join(THUMBNAIL_BASE, project_id),
+            os.path.join(MESH_BASE, project_id),
         ]
 
         for directory in project_dirs:
@@ -215,6 +219,7 @@ def delete_project(project_id: str):
                     shutil.rmtree(directory)  # ✅ Remove folder and its contents if any
                 except Exception as e:
                     print(f"❌ Error removing directory {directory}: {e}")
+        remove_project_sprite(project_id)
 
         return {"message": "Project and all associated files deleted successfully."}
 
@@ -0,0 +1,339 @@
+# /modules/quote_export.py
+
+import csv
+import io
+import json
+import os
+import tempfile
+from datetime import datetime
+from typing import Optional
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from PIL import Image
+
+from modules.currency import get_currency_context, present_amounts
+from modules.db_utils import get_db_connection
+from modules.material_bulk import content_disposition
+from modules.material_catalogue import get_classification, get_material
+from modules.price_history import parse_as_of
+from modules.project_costing import load_cost_components
+
+try:
+    import openpyxl  # ✅ Optional: only needed for .xlsx quotes
+except ImportError:
+    openpyxl = None
+
+router = APIRouter()
+
+QUOTE_COLUMNS = (
+    "line", "part_id", "part_name", "classification", "material",
+    "operation", "hours", "material_cost", "machining_cost", "total_cost", "thumbnail",
+)
+CSV_CHUNK_ROWS = 500
+PDF_THUMBNAIL_PX = 96
+
+
+def thumbnail_url(project_id, thumbnail_path):
+    return f"/cad/thumbnail/{project_id}/{os.path.basename(thumbnail_path)}" if thumbnail_path else ""
+
+
+def iter_quote_lines(conn, project_id, as_of=None):
+    """
+    Yields one quote line per part, reading parts from a cursor.
+
+    Costs come from one vectorized project costing pass over the whole project (it is
+    not chunked, since nesting and totals need every part) and are rounded once; only
+    the part rows and the rendered output are streamed.
+    """
+    components = load_cost_components(project_id, as_of=as_of)
+    index = {part["part_id"]: i for i, part in enumerate(components["parts"])}
+    operations = [part.get("operation") or "" for part in components["parts"]]
+    material = components["material_cost"]
+    machining = components["machining_cost"]
+    rounded = present_amounts(np.column_stack([material, machining, material + machining])) if len(material) else np.zeros((0, 3))
+    hours = np.round(components["hours"], 3)
+
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT part_id, name, classification_id, raw_material_details, thumbnail
+        FROM parts WHERE project_id = ? ORDER BY id
+    """, (project_id,))
+    for line, row in enumerate(cursor, start=1):
+        try:
+            raw_details = json.loads(row["raw_material_details"] or "{}")
+        except json.JSONDecodeError:
+            raw_details = {}
+        material_data = get_material(raw_details.get("material_id"))
+        classification = get_classification(row["classification_id"])
+        i = index.get(row["part_id"])
+        yield {
+            "line": line,
+            "part_id": row["part_id"],
+            "part_name": row["name"],
+            "classification": classification["name"] if classification else "",
+            "material": material_data["name"] if material_data else "",
+            "operation": operations[i] if i is not None else "",
+            "hours": float(hours[i]) if i is not None else 0.0,
+            "material_cost": float(rounded[i, 0]) if i is not None else 0.0,
+            "machining_cost": float(rounded[i, 1]) if i is not None else 0.0,
+            "total_cost": float(rounded[i, 2]) if i is not None else 0.0,
+            "thumbnail": row["thumbnail"] or "",
+        }
+
+    yield {"totals": {
+        "material_cost": float(present_amounts([material.sum()])[0]),
+        "machining_cost": float(present_amounts([machining.sum()])[0]),
+        "total_cost": float(present_amounts([(material + machining).sum()])[0]),
+        "hours": float(np.round(components["hours"].sum(), 3)),
+    }}
+
+
+def _csv_row(line, project_id):
+    return [line[c] if c != "thumbnail" else thumbnail_url(project_id, line[c]) for c in QUOTE_COLUMNS]
+
+
+def stream_csv(conn, project_id, as_of):
+    try:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(QUOTE_COLUMNS)
+        yield buffer.getvalue()  # ✅ First byte before the costing pass
+        buffer.seek(0)
+        buffer.truncate()
+
+        for count, line in enumerate(iter_quote_lines(conn, project_id, as_of), start=1):
+            if "totals" in line:
+                totals = line["totals"]
+                writer.writerow(["", "", "TOTAL", "", "", "", totals["hours"], totals["material_cost"], totals["machining_cost"], totals["total_cost"], ""])
+            else:
+                writer.writerow(_csv_row(line, project_id))
+            if count % CSV_CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        writer.writerow([])
+        writer.writerow(["currency", get_currency_context()["currency"]])
+        yield buffer.getvalue()
+    finally:
+        conn.close()
+
+
+def stream_xlsx(conn, project_id, as_of):
+    try:
+        workbook = openpyxl.Workbook(write_only=True)  # ✅ Rows are flushed to disk, not kept in memory
+        sheet = workbook.create_sheet("Quote")
+        sheet.append(list(QUOTE_COLUMNS))
+        for line in iter_quote_lines(conn, project_id, as_of):
+            if "totals" in line:
+                totals = line["totals"]
+                sheet.append(["", "", "TOTAL", "", "", "", totals["hours"], totals["material_cost"], totals["machining_cost"], totals["total_cost"], ""])
+            else:
+                sheet.append(_csv_row(line, project_id))
+        sheet.append([])
+        sheet.append(["currency", get_currency_context()["currency"]])
+    finally:
+        conn.close()
+
+    with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+        workbook.save(spool)
+        spool.seek(0)
+        while True:
+            chunk = spool.read(64 * 1024)
+            if not chunk:
+                break
+            yield chunk
+
+
+class StreamingPDF:
+    """
+    Minimal PDF 1.4 writer that emits objects as soon as they are complete.
+
+    Only page object numbers and xref offsets are kept, so memory does not grow
+    with page content. Text uses the built-in Helvetica fonts; images are JPEG.
+    """
+
+    PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # ✅ A4 in points
+
+    def __init__(self):
+        self.offset = 0
+        self.offsets = {}
+        self.pages = []
+        self.next_number = 5  # ✅ 1 catalog, 2 page tree, 3 regular font, 4 bold font
+
+    def _emit(self, data):
+        self.offset += len(data)
+        return data
+
+    def _object(self, number, body):
+        self.offsets[number] = self.offset
+        if isinstance(body, str):
+            body = body.encode("latin-1")
+        return self._emit(f"{number} 0 obj\n".encode() + body + b"\nendobj\n")
+
+    def _allocate(self):
+        number = self.next_number
+        self.next_number += 1
+        return number
+
+    def start(self):
+        return self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n") + b"".join([
+            self._object(3, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>"),
+            self._object(4, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>"),
+        ])
+
+    def image(self, jpeg_bytes, width, height):
+        """Writes a JPEG XObject and returns (bytes, object number)."""
+        number = self._allocate()
+        header = (
+            f"<< /Type /XObject /Subtype /Image /Width {width} /Height {height} "
+            f"/ColorSpace /DeviceRGB /BitsPerComponent 8 /Filter /DCTDecode /Length {len(jpeg_bytes)} >>\nstream\n"
+        ).encode()
+        return self._object(number, header + jpeg_bytes + b"\nendstream"), number
+
+    def page(self, content, images):
+        """Writes a page with its content stream; `images` maps XObject names to object numbers."""
+        content = content.encode("latin-1", "replace")
+        content_number, page_number = self._allocate(), self._allocate()
+        xobjects = " ".join(f"/{name} {number} 0 R" for name, number in images.items())
+        self.pages.append(page_number)
+        return self._object(
+            content_number, f"<< /Length {len(content)} >>\nstream\n".encode() + content + b"\nendstream"
+        ) + self._object(page_number, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.PAGE_WIDTH} {self.PAGE_HEIGHT}] "
+            f"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> /XObject << {xobjects} >> >> "
+            f"/Contents {content_number} 0 R >>"
+        ))
+
+    def finish(self):
+        kids = " ".join(f"{n} 0 R" for n in self.pages)
+        data = self._object(2, f"<< /Type /Pages /Kids [{kids}] /Count {len(self.pages)} >>")
+        data += self._object(1, "<< /Type /Catalog /Pages 2 0 R >>")
+        xref_offset = self.offset
+        lines = [f"xref\n0 {self.next_number}\n", "0000000000 65535 f \n"]
+        for number in range(1, self.next_number):
+            lines.append(f"{self.offsets.get(number, 0):010d} 00000 n \n")
+        lines.append(f"trailer\n<< /Size {self.next_number} /Root 1 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n")
+        return data + self._emit("".join(lines).encode())
+
+
+def pdf_text(x, y, text, size=8, bold=False):
+    escaped = str(text).replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"BT /{'F2' if bold else 'F1'} {size} Tf {x:.1f} {y:.1f} Td ({escaped}) Tj ET\n"
+
+
+def pdf_thumbnail(path):
+    """Downscaled JPEG of a PNG thumbnail on a white background, or None."""
+    if not path or not os.path.exists(path):
+        return None
+    try:
+        with Image.open(path) as img:
+            img = img.convert("RGBA")
+            img.thumbnail((PDF_THUMBNAIL_PX, PDF_THUMBNAIL_PX))
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3])
+            buffer = io.BytesIO()
+            background.save(buffer, format="JPEG", quality=80)
+            return buffer.getvalue(), background.size
+    except (OSError, ValueError):
+        return None
+
+
+# ✅ PDF table layout (x positions in points)
+PDF_COLUMNS = (
+    ("", 40), ("Part", 80), ("Classification", 215), ("Material", 305),
+    ("Mat. cost", 395), ("Machining", 455), ("Total", 515),
+)
+PDF_ROW_HEIGHT = 32
+PDF_TOP = 760
+PDF_BOTTOM = 50
+
+
+def stream_pdf(conn, project_id, project_name, as_of):
+    pdf = StreamingPDF()
+    try:
+        yield pdf.start()
+        currency = get_currency_context()["currency"]
+
+        def page_header(page_number):
+            content = pdf_text(40, 800, f"Quote - {project_name}", 14, bold=True)
+            content += pdf_text(40, 785, f"{datetime.now().strftime('%Y-%m-%d')}   Currency: {currency}   Page {page_number}", 8)
+            for title, x in PDF_COLUMNS:
+                content += pdf_text(x, PDF_TOP + 8, title, 8, bold=True)
+            return content + f"0.5 w 40 {PDF_TOP + 4} m 555 {PDF_TOP + 4} l S\n"
+
+        page_number = 1
+        content, images, y = page_header(page_number), {}, PDF_TOP
+        for line in iter_quote_lines(conn, project_id, as_of):
+            if y - PDF_ROW_HEIGHT < PDF_BOTTOM:
+                yield pdf.page(content, images)
+                page_number += 1
+                content, images, y = page_header(page_number), {}, PDF_TOP
+            y -= PDF_ROW_HEIGHT
+
+            if "totals" in line:
+                totals = line["totals"]
+                content += pdf_text(80, y + 12, "TOTAL", 9, bold=True)
+                for key, x in (("material_cost", 395), ("machining_cost", 455), ("total_cost", 515)):
+                    content += pdf_text(x, y + 12, f"{totals[key]:,.2f}", 9, bold=True)
+                continue
+
+            thumbnail = pdf_thumbnail(line["thumbnail"])
+            if thumbnail:
+                data, (width, height) = thumbnail
+                chunk, number = pdf.image(data, width, height)
+                yield chunk
+                name = f"Im{line['line']}"
+                images[name] = number
+                scale = 28 / max(width, height)
+                content += f"q {width * scale:.1f} 0 0 {height * scale:.1f} 40 {y + 2:.1f} cm /{name} Do Q\n"
+
+            content += pdf_text(80, y + 18, line["part_name"][:28], 8, bold=True)
+            content += pdf_text(80, y + 8, (line["operation"] + (f"  {line['hours']:.2f} h" if line["hours"] else ""))[:34], 7)
+            content += pdf_text(215, y + 12, line["classification"][:18], 8)
+            content += pdf_text(305, y + 12, line["material"][:18], 8)
+            content += pdf_text(395, y + 12, f"{line['material_cost']:,.2f}", 8)
+            content += pdf_text(455, y + 12, f"{line['machining_cost']:,.2f}", 8)
+            content += pdf_text(515, y + 12, f"{line['total_cost']:,.2f}", 8)
+
+        yield pdf.page(content, images)
+        yield pdf.finish()
+    finally:
+        conn.close()
+
+
+# ✅ API: Stream a Per-Part Quote
+@router.get("/{project_id}/quote")
+def export_quote(project_id: str, format: str = "csv", as_of: Optional[str] = None):
+    """Streams a per-part quote for a project as CSV, XLSX or PDF."""
+    fmt = format.lower()
+    if fmt not in ("csv", "xlsx", "pdf"):
+        raise HTTPException(status_code=400, detail="Format must be one of: csv, xlsx, pdf.")
+    if fmt == "xlsx" and openpyxl is None:
+        raise HTTPException(status_code=400, detail="XLSX support requires the 'openpyxl' package.")
+    as_of = parse_as_of(as_of)
+
+    conn = get_db_connection(check_same_thread=False)  # ✅ The streamed body reads it from worker threads
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM projects WHERE project_id = ?", (project_id,))
+    project = cursor.fetchone()
+    if not project:
+        conn.close()
+        raise HTTPException(status_code=404, detail="Project not found.")
+
+    media_types = {
+        "csv": "text/csv",
+        "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "pdf": "application/pdf",
+    }
+    if fmt == "pdf":
+        body = stream_pdf(conn, project_id, project["name"], as_of)
+    elif fmt == "xlsx":
+        body = stream_xlsx(conn, project_id, as_of)
+    else:
+        body = stream_csv(conn, project_id, as_of)
+
+    return StreamingResponse(body, media_type=media_types[fmt], headers={
+        "Content-Disposition": content_disposition(f"{project['name']}-quote.{fmt}", fallback=f"quote.{fmt}")
+    })
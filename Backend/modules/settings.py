@@ -7,7 +7,12 @@ from .advanced_settings import router as advanced_settings_router  # ✅ Import
 from .part_classification import router as part_classification_router  # ✅ Import part classification module
 from .operation_settings import router as operations_setting__router  # ✅ Import part classification module
 from .materials import router as materials_router  # ✅ Import part classification module
+from .material_bulk import router as material_bulk_router
+from .price_history import router as price_history_router
 from .material_profiles import router as material_profiles_router 
+from .stock_catalogue import router as stock_sizes_router
+from .cost_uncertainty import router as cost_distributions_router
+from .currency import router as currency_rates_router
 
 # ✅ Define the main settings router
 router = APIRouter()
@@ -18,8 +23,13 @@ router.include_router(costing_defaults_router, prefix="/costing_defaults", tags=
 router.include_router(advanced_settings_router, prefix="/advanced_settings", tags=["Advanced Settings"])
 router.include_router(part_classification_router, prefix="/part_classification", tags=["Part Classification"])
 router.include_router(operations_setting__router, prefix="/operations_settings", tags=["Operations Settings"])
+router.include_router(material_bulk_router, prefix="/materials/bulk", tags=["Materials"])  # ✅ Before /materials/{material_id}
+router.include_router(price_history_router, prefix="/materials/price_history", tags=["Materials"])
 router.include_router(materials_router, prefix="/materials", tags=["Materials"])
 router.include_router(material_profiles_router, prefix="/profiles", tags=["Material Profiles"])
+router.include_router(stock_sizes_router, prefix="/stock_sizes", tags=["Stock Sizes"])
+router.include_router(cost_distributions_router, prefix="/cost_distributions", tags=["Cost Distributions"])
+router.include_router(currency_rates_router, prefix="/currency_rates", tags=["Currency Rates"])
 
 # ✅ Database file path
 DB_FILE = "database.db"
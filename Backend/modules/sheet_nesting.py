@@ -0,0 +1,315 @@
+# /modules/sheet_nesting.py
+
+import json
+import math
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+
+from modules.db_utils import get_advanced_settings, get_db_connection
+from modules.stock_catalogue import fit_stock_batch, geometry_envelope, get_profile_by_name, get_stock_index
+from modules.unit_conversion import conversion_factor
+
+ADVANCED_SETTINGS = get_advanced_settings()
+NESTING_TIME_BUDGET = float(ADVANCED_SETTINGS.get("nesting_time_budget", 2.0))
+NESTING_SPACING = float(ADVANCED_SETTINGS.get("nesting_spacing", 5.0))   # ✅ Gap between parts (mm)
+NESTING_MARGIN = float(ADVANCED_SETTINGS.get("nesting_margin", 10.0))    # ✅ Unusable sheet border (mm)
+NESTING_WORKERS = int(ADVANCED_SETTINGS.get("nesting_workers", 4))
+
+# ✅ Candidate heuristics evaluated in parallel for every sheet size
+SORT_ORDERS = ("height", "area", "long_side")
+ROTATION_POLICIES = ("free", "landscape", "portrait")
+
+_executor = None
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=NESTING_WORKERS)
+    return _executor
+
+
+class Skyline:
+    """Bottom-left skyline packer for one sheet of `width` × `height`."""
+
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.segments = [[0.0, 0.0, width]]  # ✅ [x, y, width] sorted by x
+
+    def find(self, w, h):
+        """Lowest (then leftmost) position for a w × h rectangle, as (top, x, y, index) or None."""
+        best = None
+        for i, (x, _, _) in enumerate(self.segments):
+            if x + w > self.width + 1e-9:
+                break
+            y, remaining, j = 0.0, w, i
+            while remaining > 1e-9:
+                if j >= len(self.segments):
+                    y = math.inf
+                    break
+                y = max(y, self.segments[j][1])
+                remaining -= self.segments[j][2]
+                j += 1
+            if y + h > self.height + 1e-9:
+                continue
+            if best is None or (y + h, x) < (best[0], best[1]):
+                best = (y + h, x, y, i)
+        return best
+
+    def place(self, w, h, position):
+        _, x, y, index = position
+        self.segments.insert(index, [x, y + h, w])
+        # ✅ Trim the segments now covered by the new one
+        i = index + 1
+        while i < len(self.segments):
+            segment = self.segments[i]
+            previous_end = self.segments[i - 1][0] + self.segments[i - 1][2]
+            if segment[0] >= previous_end - 1e-9:
+                break
+            shrink = previous_end - segment[0]
+            segment[0] += shrink
+            segment[2] -= shrink
+            if segment[2] <= 1e-9:
+                self.segments.pop(i)
+            else:
+                break
+        # ✅ Merge neighbours of equal height
+        i = 0
+        while i < len(self.segments) - 1:
+            if abs(self.segments[i][1] - self.segments[i + 1][1]) < 1e-9:
+                self.segments[i][2] += self.segments[i + 1][2]
+                self.segments.pop(i + 1)
+            else:
+                i += 1
+
+
+def _oriented(w, h, policy):
+    if policy == "landscape":
+        return [(max(w, h), min(w, h))]
+    if policy == "portrait":
+        return [(min(w, h), max(w, h))]
+    return [(w, h), (h, w)] if w != h else [(w, h)]
+
+
+def pack_candidate(rectangles, sheet_size, sort_order, policy, deadline=None):
+    """
+    Packs rectangles onto as many `sheet_size` sheets as needed.
+
+    - rectangles: List of (key, width, height) in mm, spacing already included.
+
+    Returns:
+        Dict with `sheet_count` and `placements`, or None if the deadline passed
+        or a rectangle cannot fit on an empty sheet.
+    """
+    sheet_w, sheet_h = sheet_size
+    sort_keys = {
+        "height": lambda r: (max(r[1], r[2]), min(r[1], r[2])),
+        "area": lambda r: r[1] * r[2],
+        "long_side": lambda r: max(r[1], r[2]),
+    }
+    ordered = sorted(rectangles, key=sort_keys[sort_order], reverse=True)
+
+    sheets, placements = [], []
+    for count, (key, w, h) in enumerate(ordered):
+        if deadline and count % 64 == 0 and time.time() > deadline:
+            return None
+
+        placed = False
+        for sheet_index, sheet in enumerate(sheets):
+            options = [(o, sheet.find(*o)) for o in _oriented(w, h, policy)]
+            options = [(o, p) for o, p in options if p]
+            if options:
+                (ow, oh), position = min(options, key=lambda op: (op[1][0], op[1][1]))
+                sheet.place(ow, oh, position)
+                placements.append({"key": key, "sheet": sheet_index, "x": position[1], "y": position[2], "width": ow, "height": oh})
+                placed = True
+                break
+
+        if not placed:
+            sheet = Skyline(sheet_w, sheet_h)
+            options = [(o, sheet.find(*o)) for o in _oriented(w, h, policy)]
+            options = [(o, p) for o, p in options if p]
+            if not options:
+                return None  # ✅ Part is larger than the sheet in this orientation policy
+            (ow, oh), position = min(options, key=lambda op: (op[1][0], op[1][1]))
+            sheet.place(ow, oh, position)
+            sheets.append(sheet)
+            placements.append({"key": key, "sheet": len(sheets) - 1, "x": position[1], "y": position[2], "width": ow, "height": oh})
+
+    return {
+        "sheet_size": list(sheet_size),
+        "sort_order": sort_order,
+        "rotation": policy,
+        "sheet_count": len(sheets),
+        "placements": placements,
+    }
+
+
+def _pack_candidate_task(args):
+    return pack_candidate(*args)
+
+
+def consumed_sheet_area(nesting, rectangles):
+    """
+    Sheet area the nest actually uses: every full sheet but the last, plus the rectangle
+    (with margins) the placements cover on the last sheet; the rest of it is a remnant
+    that stays in stock. Area estimates use the spaced part area.
+    """
+    sheet_w, sheet_h = nesting["sheet_size"]
+    if not nesting["placements"]:
+        return float(sum(w * h for _, w, h in rectangles))
+    last = nesting["sheet_count"] - 1
+    on_last = [p for p in nesting["placements"] if p["sheet"] == last]
+    used_w = min(sheet_w, max(p["x"] + p["width"] for p in on_last) + 2 * NESTING_MARGIN)
+    used_h = min(sheet_h, max(p["y"] + p["height"] for p in on_last) + 2 * NESTING_MARGIN)
+    return float(last * sheet_w * sheet_h + used_w * used_h)
+
+
+def nest_rectangles(rectangles, sheet_sizes, time_budget=NESTING_TIME_BUDGET):
+    """
+    Evaluates every (sheet size, sort order, rotation policy) candidate in the worker pool
+    and returns the one with the least sheet area, within `time_budget` seconds.
+    Falls back to an area-based estimate if no candidate finishes in time.
+    """
+    usable_sizes = [
+        (length - 2 * NESTING_MARGIN, width - 2 * NESTING_MARGIN)
+        for length, width in sheet_sizes
+        if length > 2 * NESTING_MARGIN and width > 2 * NESTING_MARGIN
+    ]
+    if not rectangles or not usable_sizes:
+        return None
+
+    part_area = sum((w - NESTING_SPACING) * (h - NESTING_SPACING) for _, w, h in rectangles)
+    deadline = time.time() + time_budget
+    tasks = [
+        (rectangles, size, order, policy, deadline)
+        for size in usable_sizes for order in SORT_ORDERS for policy in ROTATION_POLICIES
+    ]
+
+    executor = get_executor()
+    futures = [executor.submit(_pack_candidate_task, task) for task in tasks]
+    done, not_done = wait(futures, timeout=max(0.0, deadline - time.time()) + 0.5)
+    for future in not_done:
+        future.cancel()
+
+    results = [f.result() for f in done if not f.cancelled() and f.exception() is None and f.result()]
+    if results:
+        best = min(results, key=lambda r: r["sheet_count"] * r["sheet_size"][0] * r["sheet_size"][1])
+        best["method"] = "skyline"
+    else:
+        # ✅ Lower bound on the largest sheet when the budget ran out
+        size = max(usable_sizes, key=lambda s: s[0] * s[1])
+        best = {
+            "sheet_size": list(size),
+            "sheet_count": max(1, math.ceil(part_area / (size[0] * size[1]))),
+            "placements": [],
+            "method": "area_estimate",
+        }
+
+    usable_w, usable_h = best["sheet_size"]
+    best["sheet_size"] = [usable_w + 2 * NESTING_MARGIN, usable_h + 2 * NESTING_MARGIN]
+    best["utilization"] = part_area / (best["sheet_count"] * best["sheet_size"][0] * best["sheet_size"][1])
+    best["consumed_area"] = consumed_sheet_area(best, rectangles)
+    best["candidates_evaluated"] = len(results)
+    return best
+
+
+def sheet_part_footprint(geometry):
+    """(thickness, width, length) in mm from a flat pattern if stored, else the part envelope."""
+    flat = geometry.get("flat_pattern")
+    envelope, _ = geometry_envelope(geometry)
+    if flat and flat.get("length") and flat.get("width"):
+        factor = conversion_factor(flat.get("unit") or "mm", "mm")
+        return envelope[0], float(flat["width"]) * factor, float(flat["length"]) * factor
+    return envelope
+
+
+def nest_project_sheets(project_id, time_budget=NESTING_TIME_BUDGET, include_placements=False):
+    """
+    Nests all sheet metal parts of a project, grouped by material and standard sheet thickness.
+
+    Returns:
+        List of groups with sheet size, sheet count, utilization, the volume (mm³) of the
+        sheets bought and of the sheet area used, and each part's per-unit share of the
+        used volume by footprint area.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.part_id, p.name, p.geometry_details, p.raw_material_details
+        FROM parts p
+        JOIN part_classification c ON p.classification_id = c.id
+        WHERE p.project_id = ? AND c.pricing_type = 'sheet_price'
+    """, (project_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    sheet_profile = get_profile_by_name("Sheet")
+    parts, requests = [], []
+    for row in rows:
+        try:
+            geometry = json.loads(row["geometry_details"] or "{}")
+            raw_details = json.loads(row["raw_material_details"] or "{}")
+        except json.JSONDecodeError:
+            continue
+        if not geometry.get("bounding_box"):
+            continue
+        thickness, width, length = sheet_part_footprint(geometry)
+        quantity = max(1, int(raw_details.get("quantity") or 1))
+        parts.append({
+            "part_id": row["part_id"],
+            "name": row["name"],
+            "material_id": raw_details.get("material_id"),
+            "width": width,
+            "length": length,
+            "quantity": quantity,
+        })
+        requests.append({
+            "envelope": (thickness, width, length),
+            "material_id": raw_details.get("material_id"),
+            "profile_id": sheet_profile["id"] if sheet_profile else None,
+        })
+
+    # ✅ Standard thickness per part decides which parts can share a sheet
+    fits = fit_stock_batch(requests) if requests else []
+    groups = {}
+    for part, fit in zip(parts, fits):
+        thickness = fit["dimensions"]["thickness"] if fit else None
+        groups.setdefault((part["material_id"], thickness), []).append(part)
+
+    results = []
+    for (material_id, thickness), group_parts in groups.items():
+        sheet_sizes = []
+        if thickness and sheet_profile:
+            index = get_stock_index(sheet_profile["id"], material_id)
+            sheet_sizes = sorted({
+                (e["stock_length"], e["stock_width"]) for e in (index.entries if index else [])
+                if e["primary"] == thickness and e.get("stock_length") and e.get("stock_width")
+            })
+
+        rectangles = [
+            (f"{part['part_id']}#{copy}", part["width"] + NESTING_SPACING, part["length"] + NESTING_SPACING)
+            for part in group_parts for copy in range(part["quantity"])
+        ]
+        nesting = nest_rectangles(rectangles, sheet_sizes, time_budget) if sheet_sizes else None
+
+        group = {
+            "material_id": material_id,
+            "thickness": thickness,
+            "unit": "mm",
+            "parts": [p["part_id"] for p in group_parts],
+            "nesting": nesting,
+        }
+        if nesting:
+            sheet_volume = nesting["sheet_count"] * nesting["sheet_size"][0] * nesting["sheet_size"][1] * thickness
+            consumed_volume = nesting["consumed_area"] * thickness
+            # ✅ Per unit, like block-priced parts: each copy carries its area's share of the used sheet
+            areas = {p["part_id"]: p["width"] * p["length"] for p in group_parts}
+            total_area = sum(areas[p["part_id"]] * p["quantity"] for p in group_parts) or 1.0
+            group["sheet_volume"] = sheet_volume
+            group["consumed_volume"] = consumed_volume
+            group["part_volume_share"] = {pid: consumed_volume * area / total_area for pid, area in areas.items()}
+            if not include_placements:
+                nesting.pop("placements", None)
+        results.append(group)
+    return results
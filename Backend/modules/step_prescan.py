@@ -0,0 +1,183 @@
+# /modules/step_prescan.py
+
+import mmap
+import os
+import re
+import time
+from collections import Counter
+
+from modules.db_utils import get_advanced_settings
+
+ADVANCED_SETTINGS = get_advanced_settings()
+# ✅ Uploads above the "max" limits are rejected; above the "low priority" limits they go to the slow queue
+STEP_MAX_MB = float(ADVANCED_SETTINGS.get("step_max_mb", 250))
+STEP_MAX_ENTITIES = int(ADVANCED_SETTINGS.get("step_max_entities", 5000000))
+STEP_LOW_PRIORITY_MB = float(ADVANCED_SETTINGS.get("step_low_priority_mb", 50))
+STEP_LOW_PRIORITY_ENTITIES = int(ADVANCED_SETTINGS.get("step_low_priority_entities", 1000000))
+
+MAGIC = b"ISO-10303-21;"
+HEADER_LIMIT = 1 << 16  # ✅ The HEADER section is a few hundred bytes; never parse further than this
+
+# ✅ FILE_SCHEMA identifiers and the application protocols they belong to
+SCHEMAS = {
+    "CONFIG_CONTROL_DESIGN": "AP203",
+    "AP203_CONFIGURATION_CONTROLLED_3D_DESIGN": "AP203e2",
+    "AUTOMOTIVE_DESIGN": "AP214",
+    "AP242_MANAGED_MODEL_BASED_3D_ENGINEERING": "AP242",
+}
+# ✅ Entities that only appear with semantic or graphical PMI
+PMI_ENTITIES = (
+    "DATUM", "DATUM_FEATURE", "DIMENSIONAL_LOCATION", "DIMENSIONAL_SIZE", "DRAUGHTING_CALLOUT",
+    "GEOMETRIC_TOLERANCE", "TESSELLATED_ANNOTATION_OCCURRENCE", "ANNOTATION_PLANE",
+)
+SOLID_ENTITIES = ("MANIFOLD_SOLID_BREP", "BREP_WITH_VOIDS")
+SI_LENGTHS = {"MILLI": "mm", "CENTI": "cm", "DECI": "dm", "": "m", "KILO": "km", "MICRO": "µm"}
+MEGABYTE = 1024 * 1024
+
+ENTITY = re.compile(rb"#\d+\s*=\s*([A-Z_][A-Z0-9_]*)?\s*\(")
+SI_UNIT = re.compile(rb"SI_UNIT\s*\(\s*(?:\.(\w+)\.|\$)\s*,\s*\.(\w+)\.\s*\)")
+CONVERSION_UNIT = re.compile(rb"CONVERSION_BASED_UNIT\s*\(\s*'([^']*)'")
+STRING = re.compile(r"'((?:[^']|'')*)'")
+
+
+class StepPrescanError(ValueError):
+    """The file is not a STEP Part 21 exchange file, or is too large to import."""
+
+    def __init__(self, message, status_code=422):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _header_record(header, name):
+    """Argument text of `NAME(...)` in the HEADER section, or None."""
+    match = re.search(rf"\b{name}\s*\((.*?)\)\s*;", header, re.S)
+    return match.group(1) if match else None
+
+
+def _strings(text):
+    return [s.replace("''", "'") for s in STRING.findall(text or "")]
+
+
+def parse_header(header):
+    """Description, file name, originating system, schema and application protocol from the HEADER text."""
+    description = _strings(_header_record(header, "FILE_DESCRIPTION"))
+    # ✅ FILE_NAME(name, time_stamp, (author), (organization), preprocessor_version, originating_system, authorization)
+    file_name = _header_record(header, "FILE_NAME") or ""
+    name_fields = _strings(file_name)
+    schema_ids = _strings(_header_record(header, "FILE_SCHEMA"))
+    schema = schema_ids[0] if schema_ids else None
+    identifier = schema.split()[0].upper() if schema else ""
+
+    # ✅ Author and organization lists may hold any number of strings, so count back from the end
+    return {
+        "description": description[0] if description else None,
+        "implementation_level": description[1] if len(description) > 1 else None,
+        "name": name_fields[0] if name_fields else None,
+        "time_stamp": name_fields[1] if len(name_fields) > 1 else None,
+        "preprocessor": name_fields[-3] if len(name_fields) >= 5 else None,
+        "originating_system": name_fields[-2] if len(name_fields) >= 5 else None,
+        "schema": schema,
+        "protocol": next((ap for prefix, ap in SCHEMAS.items() if identifier.startswith(prefix)), None),
+    }
+
+
+def _length_units(data, start):
+    """Declared length units of the DATA section, e.g. ["mm"] or ["inch"]."""
+    units = []
+    # ✅ mmap.find runs at memory speed; only the few instances naming LENGTH_UNIT are parsed
+    position = data.find(b"LENGTH_UNIT", start)
+    while position >= 0:
+        # ✅ The instance runs from the previous terminator to the next one
+        begin, end = data.rfind(b";", start, position) + 1, data.find(b";", position)
+        position = data.find(b"LENGTH_UNIT", position + 1)
+        if end < 0:
+            continue
+        instance = data[begin:end]
+        conversion = CONVERSION_UNIT.search(instance)
+        si = SI_UNIT.search(instance)
+        if conversion:
+            unit = conversion.group(1).decode("latin-1").lower()
+        elif si and si.group(2) == b"METRE":
+            prefix = (si.group(1) or b"").decode("ascii")
+            unit = SI_LENGTHS.get(prefix, f"{prefix.lower()}m")
+        else:
+            continue
+        if unit not in units:
+            units.append(unit)
+    return units
+
+
+def prescan_step(path):
+    """
+    Memory-maps a STEP file and reads its HEADER and DATA sections without building any
+    geometry: schema, originating system, entity counts, product/assembly counts and
+    declared length units. Raises StepPrescanError for files that are not STEP Part 21.
+
+    Files over the hard size limit only get their HEADER read (entity fields are None),
+    since they will be rejected anyway.
+    """
+    started = time.perf_counter()
+    size = os.path.getsize(path)
+    if size == 0:
+        raise StepPrescanError("The uploaded file is empty.", 400)
+
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        if data.find(MAGIC, 0, 1024) < 0:
+            raise StepPrescanError("Not a STEP file (missing ISO-10303-21 header).", 415)
+        header_start = data.find(b"HEADER;", 0, HEADER_LIMIT)
+        header_end = data.find(b"ENDSEC;", header_start, HEADER_LIMIT) if header_start >= 0 else -1
+        data_start = data.find(b"DATA;", max(header_end, 0))
+        if header_end < 0 or data_start < 0:
+            raise StepPrescanError("Malformed STEP file (missing HEADER or DATA section).", 422)
+
+        header = parse_header(data[header_start:header_end].decode("latin-1"))
+
+        scan = {**header, "file_bytes": size}
+        if size > STEP_MAX_MB * MEGABYTE:
+            scan.update({"entities": None, "entity_types": None, "products": None, "assembly_links": None,
+                         "solids": None, "has_pmi": None, "length_units": None})
+        else:
+            # ✅ One streaming pass over entity instances (no list of names is built);
+            # complex instances "#1=(A() B())" are counted once
+            counts = Counter(match.group(1) for match in ENTITY.finditer(data, data_start))
+            counts = {(name or b"(complex)").decode("ascii"): count for name, count in counts.items()}
+            scan.update({
+                "entities": sum(counts.values()),
+                "entity_types": dict(sorted(counts.items(), key=lambda item: -item[1])[:25]),
+                "products": counts.get("PRODUCT", 0),
+                "assembly_links": counts.get("NEXT_ASSEMBLY_USAGE_OCCURRENCE", 0),
+                "solids": sum(counts.get(name, 0) for name in SOLID_ENTITIES),
+                "has_pmi": any(counts.get(name, 0) for name in PMI_ENTITIES),
+                "length_units": _length_units(data, data_start),
+            })
+
+    scan["scan_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return scan
+
+
+def admission(scan):
+    """
+    "normal" or "low_priority" for a prescan result; raises StepPrescanError(413) for
+    files over the configured hard limits.
+    """
+    megabytes = scan["file_bytes"] / MEGABYTE
+    entities = scan["entities"] or 0
+    if megabytes > STEP_MAX_MB or entities > STEP_MAX_ENTITIES:
+        raise StepPrescanError(
+            f"STEP file too large to import ({megabytes:.1f} MB, {entities} entities; "
+            f"limits {STEP_MAX_MB:g} MB, {STEP_MAX_ENTITIES} entities).",
+            413,
+        )
+    if megabytes > STEP_LOW_PRIORITY_MB or entities > STEP_LOW_PRIORITY_ENTITIES:
+        return "low_priority"
+    return "normal"
+
+
+def is_assembly(scan):
+    """
+    True when a prescan shows several solids, or one solid placed more than once
+    through NEXT_ASSEMBLY_USAGE_OCCURRENCE links.
+    """
+    solids = scan.get("solids") or 0
+    links = scan.get("assembly_links") or 0
+    return solids > 1 or (solids >= 1 and links > 1)
@@ -0,0 +1,453 @@
+# /modules/stock_catalogue.py
+
+import json
+import math
+import sqlite3
+import threading
+from bisect import bisect_left
+from typing import Dict, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+
+from modules.cost_cache import bump_catalogue_version, get_catalogue_version
+from modules.db_utils import get_advanced_settings, get_db_connection
+from modules.profile_formulas import FormulaError, evaluate_profile_volumes
+from modules.unit_conversion import conversion_factor
+
+router = APIRouter()
+
+ADVANCED_SETTINGS = get_advanced_settings()
+# ✅ Saw kerf + facing allowance added to every cut length (mm)
+STOCK_CUT_ALLOWANCE = float(ADVANCED_SETTINGS.get("stock_cut_allowance", 3.0))
+
+# ✅ Cross-section fields that identify how a profile is matched against a part envelope
+SHEET_FIELDS = ("thickness",)
+ROUND_FIELDS = ("diameter", "outer_diameter")
+RECT_FIELDS = (("height", "width"), ("outer_height", "outer_width"))
+
+class StockSize(BaseModel):
+    profile_id: int
+    material_id: Optional[int] = None
+    dimensions: Dict[str, float]         # E.g., {"diameter": 20} or {"height": 10, "width": 40}
+    stock_length: Optional[float] = None
+    stock_width: Optional[float] = None
+    unit: str = "mm"
+
+
+def detect_shape(fields):
+    """Maps a profile's field names to the matching strategy used by StockIndex."""
+    if any(f in fields for f in ROUND_FIELDS):
+        return "round"
+    if any(a in fields and b in fields for a, b in RECT_FIELDS):
+        return "rect"
+    if all(f in fields for f in SHEET_FIELDS):
+        return "sheet"
+    return None
+
+
+class StockIndex:
+    """
+    Sorted index of the stock sizes for one (material, profile) pair.
+
+    Entries are ordered by their smallest cross-section dimension so the first
+    candidate that can hold a part is found with `bisect`.
+    """
+
+    def __init__(self, profile, entries):
+        self.profile = profile
+        self.shape = detect_shape(profile["fields_json"])
+        self.entries = []
+        for entry in entries:
+            prepared = self._prepare(entry)
+            if prepared:
+                self.entries.append(prepared)
+
+        self.entries.sort(key=lambda e: (e["primary"], e["secondary"], e["area"]))
+        self.keys = [e["primary"] for e in self.entries]
+
+        # ✅ Rectangular sections are grouped by their short side, each group sorted by the long side
+        self.group_keys = []
+        self.groups = {}
+        if self.shape == "rect":
+            for entry in self.entries:
+                self.groups.setdefault(entry["primary"], []).append(entry)
+            self.group_keys = sorted(self.groups)
+            self.group_seconds = {k: [e["secondary"] for e in g] for k, g in self.groups.items()}
+
+    def _prepare(self, entry):
+        dims = entry["dimensions"]
+        fields = self.profile["fields_json"]
+
+        if self.shape == "round":
+            key = "diameter" if "diameter" in fields else "outer_diameter"
+            diameter = dims.get(key)
+            wall = dims.get("wall_thickness")
+            if not diameter or (wall is not None and 2 * wall >= diameter):
+                return None
+            # ✅ Thicker walls first so a tube with more material is preferred for the same diameter
+            return {**entry, "primary": diameter, "secondary": -(wall or 0.0), "area": diameter ** 2}
+
+        if self.shape == "rect":
+            h_key, w_key = next((a, b) for a, b in RECT_FIELDS if a in fields and b in fields)
+            height, width = dims.get(h_key), dims.get(w_key)
+            wall = dims.get("wall_thickness")
+            if not height or not width or (wall is not None and 2 * wall >= min(height, width)):
+                return None
+            short_side, long_side = sorted((height, width))
+            return {**entry, "primary": short_side, "secondary": long_side, "area": short_side * long_side}
+
+        if self.shape == "sheet":
+            thickness = dims.get("thickness")
+            if not thickness:
+                return None
+            sheet_area = (entry.get("stock_length") or math.inf) * (entry.get("stock_width") or math.inf)
+            return {**entry, "primary": thickness, "secondary": sheet_area, "area": sheet_area}
+
+        return None
+
+    def fit(self, envelope, diameter=None):
+        """
+        Returns the smallest stock entry that can hold the part, or None.
+
+        - envelope: Sorted (small, middle, large) part dimensions in mm, allowances included.
+        - diameter: Optional enclosing-cylinder diameter that overrides the envelope for round stock.
+        """
+        a, b, c = envelope
+        cut_length = c + STOCK_CUT_ALLOWANCE
+
+        if self.shape == "round":
+            required = diameter if diameter else math.hypot(a, b)
+            for entry in self.entries[bisect_left(self.keys, required):]:
+                if self._length_fits(entry, cut_length):
+                    return self._result(entry, cut_length)
+            return None
+
+        if self.shape == "sheet":
+            for entry in self.entries[bisect_left(self.keys, a):]:
+                if self._sheet_fits(entry, b, c):
+                    return self._result(entry, c, blank_width=b)
+            return None
+
+        if self.shape == "rect":
+            best = None
+            for short_side in self.group_keys[bisect_left(self.group_keys, a):]:
+                if best and short_side * b >= best["area"]:
+                    break  # ✅ No later group can beat the current cross-section
+                seconds = self.group_seconds[short_side]
+                for entry in self.groups[short_side][bisect_left(seconds, b):]:
+                    if self._length_fits(entry, cut_length):
+                        if not best or entry["area"] < best["area"]:
+                            best = entry
+                        break
+            return self._result(best, cut_length) if best else None
+
+        return None
+
+    @staticmethod
+    def _length_fits(entry, cut_length):
+        return not entry.get("stock_length") or cut_length <= entry["stock_length"]
+
+    @staticmethod
+    def _sheet_fits(entry, blank_width, blank_length):
+        length, width = entry.get("stock_length"), entry.get("stock_width")
+        if not length or not width:
+            return True
+        return (blank_length <= length and blank_width <= width) or (blank_length <= width and blank_width <= length)
+
+    def _result(self, entry, cut_length, blank_width=None):
+        dimensions = {k: v for k, v in entry["dimensions"].items()}
+        dimensions["length"] = cut_length
+        if blank_width is not None:
+            dimensions["width"] = blank_width
+        return {
+            "stock_id": entry["id"],
+            "profile_id": self.profile["id"],
+            "profile": self.profile["name"],
+            "material_id": entry["material_id"],
+            "dimensions": dimensions,
+            "cut_length": cut_length,
+            "stock_length": entry.get("stock_length"),
+            "stock_width": entry.get("stock_width"),
+            "unit": "mm",
+        }
+
+
+# ✅ Indexes are rebuilt lazily whenever the catalogue version changes
+_index_lock = threading.Lock()
+_index_state = {"version": None, "profiles": {}, "indexes": {}}
+
+def _load_catalogue():
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("SELECT * FROM material_profiles")
+    profiles = {}
+    for row in cursor.fetchall():
+        profile = dict(row)
+        try:
+            profile["fields_json"] = json.loads(profile["fields_json"])
+        except (TypeError, json.JSONDecodeError):
+            profile["fields_json"] = {}
+        profiles[profile["id"]] = profile
+
+    cursor.execute("SELECT * FROM stock_sizes")
+    rows = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+
+    grouped = {}
+    for row in rows:
+        try:
+            dims = json.loads(row["dimensions_json"])
+        except (TypeError, json.JSONDecodeError):
+            continue
+        factor = conversion_factor(row["unit"], "mm")
+        row["dimensions"] = {k: float(v) * factor for k, v in dims.items()}
+        for key in ("stock_length", "stock_width"):
+            if row[key] is not None:
+                row[key] = float(row[key]) * factor
+        grouped.setdefault(row["profile_id"], []).append(row)
+    return profiles, grouped
+
+
+def _refresh_indexes():
+    version = get_catalogue_version()
+    with _index_lock:
+        if _index_state["version"] == version:
+            return _index_state
+        profiles, grouped = _load_catalogue()
+        _index_state["profiles"] = profiles
+        _index_state["grouped"] = grouped
+        _index_state["indexes"] = {}
+        _index_state["version"] = version
+        return _index_state
+
+
+def get_stock_index(profile_id, material_id=None):
+    """Returns the index for a profile, merging material-specific and generic stock sizes."""
+    state = _refresh_indexes()
+    key = (profile_id, material_id)
+    with _index_lock:
+        index = state["indexes"].get(key)
+        if index is None:
+            profile = state["profiles"].get(profile_id)
+            if not profile:
+                return None
+            entries = [
+                row for row in state["grouped"].get(profile_id, [])
+                if row["material_id"] is None or row["material_id"] == material_id
+            ]
+            index = StockIndex(profile, entries)
+            state["indexes"][key] = index
+        return index
+
+
+def get_profile_by_name(name):
+    state = _refresh_indexes()
+    return next((p for p in state["profiles"].values() if p["name"] == name), None)
+
+
+def candidate_profiles(pricing_type=None, profile_id=None):
+    """Profiles tried for a part: the requested one, or sheets for sheet parts and bar stock otherwise."""
+    if profile_id:
+        return [profile_id]
+    names = ["Sheet"] if pricing_type == "sheet_price" else ["Block", "Round Bar"]
+    return [p["id"] for p in (get_profile_by_name(n) for n in names) if p]
+
+
+def part_envelope(bounding_box, extra=(0.0, 0.0, 0.0)):
+    """Converts a stored bounding box to mm, adds per-axis allowances and sorts the dimensions."""
+    unit = bounding_box.get("unit") or "mm"
+    factor = conversion_factor(unit, "mm")
+    dims = [
+        float(bounding_box.get("width", 0.0)) * factor + extra[0],
+        float(bounding_box.get("depth", 0.0)) * factor + extra[1],
+        float(bounding_box.get("height", 0.0)) * factor + extra[2],
+    ]
+    return tuple(sorted(dims))
+
+
+def geometry_envelope(geometry, extra=(0.0, 0.0, 0.0)):
+    """
+    Envelope and round-stock diameter for a part's geometry details.
+
+    Prefers the oriented bounding box and enclosing cylinder when the analysis
+    produced them, so parts modeled off-axis are not oversized.
+    """
+    obb = geometry.get("oriented_bounding_box")
+    if obb:
+        # ✅ Box extents matched to X/Y/Z so each allowance lands on its own axis; analyses
+        # stored before "extents_xyz" existed only have the sorted dimensions
+        x, y, z = obb.get("extents_xyz") or (obb["length"], obb["width"], obb["height"])
+        envelope = part_envelope({"width": x, "depth": y, "height": z, "unit": obb.get("unit")}, extra)
+    else:
+        envelope = part_envelope(geometry.get("bounding_box", {}), extra)
+
+    diameter = None
+    cylinder = geometry.get("enclosing_cylinder")
+    if cylinder and cylinder.get("diameter"):
+        unit = cylinder.get("unit") or "mm"
+        factor = conversion_factor(unit, "mm")
+        diameter = float(cylinder["diameter"]) * factor + max(extra[0], extra[1], extra[2])
+    return envelope, diameter
+
+
+def fit_stock_batch(requests):
+    """
+    Finds the smallest fitting stock for many parts.
+
+    - requests: List of dicts with `envelope`, optional `diameter`, `material_id`,
+      `pricing_type` and `profile_id`.
+
+    Returns:
+        One stock result (or None) per request. Stock volumes are evaluated with one
+        vectorized formula call per profile.
+    """
+    results = []
+    for request in requests:
+        candidates = []
+        for profile_id in candidate_profiles(request.get("pricing_type"), request.get("profile_id")):
+            index = get_stock_index(profile_id, request.get("material_id"))
+            if index:
+                fit = index.fit(request["envelope"], request.get("diameter"))
+                if fit:
+                    candidates.append(fit)
+        results.append(candidates)
+
+    # ✅ Evaluate all candidate volumes per profile in one call
+    by_profile = {}
+    for candidates in results:
+        for fit in candidates:
+            by_profile.setdefault(fit["profile_id"], []).append(fit)
+
+    state = _refresh_indexes()
+    for profile_id, fits in by_profile.items():
+        profile = state["profiles"].get(profile_id)
+        try:
+            volumes = evaluate_profile_volumes(profile, [f["dimensions"] for f in fits])
+        except FormulaError:
+            volumes = [None] * len(fits)
+        for fit, volume in zip(fits, volumes):
+            fit["volume"] = float(volume) if volume is not None else None
+            fit["volume_unit"] = profile["default_unit"]
+
+    # ✅ Pick the candidate with the least material for each part
+    return [
+        min(candidates, key=lambda f: f["volume"] if f["volume"] is not None else math.inf) if candidates else None
+        for candidates in results
+    ]
+
+
+def fit_stock(bounding_box, extra=(0.0, 0.0, 0.0), material_id=None, pricing_type=None, profile_id=None, diameter=None):
+    """Finds the smallest fitting stock for a single part envelope."""
+    return fit_stock_batch([{
+        "envelope": part_envelope(bounding_box, extra),
+        "diameter": diameter,
+        "material_id": material_id,
+        "pricing_type": pricing_type,
+        "profile_id": profile_id,
+    }])[0]
+
+
+def fit_project_stock(project_id, extra=(0.0, 0.0, 0.0)):
+    """Fits stock for every part of a project in one pass."""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT p.part_id, p.name, p.geometry_details, p.raw_material_details, c.pricing_type
+        FROM parts p
+        LEFT JOIN part_classification c ON p.classification_id = c.id
+        WHERE p.project_id = ?
+    """, (project_id,))
+    rows = cursor.fetchall()
+    conn.close()
+
+    parts, requests = [], []
+    for row in rows:
+        try:
+            geometry = json.loads(row["geometry_details"] or "{}")
+            raw_details = json.loads(row["raw_material_details"] or "{}")
+        except json.JSONDecodeError:
+            geometry, raw_details = {}, {}
+        if not geometry.get("bounding_box"):
+            continue
+        envelope, diameter = geometry_envelope(geometry, extra)
+        parts.append({"part_id": row["part_id"], "name": row["name"]})
+        requests.append({
+            "envelope": envelope,
+            "diameter": diameter,
+            "material_id": raw_details.get("material_id"),
+            "pricing_type": row["pricing_type"],
+        })
+
+    fits = fit_stock_batch(requests)
+    return [{**part, "stock": fit} for part, fit in zip(parts, fits)]
+
+
+# ✅ API: Fetch Stock Sizes
+@router.get("/")
+def get_stock_sizes(profile_id: Optional[int] = None, material_id: Optional[int] = None):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    query = "SELECT * FROM stock_sizes WHERE 1 = 1"
+    params = []
+    if profile_id is not None:
+        query += " AND profile_id = ?"
+        params.append(profile_id)
+    if material_id is not None:
+        query += " AND (material_id = ? OR material_id IS NULL)"
+        params.append(material_id)
+    cursor.execute(query, params)
+    stock_sizes = []
+    for row in cursor.fetchall():
+        stock = dict(row)
+        try:
+            stock["dimensions"] = json.loads(stock.pop("dimensions_json"))
+        except (TypeError, json.JSONDecodeError):
+            stock["dimensions"] = {}
+        stock_sizes.append(stock)
+    conn.close()
+    return stock_sizes
+
+# ✅ API: Add a Stock Size
+@router.post("/")
+def add_stock_size(stock: StockSize):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    try:
+        cursor.execute("SELECT id FROM material_profiles WHERE id = ?", (stock.profile_id,))
+        if not cursor.fetchone():
+            raise HTTPException(status_code=404, detail="Profile not found.")
+
+        cursor.execute("""
+            INSERT INTO stock_sizes (material_id, profile_id, dimensions_json, stock_length, stock_width, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (
+            stock.material_id,
+            stock.profile_id,
+            json.dumps(stock.dimensions),
+            stock.stock_length,
+            stock.stock_width,
+            stock.unit,
+        ))
+        conn.commit()
+        bump_catalogue_version()  # ✅ Rebuild stock indexes and invalidate memoized costs
+        return {"message": "Stock size added successfully.", "id": cursor.lastrowid}
+
+    except sqlite3.OperationalError as e:
+        conn.rollback()
+        raise HTTPException(status_code=500, detail=f"Database error: {str(e)}")
+
+    finally:
+        conn.close()
+
+# ✅ API: Delete a Stock Size
+@router.delete("/{stock_id}")
+def delete_stock_size(stock_id: int):
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("DELETE FROM stock_sizes WHERE id = ?", (stock_id,))
+    conn.commit()
+    conn.close()
+    bump_catalogue_version()  # ✅ Rebuild stock indexes and invalidate memoized costs
+    return {"message": f"Stock size ID '{stock_id}' deleted successfully."}
@@ -0,0 +1,143 @@
+# /modules/svg_optimize.py
+
+import gzip
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from modules.db_utils import get_advanced_settings
+from modules.file_utils import write_atomic
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ADVANCED_SETTINGS = get_advanced_settings()
+SVG_PRECISION = int(ADVANCED_SETTINGS.get("svg_precision", 2))
+
+SVG_NS = "http://www.w3.org/2000/svg"
+ET.register_namespace("", SVG_NS)
+
+# ✅ Precompressed siblings, best first; brotli is optional
+ENCODINGS = {"br": ".br", "gzip": ".gz"}
+
+NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+PATH_TOKEN = re.compile(NUMBER.pattern + r"|[A-Za-z]")
+# ✅ Presentation attributes children inherit, so repeating the parent's value is redundant
+INHERITED = ("fill", "stroke", "stroke-width", "stroke-dasharray", "stroke-linecap", "stroke-linejoin")
+
+
+def format_number(value, precision=SVG_PRECISION):
+    text = f"{float(value):.{precision}f}"
+    if "." in text:
+        text = text.rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def round_numbers(text, precision=SVG_PRECISION):
+    return NUMBER.sub(lambda m: format_number(m.group(), precision), text)
+
+
+def merge_polylines(path_data, precision=SVG_PRECISION):
+    """
+    Joins the d attributes of several M/L-only paths into one, rounding every coordinate
+    and dropping a move-to that starts where the previous segment ended (cadquery writes
+    one path per edge, so chained edges collapse into polylines).
+
+    Returns None when a path uses any other command, so the caller keeps it as is.
+    """
+    out, current = [], None
+    for d in path_data:
+        tokens = PATH_TOKEN.findall(d)
+        command, numbers = None, []
+        segments = []
+        for token in tokens + ["M"]:  # ✅ Sentinel flushes the last command
+            if token.isalpha():
+                if token not in ("M", "L"):
+                    return None
+                if command and len(numbers) % 2:
+                    return None
+                if command:
+                    segments.append((command, numbers))
+                command, numbers = token, []
+            else:
+                numbers.append(format_number(token, precision))
+        for command, numbers in segments:
+            for i in range(0, len(numbers), 2):
+                point = (numbers[i], numbers[i + 1])
+                if point == current:
+                    continue
+                letter = "M" if command == "M" and i == 0 else "L"
+                out.append(f"{letter}{point[0]},{point[1]}")
+                current = point
+    return "".join(out)
+
+
+def _strip(element, inherited):
+    """Drops whitespace and inherited attributes, and merges same-styled sibling paths."""
+    element.text = element.text.strip() or None if element.text else None
+    element.tail = None
+    for name in INHERITED:
+        if name in element.attrib and inherited.get(name) == element.attrib[name]:
+            del element.attrib[name]
+    scope = {**inherited, **{name: element.attrib[name] for name in INHERITED if name in element.attrib}}
+
+    groups = {}
+    for child in list(element):
+        if child.tag == f"{{{SVG_NS}}}path" and "d" in child.attrib:
+            _strip(child, scope)
+            style = tuple(sorted((k, v) for k, v in child.attrib.items() if k != "d"))
+            groups.setdefault(style, []).append(child)
+        else:
+            _strip(child, scope)
+
+    for paths in groups.values():
+        merged = merge_polylines([p.attrib["d"] for p in paths])
+        if merged is None:
+            for p in paths:
+                p.attrib["d"] = round_numbers(p.attrib["d"])
+            continue
+        paths[0].attrib["d"] = merged
+        for p in paths[1:]:
+            element.remove(p)
+
+
+def minify_svg(svg_bytes):
+    """Minified SVG bytes: rounded coordinates, merged paths, no comments or redundant attributes."""
+    root = ET.fromstring(svg_bytes)  # ✅ Comments are dropped by the parser
+    _strip(root, {})
+    return ET.tostring(root, encoding="utf-8", xml_declaration=False)
+
+
+def optimize_svg_file(svg_path):
+    """
+    Minifies an SVG in place and writes precompressed .svg.gz (and .svg.br when brotli
+    is installed) siblings. Returns byte counts, or None on failure (the raw SVG is kept).
+    """
+    try:
+        with open(svg_path, "rb") as f:
+            raw = f.read()
+        data = minify_svg(raw)
+        write_atomic(svg_path, data)
+
+        stats = {"raw_bytes": len(raw), "bytes": len(data)}
+        compressed = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compressed["br"] = brotli.compress(data, quality=11)
+        for encoding, suffix in ENCODINGS.items():
+            if encoding in compressed:
+                write_atomic(svg_path + suffix, compressed[encoding])
+                stats[f"{encoding}_bytes"] = len(compressed[encoding])
+            elif os.path.exists(svg_path + suffix):
+                os.remove(svg_path + suffix)  # ✅ Never serve a variant of an older drawing
+        return stats
+    except Exception as e:
+        print(f"❌ Error optimizing SVG: {e}")
+        return None
+
+
+def remove_svg_variants(svg_path):
+    for suffix in ENCODINGS.values():
+        if os.path.exists(svg_path + suffix):
+            os.remove(svg_path + suffix)
@@ -0,0 +1,169 @@
+# /modules/thumbnail_sprites.py
+
+import glob
+import io
+import json
+import os
+import threading
+
+from PIL import Image, features
+
+from modules.cost_cache import geometry_fingerprint
+from modules.db_utils import get_advanced_settings
+from modules.file_utils import write_atomic
+
+ADVANCED_SETTINGS = get_advanced_settings()
+THUMBNAIL_BASE = ADVANCED_SETTINGS.get("THUMBNAIL_FOLDER", "thumbnails")
+SPRITE_BASE = ADVANCED_SETTINGS.get("SPRITE_FOLDER", "sprites")
+SPRITE_CELL = int(ADVANCED_SETTINGS.get("sprite_cell_size", 128))
+SPRITE_COLUMNS = int(ADVANCED_SETTINGS.get("sprite_columns", 16))
+SPRITE_FORMAT = "webp" if features.check("webp") else "png"
+THUMBNAIL_SIZES = sorted(
+    int(size) for size in str(ADVANCED_SETTINGS.get("thumbnail_sizes", "128,256,500")).split(",") if size.strip()
+)
+# ✅ Encoders Pillow was not built with are skipped; the PNG fallback is always written
+THUMBNAIL_FORMATS = [
+    fmt.strip().lower() for fmt in str(ADVANCED_SETTINGS.get("thumbnail_formats", "webp")).split(",")
+    if fmt.strip() and features.check(fmt.strip().lower())
+]
+
+os.makedirs(SPRITE_BASE, exist_ok=True)
+
+# ✅ One lock per project so concurrent thumbnail updates never interleave on the same atlas
+_project_locks = {}
+_locks_guard = threading.Lock()
+
+def _project_lock(project_id):
+    with _locks_guard:
+        return _project_locks.setdefault(project_id, threading.Lock())
+
+
+def thumbnail_variant_name(thumbnail_filename, size, fmt):
+    return f"{os.path.splitext(thumbnail_filename)[0]}-{size}.{fmt}"
+
+
+def remove_thumbnail_variants(thumbnail_path):
+    """Deletes the resized WebP/AVIF variants written beside a PNG thumbnail."""
+    folder, filename = os.path.split(thumbnail_path)
+    for size in THUMBNAIL_SIZES:
+        for fmt in THUMBNAIL_FORMATS:
+            path = os.path.join(folder, thumbnail_variant_name(filename, size, fmt))
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def sprite_paths(project_id):
+    """(atlas image path, JSON index path) for a project."""
+    return (
+        os.path.join(SPRITE_BASE, f"{project_id}.{SPRITE_FORMAT}"),
+        os.path.join(SPRITE_BASE, f"{project_id}.json"),
+    )
+
+
+def load_sprite_index(project_id):
+    _, index_path = sprite_paths(project_id)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        if index.get("cell") == SPRITE_CELL and index.get("columns") == SPRITE_COLUMNS:
+            return index
+    except (OSError, json.JSONDecodeError):
+        pass
+    # ✅ Missing, unreadable or laid out with other settings: start over
+    return {"cell": SPRITE_CELL, "columns": SPRITE_COLUMNS, "rows": 0, "entries": {}}
+
+
+def _project_thumbnails(project_id):
+    """Fallback PNG thumbnails of a project by file name (sized variants are not PNG)."""
+    folder = os.path.join(THUMBNAIL_BASE, project_id)
+    return {os.path.basename(path): path for path in glob.glob(os.path.join(glob.escape(folder), "*.png"))}
+
+
+def _fit_cell(path):
+    """Loads a thumbnail scaled into one cell; returns the image and its offset inside the cell."""
+    with Image.open(path) as img:
+        img = img.convert("RGBA")
+        img.thumbnail((SPRITE_CELL, SPRITE_CELL))
+    return img, (SPRITE_CELL - img.width) // 2, (SPRITE_CELL - img.height) // 2
+
+
+def update_project_sprite(project_id):
+    """
+    Brings a project's atlas in line with its thumbnails on disk.
+
+    Only thumbnails whose content hash changed are redrawn; removed parts free their
+    slot for reuse and the atlas only grows when every slot is taken. Returns the index.
+    """
+    with _project_lock(project_id):
+        atlas_path, index_path = sprite_paths(project_id)
+        index = load_sprite_index(project_id)
+        entries = index["entries"]
+        thumbnails = _project_thumbnails(project_id)
+
+        removed = [name for name in entries if name not in thumbnails]
+        changed = {
+            name: fingerprint
+            for name, fingerprint in ((n, geometry_fingerprint(p)) for n, p in thumbnails.items())
+            if fingerprint and entries.get(name, {}).get("hash") != fingerprint
+        }
+        if not removed and not changed and os.path.exists(atlas_path):
+            return index
+
+        freed = [entries.pop(name)["slot"] for name in removed]
+        used = {entry["slot"] for entry in entries.values()}
+        free_slots = sorted(set(range(index["rows"] * SPRITE_COLUMNS)) - used)
+        next_slot = index["rows"] * SPRITE_COLUMNS
+
+        for name in sorted(changed):
+            if name not in entries:
+                if free_slots:
+                    slot = free_slots.pop(0)
+                else:
+                    slot, next_slot = next_slot, next_slot + 1
+                entries[name] = {"slot": slot}
+
+        rows = max(1, -(-max([e["slot"] + 1 for e in entries.values()] or [0]) // SPRITE_COLUMNS))
+        size = (SPRITE_COLUMNS * SPRITE_CELL, rows * SPRITE_CELL)
+
+        atlas = Image.new("RGBA", size, (0, 0, 0, 0))
+        redraw = set(changed)
+        if os.path.exists(atlas_path) and index["rows"]:
+            with Image.open(atlas_path) as previous:
+                atlas.paste(previous.convert("RGBA").crop((0, 0, size[0], min(size[1], previous.height))), (0, 0))
+        else:
+            redraw = set(entries)  # ✅ No atlas to patch: draw every entry
+
+        blank = Image.new("RGBA", (SPRITE_CELL, SPRITE_CELL), (0, 0, 0, 0))
+        for slot in freed:
+            atlas.paste(blank, ((slot % SPRITE_COLUMNS) * SPRITE_CELL, (slot // SPRITE_COLUMNS) * SPRITE_CELL))
+        for name in redraw:
+            entry = entries[name]
+            try:
+                img, dx, dy = _fit_cell(thumbnails[name])
+            except (OSError, KeyError) as e:
+                print(f"⚠️ Skipping thumbnail {name} in sprite: {e}")
+                entries.pop(name)
+                continue
+            cell_x = (entry["slot"] % SPRITE_COLUMNS) * SPRITE_CELL
+            cell_y = (entry["slot"] // SPRITE_COLUMNS) * SPRITE_CELL
+            atlas.paste(blank, (cell_x, cell_y))
+            atlas.paste(img, (cell_x + dx, cell_y + dy))
+            entry.update({
+                "x": cell_x + dx, "y": cell_y + dy, "w": img.width, "h": img.height,
+                "hash": changed.get(name) or geometry_fingerprint(thumbnails[name]),
+            })
+
+        # ✅ Lossless, so cells that are carried over do not degrade with every re-encode
+        buffer = io.BytesIO()
+        atlas.save(buffer, format=SPRITE_FORMAT.upper(), lossless=True)
+        write_atomic(atlas_path, buffer.getvalue())
+
+        index.update({"rows": rows, "width": size[0], "height": size[1], "format": SPRITE_FORMAT})
+        write_atomic(index_path, json.dumps(index).encode("utf-8"))
+        return index
+
+
+def remove_project_sprite(project_id):
+    for path in sprite_paths(project_id):
+        if os.path.exists(path):
+            os.remove(path)
@@ -0,0 +1,225 @@
+# /modules/topology_features.py
+
+import math
+
+import cadquery as cq
+import numpy as np
+from OCP.BRepAdaptor import BRepAdaptor_Surface
+from OCP.TopAbs import TopAbs_EDGE, TopAbs_FACE
+from OCP.TopExp import TopExp_Explorer
+from OCP.TopoDS import TopoDS
+from OCP.TopTools import TopTools_IndexedMapOfShape
+
+# ✅ cadquery geomType() names grouped into the face types we report
+FACE_TYPES = {
+    "PLANE": "planar",
+    "CYLINDER": "cylindrical",
+    "CONE": "conical",
+    "SPHERE": "spherical",
+    "TORUS": "toroidal",
+    "BSPLINE": "bspline",
+    "BEZIER": "bspline",
+}
+PLANAR_AREAS_KEPT = 20      # ✅ Largest planar faces listed individually
+PARALLEL_TOLERANCE = 1e-3   # ✅ 1 - |cos| below which faces/axes count as parallel
+ROUND_MM = 3
+
+
+def _vector(obj):
+    """numpy xyz of a cadquery Vector or an OCC gp_Pnt/gp_Dir/gp_Vec."""
+    if isinstance(obj, cq.Vector):
+        return np.array(obj.toTuple(), dtype=float)
+    return np.array([obj.X(), obj.Y(), obj.Z()], dtype=float)
+
+
+def _canonical_axis(direction, location):
+    """Direction with a fixed sign and the axis line's point closest to the origin, for grouping."""
+    direction = direction / np.linalg.norm(direction)
+    if direction[np.argmax(np.abs(direction))] < 0:
+        direction = -direction
+    foot = location - np.dot(location, direction) * direction
+    return direction, foot
+
+
+def _cylinder_record(face, adaptor):
+    """Axis, radius, angular span, axial length and inward/outward sense of a cylindrical face."""
+    cylinder = adaptor.Cylinder()
+    axis = cylinder.Axis()
+    direction, foot = _canonical_axis(_vector(axis.Direction()), _vector(axis.Location()))
+
+    u0, u1 = adaptor.FirstUParameter(), adaptor.LastUParameter()
+    v0, v1 = adaptor.FirstVParameter(), adaptor.LastVParameter()
+    point = _vector(adaptor.Value((u0 + u1) / 2, (v0 + v1) / 2))
+    radial = point - foot - np.dot(point - foot, direction) * direction
+    normal = _vector(face.normalAt(cq.Vector(*point)))  # ✅ Accounts for face orientation
+
+    return {
+        "radius": cylinder.Radius(),
+        "direction": direction,
+        "foot": foot,
+        "angle": abs(u1 - u0),
+        "length": abs(v1 - v0),
+        # ✅ Material outside the surface: the outward normal points back at the axis
+        "inward": float(np.dot(normal, radial)) < 0,
+    }
+
+
+def collect_topology(part):
+    """
+    One pass over the faces of every object in a Workplane (and the edges of each face).
+
+    Returns raw records in mm: face counts by type, planar faces (area, outward normal,
+    centre, bounding box), cylindrical faces, and the unique edge count and total length.
+    """
+    shape = cq.Compound.makeCompound(part.vals())
+    faces_seen = TopTools_IndexedMapOfShape()
+    edges_seen = TopTools_IndexedMapOfShape()
+    face_types = {}
+    planar, cylinders = [], []
+    edge_length = 0.0
+
+    face_explorer = TopExp_Explorer(shape.wrapped, TopAbs_FACE)
+    while face_explorer.More():
+        current = face_explorer.Current()
+        face_explorer.Next()
+        if faces_seen.Contains(current):
+            continue
+        faces_seen.Add(current)
+
+        face = cq.Shape.cast(current)
+        kind = FACE_TYPES.get(face.geomType(), "other")
+        face_types[kind] = face_types.get(kind, 0) + 1
+
+        if kind == "planar":
+            bbox = face.BoundingBox()
+            planar.append({
+                "area": face.Area(),
+                "normal": _vector(face.normalAt()),
+                "center": _vector(face.Center()),
+                "bbox": np.array([bbox.xmin, bbox.ymin, bbox.zmin, bbox.xmax, bbox.ymax, bbox.zmax]),
+            })
+        elif kind == "cylindrical":
+            cylinders.append(_cylinder_record(face, BRepAdaptor_Surface(TopoDS.Face_s(current))))
+
+        edge_explorer = TopExp_Explorer(current, TopAbs_EDGE)
+        while edge_explorer.More():
+            edge = edge_explorer.Current()
+            edge_explorer.Next()
+            if not edges_seen.Contains(edge):
+                edges_seen.Add(edge)
+                edge_length += cq.Shape.cast(edge).Length()
+
+    return {
+        "faces": faces_seen.Extent(),
+        "edges": edges_seen.Extent(),
+        "face_types": face_types,
+        "planar": planar,
+        "cylinders": cylinders,
+        "edge_length": edge_length,
+    }
+
+
+def hole_candidates(cylinders):
+    """
+    Groups inward-facing cylindrical faces by axis line and diameter; a group that closes
+    (at least a full turn, e.g. two half-cylinders of one drilled hole) is a hole candidate.
+    """
+    groups = {}
+    for c in cylinders:
+        if not c["inward"]:
+            continue
+        key = (
+            round(2 * c["radius"], ROUND_MM),
+            tuple(np.round(c["direction"], 4)),
+            tuple(np.round(c["foot"], ROUND_MM)),
+        )
+        group = groups.setdefault(key, {"angle": 0.0, "depth": 0.0})
+        group["angle"] += c["angle"]
+        group["depth"] = max(group["depth"], c["length"])
+
+    holes = {}
+    for (diameter, direction, _), group in groups.items():
+        if group["angle"] < 2 * math.pi * 0.99:
+            continue
+        hole_key = (diameter, round(group["depth"], ROUND_MM), direction)
+        holes[hole_key] = holes.get(hole_key, 0) + 1
+
+    return [
+        {"diameter": diameter, "depth": depth, "axis": list(direction), "count": count}
+        for (diameter, depth, direction), count in sorted(holes.items())
+    ]
+
+
+def _plane_basis(normal):
+    helper = np.array([1.0, 0.0, 0.0]) if abs(normal[0]) < 0.9 else np.array([0.0, 1.0, 0.0])
+    u = np.cross(normal, helper)
+    u /= np.linalg.norm(u)
+    return u, np.cross(normal, u)
+
+
+def _corners(bboxes):
+    """(n, 8, 3) corners of (n, 6) axis-aligned boxes."""
+    lo, hi = bboxes[:, :3], bboxes[:, 3:]
+    picks = np.array([[i >> 2 & 1, i >> 1 & 1, i & 1] for i in range(8)], dtype=bool)
+    return np.where(picks[None, :, :], hi[:, None, :], lo[:, None, :])
+
+
+def thinnest_wall(planar, cylinders):
+    """
+    Smallest wall thickness estimate: the gap between opposed parallel planar faces whose
+    outlines overlap with material between them, or between a hole and a coaxial outer
+    cylinder. Returns None when no such pair exists.
+    """
+    candidates = []
+
+    if len(planar) > 1:
+        normals = np.array([p["normal"] for p in planar])
+        normals /= np.linalg.norm(normals, axis=1, keepdims=True)
+        centers = np.array([p["center"] for p in planar])
+        corners = _corners(np.array([p["bbox"] for p in planar]))
+
+        opposed = normals @ normals.T < -(1 - PARALLEL_TOLERANCE)
+        for i in np.flatnonzero(opposed.any(axis=1)):
+            js = np.flatnonzero(opposed[i])
+            # ✅ Material between: face j lies behind face i along i's outward normal
+            gaps = (centers[i] - centers[js]) @ normals[i]
+            js, gaps = js[gaps > 1e-6], gaps[gaps > 1e-6]
+            if not len(js):
+                continue
+            u, v = _plane_basis(normals[i])
+            own = corners[i] @ np.column_stack([u, v])            # (8, 2)
+            other = corners[js] @ np.column_stack([u, v])         # (k, 8, 2)
+            overlap = (
+                (other.min(axis=1) < own.max(axis=0) - 1e-6) & (other.max(axis=1) > own.min(axis=0) + 1e-6)
+            ).all(axis=1)
+            if overlap.any():
+                candidates.append(float(gaps[overlap].min()))
+
+    holes = [c for c in cylinders if c["inward"]]
+    bosses = [c for c in cylinders if not c["inward"]]
+    for hole in holes:
+        for boss in bosses:
+            coaxial = (
+                abs(abs(np.dot(hole["direction"], boss["direction"])) - 1) < PARALLEL_TOLERANCE
+                and np.linalg.norm(hole["foot"] - boss["foot"]) < 1e-3
+            )
+            if coaxial and boss["radius"] > hole["radius"]:
+                candidates.append(boss["radius"] - hole["radius"])
+
+    return min(candidates) if candidates else None
+
+
+def topology_stats(part):
+    """Face types, hole candidates, planar areas, thinnest wall and edge length (mm/mm²) in one traversal."""
+    topology = collect_topology(part)
+    planar_areas = sorted((p["area"] for p in topology["planar"]), reverse=True)
+    return {
+        "faces": topology["faces"],
+        "edges": topology["edges"],
+        "face_types": topology["face_types"],
+        "planar_area_total": float(sum(planar_areas)),
+        "planar_areas": [float(a) for a in planar_areas[:PLANAR_AREAS_KEPT]],
+        "holes": hole_candidates(topology["cylinders"]),
+        "thinnest_wall": thinnest_wall(topology["planar"], topology["cylinders"]),
+        "edge_length": float(topology["edge_length"]),
+    }
@@ -1,6 +1,7 @@
 # /modules/unit_conversion.py
 
 import pint
+from functools import lru_cache
 
 # Initialize unit registry
 ureg = pint.UnitRegistry()
@@ -22,3 +23,25 @@ def convert_units(value, from_unit, to_unit):
     except pint.errors.DimensionalityError:
         print(f"❌ Conversion error: Cannot convert {from_unit} to {to_unit}.")
         return value  # Return the original value if conversion is not possible
+
+class UnitConversionError(ValueError):
+    """Raised when a unit is unknown or cannot be converted to the requested unit."""
+
+
+@lru_cache(maxsize=256)
+def conversion_factor(from_unit, to_unit):
+    """
+    Returns the multiplier converting values in `from_unit` to `to_unit`.
+
+    Cached so whole arrays can be rescaled with a single pint lookup per unit pair.
+    Unlike `convert_units`, a failed conversion raises `UnitConversionError` instead of
+    silently scaling by 1.0.
+    """
+    if not from_unit or not to_unit or from_unit == to_unit:
+        return 1.0
+    try:
+        return float(ureg(from_unit).to(to_unit).magnitude)
+    except pint.errors.UndefinedUnitError as e:
+        raise UnitConversionError(f"Unknown unit: {e}") from None
+    except pint.errors.DimensionalityError:
+        raise UnitConversionError(f"Cannot convert {from_unit} to {to_unit}.") from None
@@ -1,5 +1,6 @@
 import sqlite3
 from fastapi import APIRouter, HTTPException
+from modules.cost_cache import invalidate_geometry_cache
 from typing import Dict, List, Optional
 from pydantic import BaseModel
 from collections import defaultdict
@@ -240,6 +241,7 @@ def bulk_update_units(category: str, updates: Dict[str, str]):
         )
 
     conn.commit()
+    invalidate_geometry_cache()  # ✅ Cached analyses were reported in the previous units
     conn.close()
 
     return {"message": f"Units in '{category}' updated successfully."}
\ No newline at end of file
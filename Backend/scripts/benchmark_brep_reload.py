@@ -0,0 +1,90 @@
+# /scripts/benchmark_brep_reload.py
+"""
+Compares STEP import against BREP sidecar reloads on a corpus of STEP files.
+
+Run from the Backend folder (it reads settings from database.db):
+
+    python scripts/benchmark_brep_reload.py [folder-or-files ...] [--repeat N]
+
+Defaults to every .step/.stp file under the uploads folder.
+"""
+
+import argparse
+import glob
+import gzip
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cadquery as cq  # noqa: E402
+
+from modules.geometric_analysis import shape_from_brep, shape_to_brep  # noqa: E402
+
+
+def collect_files(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            for pattern in ("*.step", "*.stp", "*.STEP", "*.STP"):
+                files.extend(glob.glob(os.path.join(path, "**", pattern), recursive=True))
+        elif os.path.isfile(path):
+            files.append(path)
+    return sorted(set(files))
+
+
+def best_of(repeat, load):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="*", default=["uploads"])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    files = collect_files(args.paths)
+    if not files:
+        print("❌ No STEP files found.")
+        return 1
+
+    print(f"{'file':40} {'STEP KB':>8} {'BREP KB':>8} {'gz KB':>7} {'STEP s':>8} {'BREP s':>8} {'gz s':>8} {'speedup':>8}")
+    totals = {"step": 0.0, "brep": 0.0, "gz": 0.0}
+    for path in files:
+        try:
+            part = cq.importers.importStep(path)
+        except Exception as e:
+            print(f"⚠️ {os.path.basename(path)}: {e}")
+            continue
+        brep = shape_to_brep(part)
+        packed = gzip.compress(brep, compresslevel=1)
+
+        step_time, _ = best_of(args.repeat, lambda: cq.importers.importStep(path))
+        brep_time, _ = best_of(args.repeat, lambda: shape_from_brep(brep))
+        gz_time, _ = best_of(args.repeat, lambda: shape_from_brep(gzip.decompress(packed)))
+        totals["step"] += step_time
+        totals["brep"] += brep_time
+        totals["gz"] += gz_time
+
+        print(
+            f"{os.path.basename(path)[:40]:40} {os.path.getsize(path) / 1024:8.0f} {len(brep) / 1024:8.0f} "
+            f"{len(packed) / 1024:7.0f} {step_time:8.3f} {brep_time:8.3f} {gz_time:8.3f} "
+            f"{step_time / max(gz_time, 1e-9):7.1f}x"
+        )
+
+    print(
+        f"\n✅ Total over {len(files)} files: STEP {totals['step']:.3f}s, BREP {totals['brep']:.3f}s, "
+        f"BREP.gz {totals['gz']:.3f}s ({totals['step'] / max(totals['gz'], 1e-9):.1f}x faster)"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
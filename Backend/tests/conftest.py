@@ -0,0 +1,90 @@
+# /tests/conftest.py
+
+import importlib.util
+import os
+import runpy
+import shutil
+import sqlite3
+import sys
+import tempfile
+
+import pytest
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# ✅ Modules open "database.db" relative to the working directory and read their settings at
+# import time, so the session runs in a scratch folder with a freshly seeded database
+WORKDIR = tempfile.mkdtemp(prefix="cost-estimator-tests-")
+shutil.copytree(os.path.join(BACKEND, "defaults"), os.path.join(WORKDIR, "defaults"))
+os.chdir(WORKDIR)
+runpy.run_path(os.path.join(BACKEND, "create_db.py"))
+sys.path.insert(0, BACKEND)
+
+requires_cadquery = pytest.mark.skipif(importlib.util.find_spec("cadquery") is None, reason="cadquery is not installed")
+
+
+def cairosvg_available():
+    try:
+        import cairosvg  # noqa: F401
+    except (ImportError, OSError):  # ✅ OSError: the package is installed but libcairo is not
+        return False
+    return True
+
+
+requires_cairosvg = pytest.mark.skipif(not cairosvg_available(), reason="cairosvg/libcairo is not available")
+
+
+@pytest.fixture
+def db():
+    conn = sqlite3.connect("database.db")
+    conn.row_factory = sqlite3.Row
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def project(db):
+    """An empty project, deleted with its parts afterwards."""
+    project_id = f"test-{os.urandom(4).hex()}"
+    db.execute(
+        "INSERT INTO projects (project_id, name, slug, created_at) VALUES (?, ?, ?, CURRENT_TIMESTAMP)",
+        (project_id, f"Project {project_id}", project_id),
+    )
+    db.commit()
+    yield project_id
+    db.execute("DELETE FROM parts WHERE project_id = ?", (project_id,))
+    db.execute("DELETE FROM projects WHERE project_id = ?", (project_id,))
+    db.commit()
+
+
+@pytest.fixture
+def box_with_hole_step(tmp_path):
+    """40 × 30 × 10 mm block with an 8 mm through hole, as a STEP file."""
+    import cadquery as cq
+
+    path = str(tmp_path / "box_with_hole.step")
+    cq.exporters.export(cq.Workplane("XY").box(40, 30, 10).faces(">Z").workplane().hole(8), path)
+    return path
+
+
+@pytest.fixture
+def add_part(db, project):
+    """Inserts a part into the test project from a bounding box (mm) and raw material details."""
+    import json
+
+    def add(name, width, depth, height, classification_id=1, volume=None, **raw_material_details):
+        part_id = f"{project}-{name}"
+        geometry = {
+            "bounding_box": {"width": width, "depth": depth, "height": height, "unit": "mm"},
+            "volume": {"value": volume if volume is not None else width * depth * height, "unit": "mm³"},
+            "surface_area": {"value": 2 * (width * depth + width * height + depth * height), "unit": "mm²"},
+        }
+        db.execute("""
+            INSERT INTO parts (part_id, slug, project_id, name, file_name, file_path, geometry_details,
+                               raw_material_details, classification_id, is_manual)
+            VALUES (?, ?, ?, ?, '', '', ?, ?, ?, 1)
+        """, (part_id, part_id, project, name, json.dumps(geometry), json.dumps(raw_material_details), classification_id))
+        db.commit()
+        return part_id
+
+    return add
@@ -0,0 +1,83 @@
+# /tests/test_assembly_analysis.py
+
+import asyncio
+import os
+
+import pytest
+
+from conftest import requires_cadquery
+
+
+def _box_with_hole():
+    import cadquery as cq
+
+    return cq.Workplane("XY").box(40, 30, 10).faces(">Z").workplane().hole(8).val()
+
+
+@pytest.fixture
+def copies_step(tmp_path):
+    """One compound: a block, a moved instance of it, a translated and a rotated copy, and a pin."""
+    import cadquery as cq
+
+    block = _box_with_hole()
+    solids = [
+        block,
+        block.moved(cq.Location(cq.Vector(100, 0, 0))),
+        block.translate(cq.Vector(0, 100, 0)),
+        block.rotate(cq.Vector(0, 0, 0), cq.Vector(0, 0, 1), 37).translate(cq.Vector(0, -100, 0)),
+        cq.Workplane("XY").cylinder(20, 5).val(),
+    ]
+    path = str(tmp_path / "copies.step")
+    cq.exporters.export(cq.Workplane("XY").newObject([cq.Compound.makeCompound(solids)]), path)
+    return path
+
+
+@pytest.fixture
+def instanced_step(tmp_path):
+    """One block placed three times through the assembly structure (NAUO links)."""
+    import cadquery as cq
+
+    block = _box_with_hole()
+    assembly = cq.Assembly()
+    for i in range(3):
+        assembly.add(block, name=f"block{i}", loc=cq.Location(cq.Vector(100 * i, 0, 0)))
+    path = str(tmp_path / "instanced.step")
+    assembly.export(path)
+    return path
+
+
+@requires_cadquery
+def test_split_assembly_merges_moved_and_rotated_copies(copies_step):
+    from modules.assembly_analysis import split_assembly
+
+    split = split_assembly(copies_step)
+
+    assert split["instances"] == 5
+    assert sorted(c["instances"] for c in split["components"]) == [1, 4]
+
+
+@requires_cadquery
+def test_instanced_solid_enters_assembly_mode(instanced_step):
+    from modules.step_prescan import is_assembly, prescan_step
+
+    scan = prescan_step(instanced_step)
+    assert scan["solids"] == 1
+    assert is_assembly(scan)
+
+
+@requires_cadquery
+def test_run_assembly_analysis_end_to_end(instanced_step, tmp_path):
+    from modules.assembly_analysis import export_components
+    from modules.cad_worker import run_assembly_analysis
+
+    analysis, component_analyses = asyncio.run(run_assembly_analysis(instanced_step))
+
+    assert analysis["assembly"]["instances"] == 3
+    assert analysis["assembly"]["unique_components"] == 1
+    assert analysis["volume"]["value"] == pytest.approx(3 * component_analyses[0]["volume"]["value"])
+    assert component_analyses[0]["topology"]["holes"][0]["diameter"] == 8.0
+
+    fingerprint = analysis["assembly"]["components"][0]["fingerprint"]
+    step_path = str(tmp_path / "child.step")
+    [exported] = export_components([{"fingerprint": fingerprint, "step_path": step_path, "svg_path": None}])
+    assert exported["step_path"] == step_path and os.path.getsize(step_path) > 0
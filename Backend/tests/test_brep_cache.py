@@ -0,0 +1,40 @@
+# /tests/test_brep_cache.py
+
+import os
+
+import pytest
+
+from conftest import requires_cadquery
+
+
+@requires_cadquery
+def test_step_reload_from_brep_sidecar_matches_first_import(box_with_hole_step):
+    from modules.geometric_analysis import brep_sidecar_path, load_step
+
+    first = load_step(box_with_hole_step)
+    sidecar = brep_sidecar_path(box_with_hole_step)
+    assert os.path.exists(sidecar)
+
+    for _ in range(3):  # ✅ Every reload comes from the sidecar
+        reloaded = load_step(box_with_hole_step)
+        assert len(reloaded.vals()) == len(first.vals())
+        assert reloaded.val().Volume() == pytest.approx(first.val().Volume())
+        assert len(reloaded.val().Faces()) == len(first.val().Faces())
+
+
+@requires_cadquery
+def test_prune_brep_cache_evicts_by_age_then_size(monkeypatch, tmp_path):
+    import modules.geometric_analysis as geometric_analysis
+
+    monkeypatch.setattr(geometric_analysis, "BREP_CACHE_FOLDER", str(tmp_path))
+    monkeypatch.setattr(geometric_analysis, "BREP_CACHE_MAX_AGE_DAYS", 30)
+    monkeypatch.setattr(geometric_analysis, "BREP_CACHE_MAX_MB", 2500 / 1024 / 1024)
+    now = os.path.getmtime(tmp_path)
+    for name, age_days in (("old", 40), ("a", 5), ("b", 3), ("c", 1)):
+        path = tmp_path / f"{name}.brep.gz"
+        path.write_bytes(b"x" * 1000)
+        os.utime(path, (now - age_days * 86400, now - age_days * 86400))
+    (tmp_path / "d.brep.gz.1234.tmp").write_bytes(b"x" * 5000)  # ✅ In-flight write, never evicted
+
+    assert geometric_analysis.prune_brep_cache() == 2
+    assert sorted(os.listdir(tmp_path)) == ["b.brep.gz", "c.brep.gz", "d.brep.gz.1234.tmp"]
@@ -0,0 +1,28 @@
+# /tests/test_cad_file_analysis.py
+
+import asyncio
+import threading
+
+from conftest import requires_cadquery, requires_cairosvg
+
+
+@requires_cadquery
+@requires_cairosvg
+def test_eager_ingest_renders_thumbnail_off_the_event_loop(monkeypatch, project, box_with_hole_step):
+    from modules import cad_file_analysis
+
+    rendered_on = []
+
+    def generate_thumbnail(svg_path, thumbnail_filename, project_id):
+        rendered_on.append(threading.current_thread())
+        return None
+
+    monkeypatch.setattr(cad_file_analysis, "LAZY_ARTIFACTS", False)
+    monkeypatch.setattr(cad_file_analysis, "generate_thumbnail", generate_thumbnail)
+
+    analysis, svg_path, _ = asyncio.run(
+        cad_file_analysis.ingest_part_file(box_with_hole_step, project, "box_with_hole")
+    )
+
+    assert analysis and svg_path
+    assert rendered_on and threading.main_thread() not in rendered_on
@@ -0,0 +1,26 @@
+# /tests/test_cad_worker.py
+
+import asyncio
+import json
+import os
+
+from conftest import requires_cadquery
+
+
+@requires_cadquery
+def test_run_ingest_writes_every_configured_view(box_with_hole_step, tmp_path):
+    from modules.cad_worker import PROJECTION_VIEWS, run_ingest, views_index_path
+
+    svg_path = str(tmp_path / "projections" / "box.svg")
+    glb_path = str(tmp_path / "meshes" / "box.glb")
+    for _ in range(2):  # ✅ The second ingest reloads the shape from its BREP sidecar
+        result = asyncio.run(run_ingest(box_with_hole_step, svg_path, glb_path))
+
+        assert result["analysis"]["bounding_box"]["width"] == 40.0
+        assert result["projection"] == svg_path and os.path.exists(svg_path)
+        assert result["mesh"] and os.path.exists(glb_path)
+        assert [view["name"] for view in result["views"]["views"]] == PROJECTION_VIEWS
+        for view in result["views"]["views"]:
+            assert os.path.exists(os.path.join(tmp_path, "projections", view["file"]))
+        with open(views_index_path(svg_path), encoding="utf-8") as f:
+            assert json.load(f) == result["views"]
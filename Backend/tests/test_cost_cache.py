@@ -0,0 +1,41 @@
+# /tests/test_cost_cache.py
+
+from modules import cost_cache
+from modules.cost_cache import COST_CACHE, MemoCache, bump_catalogue_version, cost_cache_key
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = MemoCache("test", max_size=2, ttl=0)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # ✅ "b" is now the least recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cost_cache.time, "monotonic", lambda: now[0])
+    cache = MemoCache("test", max_size=4, ttl=60)
+    cache.put("a", 1)
+
+    now[0] += 59
+    assert cache.get("a") == 1
+    now[0] += 2
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+    assert cache.stats()["misses"] == 1
+
+
+def test_version_bump_invalidates_cost_results():
+    key = cost_cache_key("fingerprint", 1, 1, (0.0, 0.0, 0.0))
+    COST_CACHE.put(key, {"total_cost": 1.0})
+    assert COST_CACHE.get(key) == {"total_cost": 1.0}
+
+    bump_catalogue_version()
+    assert COST_CACHE.get(key) is None
+    assert cost_cache_key("fingerprint", 1, 1, (0.0, 0.0, 0.0)) != key
@@ -0,0 +1,80 @@
+# /tests/test_cost_sensitivity.py
+
+import numpy as np
+import pytest
+
+from modules.cost_sensitivity import evaluate_scenarios, project_sensitivity
+from modules.material_catalogue import get_material
+from modules.project_costing import load_cost_components
+
+
+def make_components():
+    """Three parts: two on material 1, one on material 2; the first two milled, the last turned."""
+    stock = np.array([1000.0, 2000.0, 500.0])
+    part = np.array([400.0, 1500.0, 100.0])
+    removal = np.array([100.0, 100.0, 50.0])
+    finishing = np.array([1.0, 0.5, 2.0])
+    rate = np.array([10.0, 10.0, 40.0])
+    hours = finishing + (stock - part) / removal
+    return {
+        "parts": [
+            {"part_id": "a", "name": "a", "operation": "Milling"},
+            {"part_id": "b", "name": "b", "operation": "Milling"},
+            {"part_id": "c", "name": "c", "operation": "Turning"},
+        ],
+        "materials": [1, 2],
+        "operations": [7, 8],
+        "material_index": np.array([0, 0, 1]),
+        "operation_index": np.array([0, 0, 1]),
+        "material_cost": np.array([300.0, 600.0, 50.0]),
+        "machining_cost": hours * rate,
+        "stock_volume": stock,
+        "part_volume": part,
+        "removal_rate": removal,
+        "finishing_hours": finishing,
+        "rate_per_hour": rate,
+    }
+
+
+def test_unperturbed_scenario_reproduces_the_baseline():
+    components = make_components()
+    ones = (np.ones((1, 3)), np.ones((1, 3)), np.ones((1, 3)))
+    baseline = components["material_cost"].sum() + components["machining_cost"].sum()
+    assert evaluate_scenarios(components, *ones)[0] == pytest.approx(baseline)
+
+
+def test_inputs_are_ranked_by_swing():
+    components = make_components()
+    result = project_sensitivity(components, delta=0.1)
+    rows = {(row["parameter"], row["ref_id"]): row for row in result["rows"]}
+
+    # ✅ Prices and rates are linear: swing = 2 × delta × the cost they drive
+    assert rows[("price", 1)]["swing"] == pytest.approx(0.2 * 900.0)
+    assert rows[("price", 2)]["swing"] == pytest.approx(0.2 * 50.0)
+    assert rows[("rate", 7)]["swing"] == pytest.approx(0.2 * components["machining_cost"][:2].sum())
+    assert rows[("rate", 8)]["swing"] == pytest.approx(0.2 * components["machining_cost"][2])
+    # ✅ More stock also means more roughing: 10% of stock / removal rate at the hourly rate
+    assert rows[("allowance", 1)]["swing"] == pytest.approx(0.2 * 900.0 + 2 * (0.1 * 3000.0 / 100.0) * 10.0)
+
+    swings = [row["swing"] for row in result["rows"]]
+    assert swings == sorted(swings, reverse=True)
+    assert [row["rank"] for row in result["rows"]] == list(range(1, 7))
+    assert rows[("rate", 8)]["name"] == "Turning"
+    assert rows[("price", 1)]["name"] == get_material(1)["name"]
+
+    top = project_sensitivity(components, delta=0.1, top=2)["rows"]
+    assert [(row["parameter"], row["ref_id"]) for row in top] == [
+        (row["parameter"], row["ref_id"]) for row in result["rows"][:2]
+    ]
+
+
+def test_project_sensitivity_matches_the_point_estimate(add_part, project):
+    add_part("bracket", 37, 22, 100, volume=50000.0, material_id=1)
+    add_part("spacer", 20, 20, 40, volume=9000.0, material_id=2)
+    components = load_cost_components(project)
+
+    result = project_sensitivity(components, delta=0.05)
+    baseline = components["material_cost"].sum() + components["machining_cost"].sum()
+    assert result["baseline"] == pytest.approx(baseline, abs=0.01)
+    for row in result["rows"]:
+        assert row["low_total"] <= result["baseline"] <= row["high_total"]
@@ -0,0 +1,27 @@
+# /tests/test_cost_uncertainty.py
+
+from modules.cost_uncertainty import load_distributions, resolve_distribution, simulate_project_costs
+from modules.project_costing import load_cost_components, project_point_costs
+
+
+def test_point_estimate_sits_inside_the_monte_carlo_band(project, add_part):
+    add_part("block", 120, 80, 40, material_id=1)
+    add_part("plate", 300, 200, 20, material_id=2)
+
+    components = load_cost_components(project)
+    point = project_point_costs(components)
+    bands = simulate_project_costs(components, samples=20000, seed=7)
+
+    assert bands["material_cost"]["p10"] <= point["material_cost"] <= bands["material_cost"]["p90"]
+    assert bands["total"]["p10"] <= point["total_cost"] <= bands["total"]["p90"]
+
+
+def test_point_material_cost_includes_modal_scrap(project, add_part):
+    add_part("block", 120, 80, 40, material_id=1)
+
+    components = load_cost_components(project)
+    scrap = resolve_distribution(load_distributions(), "scrap", 1)[2]
+
+    assert scrap > 0  # ✅ Seeded global scrap mode
+    expected = components["mass_kg"][0] * components["unit_price"][0] * (1 + scrap)
+    assert components["material_cost"][0] == expected
@@ -0,0 +1,49 @@
+# /tests/test_currency.py
+
+import numpy as np
+import pytest
+
+from modules.currency import (
+    CurrencyRate, convert_amounts, delete_currency_rate, get_currency_context, parse_price_unit,
+    present_amounts, upsert_currency_rate,
+)
+
+
+@pytest.mark.parametrize("price_unit, expected", [
+    ("INR/kg", ("INR", "kg")),
+    ("$ per lb", ("USD", "lb")),
+    ("€/kg", ("EUR", "kg")),
+    ("kg", (None, "kg")),
+    ("per kg", (None, "kg")),
+    ("USD", ("USD", "kg")),
+])
+def test_price_units_split_into_currency_and_quantity(price_unit, expected):
+    assert parse_price_unit(price_unit) == expected
+
+
+def test_amounts_convert_per_entry_to_the_display_currency():
+    # ✅ Seeded rates are INR per unit: USD 83, EUR 90; None is the base currency (INR)
+    converted = convert_amounts([10.0, 10.0, 10.0, 10.0], ["USD", "EUR", None, "INR"])
+    np.testing.assert_allclose(converted, [830.0, 900.0, 10.0, 10.0])
+
+    np.testing.assert_allclose(convert_amounts([830.0, 90.0], [None, "EUR"], target="USD"), [10.0, 90.0 * 90.0 / 83.0])
+
+
+def test_unknown_currency_is_left_unconverted():
+    np.testing.assert_allclose(convert_amounts([12.5], ["XYZ"]), [12.5])
+
+
+def test_rate_changes_apply_immediately():
+    upsert_currency_rate(CurrencyRate(currency="chf", rate=95.0))
+    try:
+        assert get_currency_context()["rates"]["CHF"] == 95.0
+        np.testing.assert_allclose(convert_amounts([2.0], ["CHF"]), [190.0])
+    finally:
+        delete_currency_rate("CHF")
+    assert "CHF" not in get_currency_context()["rates"]
+
+
+def test_rounding_is_presentation_only():
+    amounts = convert_amounts([0.333, 0.333, 0.334], ["INR"] * 3)
+    assert present_amounts(amounts.sum()) == pytest.approx(1.0)
+    np.testing.assert_allclose(present_amounts(amounts), [0.33, 0.33, 0.33])
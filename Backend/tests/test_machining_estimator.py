@@ -0,0 +1,48 @@
+# /tests/test_machining_estimator.py
+
+import json
+
+import pytest
+
+from modules.machining_estimator import DEFAULT_FINISHING_RATE, DEFAULT_REMOVAL_RATE, estimate_project_machining
+from modules.stock_catalogue import STOCK_CUT_ALLOWANCE
+
+# ✅ 37 × 22 × 100 part cut from 25 × 40 block stock
+STOCK_VOLUME = 25 * 40 * (100 + STOCK_CUT_ALLOWANCE)
+PART_VOLUME = 50000.0
+SURFACE_AREA = 2 * (37 * 22 + 37 * 100 + 22 * 100)
+
+
+def test_hours_follow_removed_volume_and_surface(db, add_part, project):
+    aluminium = add_part("aluminium", 37, 22, 100, volume=PART_VOLUME, material_id=1)
+    unassigned = add_part("unassigned", 37, 22, 100, volume=PART_VOLUME)
+
+    result = estimate_project_machining(project, save=False)
+    parts = {p["part_id"]: p for p in result["parts"]}
+
+    # ✅ Aluminium 6061 removes 30 cm³/min and finishes 120 cm²/min; other parts use the defaults
+    for part_id, removal, finishing in (
+        (aluminium, 30.0, 120.0),
+        (unassigned, DEFAULT_REMOVAL_RATE, DEFAULT_FINISHING_RATE),
+    ):
+        part = parts[part_id]
+        assert part["stock_volume"] == pytest.approx(STOCK_VOLUME)
+        assert part["removed_volume"] == pytest.approx(STOCK_VOLUME - PART_VOLUME)
+        assert part["roughing_hours"] == pytest.approx((STOCK_VOLUME - PART_VOLUME) / (removal * 1000 * 60))
+        assert part["finishing_hours"] == pytest.approx(SURFACE_AREA / (finishing * 100 * 60))
+        assert part["cost"] == pytest.approx(part["hours"] * part["rate_per_hour"])
+
+    assert result["total_hours"] == pytest.approx(sum(p["hours"] for p in result["parts"]))
+
+    # ✅ save=False leaves the stored machining details untouched
+    stored = db.execute("SELECT machining_details FROM parts WHERE part_id = ?", (aluminium,)).fetchone()[0]
+    assert "time_estimate" not in json.loads(stored or "{}")
+
+
+def test_estimates_are_saved(db, add_part, project):
+    part_id = add_part("saved", 37, 22, 100, volume=PART_VOLUME, material_id=1)
+
+    result = estimate_project_machining(project)
+
+    stored = json.loads(db.execute("SELECT machining_details FROM parts WHERE part_id = ?", (part_id,)).fetchone()[0])
+    assert stored["time_estimate"]["hours"] == pytest.approx(result["parts"][0]["hours"])
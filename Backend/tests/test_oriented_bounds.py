@@ -0,0 +1,39 @@
+# /tests/test_oriented_bounds.py
+
+import math
+
+import pytest
+
+from conftest import requires_cadquery
+
+
+@requires_cadquery
+def test_rotated_box_gets_its_own_extents():
+    import cadquery as cq
+
+    from modules.oriented_bounds import compute_oriented_bounds
+
+    box = cq.Workplane("XY").box(100, 40, 10).val()
+    rotated = box.rotate(cq.Vector(0, 0, 0), cq.Vector(1, 1, 1), 37)
+    axis_aligned = rotated.BoundingBox()
+    assert axis_aligned.xlen * axis_aligned.ylen * axis_aligned.zlen > 2 * 100 * 40 * 10
+
+    bounds = compute_oriented_bounds(rotated, time_budget=None)
+    obb = bounds["oriented_bounding_box"]
+    assert [obb["length"], obb["width"], obb["height"]] == pytest.approx([100, 40, 10], abs=0.05)
+    assert obb["volume"] == pytest.approx(100 * 40 * 10, rel=0.01)
+
+
+@requires_cadquery
+def test_cylinder_gets_enclosing_cylinder():
+    import cadquery as cq
+
+    from modules.oriented_bounds import compute_oriented_bounds
+
+    cylinder = cq.Workplane("XY").cylinder(80, 15).val().rotate(cq.Vector(0, 0, 0), cq.Vector(1, 0, 0), 30)
+
+    bounds = compute_oriented_bounds(cylinder, time_budget=None, tolerance=0.05)
+    enclosing = bounds["enclosing_cylinder"]
+    assert enclosing["diameter"] == pytest.approx(30, rel=0.01)
+    assert enclosing["length"] == pytest.approx(80, abs=0.05)
+    assert abs(enclosing["axis"][2]) == pytest.approx(math.cos(math.radians(30)), abs=1e-3)
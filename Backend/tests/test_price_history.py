@@ -0,0 +1,55 @@
+# /tests/test_price_history.py
+
+import pytest
+
+from modules.material_catalogue import get_material_catalogue
+from modules.price_history import (
+    PriceHistoryEntry, add_price_history, materials_as_of, parse_as_of, prices_without_history,
+)
+
+
+@pytest.fixture
+def backfilled_prices(db):
+    """Two historical prices for material 2, removed afterwards."""
+    ids = [
+        add_price_history(PriceHistoryEntry(
+            material_id=2, block_price=price, block_price_unit="kg",
+            sheet_price=price + 5, sheet_price_unit="kg", effective_from=effective_from,
+        ))["id"]
+        for price, effective_from in ((50.0, "2001-01-01"), (70.0, "2001-06-01T09:30:00+02:00"))
+    ]
+    yield
+    db.executemany("DELETE FROM material_price_history WHERE id = ?", [(i,) for i in ids])
+    db.commit()
+
+
+def test_parse_as_of_normalizes_to_utc_timestamps():
+    assert parse_as_of("2001-06-01") == "2001-06-01 23:59:59"
+    assert parse_as_of("2001-06-01", end_of_day=False) == "2001-06-01 00:00:00"
+    assert parse_as_of("2001-06-01T09:30:00+02:00") == "2001-06-01 07:30:00"
+
+
+@pytest.mark.usefixtures("backfilled_prices")
+@pytest.mark.parametrize("as_of, block_price", [
+    ("2001-05-31", 50.0),
+    ("2001-06-01 07:29:59", 50.0),
+    ("2001-06-01 07:30:00", 70.0),
+    ("2001-12-31", 70.0),
+])
+def test_prices_resolve_to_the_entry_in_effect(as_of, block_price):
+    material = materials_as_of(parse_as_of(as_of))[2]
+
+    assert material["block_price"] == pytest.approx(block_price)
+    assert material["sheet_price"] == pytest.approx(block_price + 5)
+    assert material["price_as_of"] <= parse_as_of(as_of)
+
+
+@pytest.mark.usefixtures("backfilled_prices")
+def test_materials_without_history_keep_current_prices_and_are_flagged():
+    current = get_material_catalogue().materials
+    pricing = materials_as_of(parse_as_of("2001-03-01"))
+
+    assert pricing[1]["price_as_of"] is None
+    assert pricing[1]["block_price"] == current[1]["block_price"]
+    assert prices_without_history(pricing, [1, 2]) == [current[1]["name"]]
+    assert materials_as_of(None) == current
@@ -0,0 +1,38 @@
+# /tests/test_profile_formulas.py
+
+import numpy as np
+import pytest
+from fastapi import HTTPException
+
+from modules.material_profiles import ProfileVolumeRequest, calculate_profile_volumes
+from modules.profile_formulas import FormulaError, evaluate_profile_volumes
+from modules.unit_conversion import UnitConversionError, conversion_factor
+
+BLOCK = {"fields_json": {"length": "mm", "width": "mm", "height": "mm"}, "volume_formula": "length * width * height", "default_unit": "mm³"}
+
+
+def test_volumes_are_converted_per_field_and_result():
+    rows = [{"length": 1, "width": 2, "height": 3}, {"length": 10, "width": 10, "height": 10}]
+    volumes = evaluate_profile_volumes(BLOCK, rows, dimensions_unit="cm", volume_unit="cm³")
+    np.testing.assert_allclose(volumes, [6.0, 1000.0])
+
+
+@pytest.mark.parametrize("from_unit, to_unit", [("mm", "kg"), ("furlongz", "mm")])
+def test_conversion_factor_rejects_bad_units(from_unit, to_unit):
+    with pytest.raises(UnitConversionError):
+        conversion_factor(from_unit, to_unit)
+
+
+@pytest.mark.parametrize("units", [{"dimensions_unit": "kg"}, {"volume_unit": "furlongz"}])
+def test_bad_units_are_formula_errors(units):
+    with pytest.raises(FormulaError):
+        evaluate_profile_volumes(BLOCK, [{"length": 1, "width": 2, "height": 3}], **units)
+
+
+@pytest.mark.parametrize("units", [{"dimensions_unit": "kg"}, {"volume_unit": "furlongz"}])
+def test_volumes_endpoint_reports_bad_units_as_400(db, units):
+    profile_id = db.execute("SELECT id FROM material_profiles WHERE name = 'Block'").fetchone()["id"]
+    request = ProfileVolumeRequest(dimensions=[{"length": 1, "width": 2, "height": 3}], **units)
+    with pytest.raises(HTTPException) as error:
+        calculate_profile_volumes(profile_id, request)
+    assert error.value.status_code == 400
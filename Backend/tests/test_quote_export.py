@@ -0,0 +1,53 @@
+# /tests/test_quote_export.py
+
+import csv
+import io
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from modules.project_costing import load_cost_components, project_point_costs
+from modules.quote_export import QUOTE_COLUMNS, router
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(router, prefix="/projects")
+    return TestClient(app)
+
+
+def test_csv_lines_add_up_to_the_totals(client, add_part, project):
+    add_part("bracket", 37, 22, 100, volume=50000.0, material_id=1)
+    add_part("spacer", 20, 20, 40, volume=9000.0, material_id=2)
+    add_part("unassigned", 10, 10, 10)
+
+    response = client.get(f"/projects/{project}/quote", params={"format": "csv"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+
+    rows = list(csv.reader(io.StringIO(response.text)))
+    assert tuple(rows[0]) == QUOTE_COLUMNS
+    lines = [dict(zip(QUOTE_COLUMNS, row)) for row in rows[1:4]]
+    totals = dict(zip(QUOTE_COLUMNS, rows[4]))
+    assert [line["part_name"] for line in lines] == ["bracket", "spacer", "unassigned"]
+    assert totals["part_name"] == "TOTAL"
+    assert rows[-1][0] == "currency"
+
+    expected = project_point_costs(load_cost_components(project))
+    for column in ("material_cost", "machining_cost", "total_cost"):
+        assert float(totals[column]) == pytest.approx(expected[column])
+        # ✅ Lines are rounded individually, so they may differ from the total by rounding only
+        assert sum(float(line[column]) for line in lines) == pytest.approx(float(totals[column]), abs=0.01 * len(lines))
+    for line in lines:
+        assert float(line["total_cost"]) == pytest.approx(float(line["material_cost"]) + float(line["machining_cost"]), abs=0.01)
+    assert float(lines[0]["material_cost"]) > 0
+
+
+def test_unknown_project_is_404(client):
+    assert client.get("/projects/missing/quote").status_code == 404
+
+
+def test_unknown_format_is_400(client, project):
+    assert client.get(f"/projects/{project}/quote", params={"format": "docx"}).status_code == 400
@@ -0,0 +1,34 @@
+# /tests/test_sheet_nesting.py
+
+import pytest
+
+from modules.sheet_nesting import NESTING_MARGIN, NESTING_SPACING, nest_project_sheets
+
+SHEET_METAL = 2  # ✅ Seeded "Sheet Metal Part" classification (sheet_price)
+
+
+def test_single_small_part_is_charged_the_area_it_uses(project, add_part):
+    part_id = add_part("bracket", 200, 100, 2, classification_id=SHEET_METAL, material_id=1, quantity=1)
+
+    [group] = nest_project_sheets(project)
+
+    assert group["nesting"]["sheet_count"] == 1
+    used = (200 + NESTING_SPACING + 2 * NESTING_MARGIN) * (100 + NESTING_SPACING + 2 * NESTING_MARGIN)
+    assert group["part_volume_share"][part_id] == pytest.approx(used * group["thickness"])
+    assert group["part_volume_share"][part_id] < group["sheet_volume"] / 100
+
+
+def test_sheet_count_and_per_unit_shares(project, add_part):
+    panel = add_part("panel", 1000, 600, 2, classification_id=SHEET_METAL, material_id=1, quantity=10)
+    cover = add_part("cover", 1000, 600, 2, classification_id=SHEET_METAL, material_id=1, quantity=1)
+
+    [group] = nest_project_sheets(project)
+    nesting = group["nesting"]
+
+    # ✅ 11 spaced 1005 × 605 panels, four per usable 2480 × 1230 sheet
+    assert nesting["sheet_size"] == [2500.0, 1250.0]
+    assert nesting["sheet_count"] == 3
+    # ✅ Shares are per unit: equal footprints carry equal shares whatever their quantity
+    assert group["part_volume_share"][panel] == pytest.approx(group["part_volume_share"][cover])
+    assert 11 * group["part_volume_share"][panel] == pytest.approx(group["consumed_volume"])
+    assert group["consumed_volume"] <= group["sheet_volume"]
@@ -0,0 +1,37 @@
+# /tests/test_stock_catalogue.py
+
+import math
+
+import pytest
+
+from modules.stock_catalogue import STOCK_CUT_ALLOWANCE, fit_stock, get_profile_by_name
+
+
+def test_block_fits_smallest_cross_section():
+    block = get_profile_by_name("Block")
+    fit = fit_stock({"width": 37, "depth": 22, "height": 100, "unit": "mm"}, profile_id=block["id"])
+
+    # ✅ 25 × 40 is the smallest catalogue section holding 22 × 37; 20 × 40 and 25 × 35 are too small
+    assert sorted((fit["dimensions"]["height"], fit["dimensions"]["width"])) == [25, 40]
+    assert fit["cut_length"] == pytest.approx(100 + STOCK_CUT_ALLOWANCE)
+    assert fit["volume"] == pytest.approx(25 * 40 * (100 + STOCK_CUT_ALLOWANCE))
+
+
+def test_block_pricing_prefers_round_bar_for_a_turned_part():
+    fit = fit_stock({"width": 20, "depth": 20, "height": 100, "unit": "mm"}, pricing_type="block_price", diameter=20)
+
+    assert fit["profile"] == "Round Bar"
+    assert fit["dimensions"]["diameter"] == 20
+    assert fit["volume"] == pytest.approx(math.pi * 10 ** 2 * (100 + STOCK_CUT_ALLOWANCE))
+
+
+def test_units_are_converted_before_fitting():
+    block = get_profile_by_name("Block")
+    fit = fit_stock({"width": 3.7, "depth": 2.2, "height": 10, "unit": "cm"}, profile_id=block["id"])
+
+    assert sorted((fit["dimensions"]["height"], fit["dimensions"]["width"])) == [25, 40]
+
+
+def test_oversized_part_has_no_stock():
+    block = get_profile_by_name("Block")
+    assert fit_stock({"width": 400, "depth": 400, "height": 100, "unit": "mm"}, profile_id=block["id"]) is None
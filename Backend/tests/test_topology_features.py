@@ -0,0 +1,19 @@
+# /tests/test_topology_features.py
+
+import pytest
+
+from conftest import requires_cadquery
+
+
+@requires_cadquery
+def test_analyze_step_file_reports_topology_of_box_with_hole(box_with_hole_step):
+    from modules.geometric_analysis import analyze_step_file
+
+    analysis = analyze_step_file(box_with_hole_step)
+    topology = analysis["topology"]
+
+    assert analysis["bounding_box"]["unit"] == "mm"
+    assert topology["face_types"] == {"planar": 6, "cylindrical": 1}
+    assert topology["holes"] == [{"diameter": 8.0, "depth": 10.0, "axis": [0.0, 0.0, 1.0], "count": 1, "unit": "mm"}]
+    assert topology["thinnest_wall"]["value"] == pytest.approx(10.0)
+    assert topology["planar_area"]["total"] == pytest.approx(2 * (40 * 30 - 3.14159265 * 16) + 2 * 400 + 2 * 300, rel=1e-4)